@@ -0,0 +1,52 @@
+"""add_network_flows
+
+Revision ID: b5e81c3f9a27
+Revises: 786723d2a8a6
+Create Date: 2026-10-17 11:20:41.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e81c3f9a27'
+down_revision: Union[str, Sequence[str], None] = '786723d2a8a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('network_flows',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('src_ip', sa.String(length=45), nullable=False),
+    sa.Column('dst_ip', sa.String(length=45), nullable=False),
+    sa.Column('src_port', sa.Integer(), nullable=False),
+    sa.Column('dst_port', sa.Integer(), nullable=False),
+    sa.Column('transport', sa.String(length=10), nullable=False),
+    sa.Column('protocol', sa.String(length=20), nullable=False),
+    sa.Column('packets', sa.Integer(), nullable=False),
+    sa.Column('bytes', sa.BigInteger(), nullable=False),
+    sa.Column('tcp_flags', sa.Integer(), nullable=False),
+    sa.Column('tcp_state', sa.String(length=12), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('flagged', sa.Boolean(), nullable=True),
+    sa.Column('end_reason', sa.String(length=10), nullable=False),
+    sa.Column('first_seen', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_seen', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_network_flows_dst_ip'), 'network_flows', ['dst_ip'], unique=False)
+    op.create_index(op.f('ix_network_flows_first_seen'), 'network_flows', ['first_seen'], unique=False)
+    op.create_index(op.f('ix_network_flows_src_ip'), 'network_flows', ['src_ip'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_network_flows_src_ip'), table_name='network_flows')
+    op.drop_index(op.f('ix_network_flows_first_seen'), table_name='network_flows')
+    op.drop_index(op.f('ix_network_flows_dst_ip'), table_name='network_flows')
+    op.drop_table('network_flows')
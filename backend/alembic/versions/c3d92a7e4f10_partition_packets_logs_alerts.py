@@ -0,0 +1,107 @@
+"""partition_packets_logs_alerts
+
+Revision ID: c3d92a7e4f10
+Revises: b5e81c3f9a27
+Create Date: 2026-10-17 19:42:08.551930
+
+Rebuilds captured_packets, network_logs and network_alerts as tables
+range-partitioned by created_at, one partition per UTC day, plus a DEFAULT
+partition for rows outside the daily range.  Existing rows are copied over;
+days older than BACKFILL_DAYS land in the DEFAULT partition.  Further
+partitions are created / dropped by partition_maintenance.py.
+
+PostgreSQL only — on other databases this revision is a no-op.
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d92a7e4f10'
+down_revision: Union[str, Sequence[str], None] = 'b5e81c3f9a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {
+    # table: indexes on the partitioned parent (cascade to every partition)
+    'captured_packets': ['created_at', 'dst_ip', 'protocol', 'src_ip'],
+    'network_logs':     ['created_at'],
+    'network_alerts':   ['created_at'],
+}
+OLD_INDEXES = {
+    'captured_packets': ['created_at', 'dst_ip', 'protocol', 'src_ip'],
+    'network_logs':     [],
+    'network_alerts':   [],
+}
+BACKFILL_DAYS = 90    # daily partitions created for existing data
+PREMAKE_DAYS  = 3     # future daily partitions created up front
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _partition_sql(table: str, day: date) -> str:
+    return (f"CREATE TABLE {table}_p{day:%Y%m%d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') "
+            f"TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _is_postgres():
+        return
+    bind = op.get_bind()
+    today = date.today()
+    for table, indexes in TABLES.items():
+        old = f'{table}_unpartitioned'
+        op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey')
+        for col in OLD_INDEXES[table]:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_{col}')
+        op.execute(f'UPDATE {old} SET created_at = now() WHERE created_at IS NULL')
+
+        # Same columns and defaults (id keeps nextval on the existing sequence)
+        op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) '
+                   f'PARTITION BY RANGE (created_at)')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL')
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        for col in indexes:
+            op.create_index(f'ix_{table}_{col}', table, [col], unique=False)
+
+        first = bind.execute(sa.text(f'SELECT min(created_at) FROM {old}')).scalar()
+        start = max(first.date() if first else today, today - timedelta(days=BACKFILL_DAYS))
+        day = start
+        while day <= today + timedelta(days=PREMAKE_DAYS):
+            op.execute(_partition_sql(table, day))
+            day += timedelta(days=1)
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        op.execute(f'DROP TABLE {old}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _is_postgres():
+        return
+    for table, indexes in TABLES.items():
+        part = f'{table}_partitioned'
+        op.execute(f'ALTER TABLE {table} RENAME TO {part}')
+        op.execute(f'ALTER TABLE {part} RENAME CONSTRAINT {table}_pkey TO {part}_pkey')
+        for col in indexes:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_{col}')
+
+        op.execute(f'CREATE TABLE {table} (LIKE {part} INCLUDING DEFAULTS)')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL')
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        for col in OLD_INDEXES[table]:
+            op.create_index(f'ix_{table}_{col}', table, [col], unique=False)
+
+        op.execute(f'INSERT INTO {table} SELECT * FROM {part}')
+        op.execute(f'DROP TABLE {part}')    # drops every partition with it
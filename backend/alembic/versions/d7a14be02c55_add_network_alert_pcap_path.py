@@ -0,0 +1,28 @@
+"""add_network_alert_pcap_path
+
+Revision ID: d7a14be02c55
+Revises: c3d92a7e4f10
+Create Date: 2026-10-17 21:05:37.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a14be02c55'
+down_revision: Union[str, Sequence[str], None] = 'c3d92a7e4f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('network_alerts', sa.Column('pcap_path', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('network_alerts', 'pcap_path')
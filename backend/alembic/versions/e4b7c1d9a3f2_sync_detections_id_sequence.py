@@ -0,0 +1,35 @@
+"""sync_detections_id_sequence
+
+Revision ID: e4b7c1d9a3f2
+Revises: d7a14be02c55
+Create Date: 2026-10-17 22:14:08.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c1d9a3f2'
+down_revision: Union[str, Sequence[str], None] = 'd7a14be02c55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # seed_incidents.py used to insert detections with explicit ids and leave
+    # the sequence behind them — move it past max(id) once
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(sa.text(
+        "SELECT setval(pg_get_serial_sequence('detections', 'id'), "
+        "COALESCE((SELECT MAX(id) FROM detections), 0) + 1, false)"
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    pass
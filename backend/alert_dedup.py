@@ -0,0 +1,109 @@
+"""
+alert_dedup.py
+==============
+CyGuardian-X — Per-(rule, source IP) alert suppression window
+
+The first hit of a rule from a source opens a window of `cooldown` seconds
+(AnomalyConfig.alert_cooldown) and is alerted normally.  Further hits inside
+the window only bump a counter; when the window closes a single summary
+is handed to the `on_summary` callback.  win.hits counts the first
+(already alerted) hit too, so a summary reports win.hits - 1 repeats.
+
+Windows live in an insertion-ordered table capped at `max_entries`: the
+least recently opened window is evicted first (and summarised if it held
+repeats), so a spoofed-source flood cannot grow memory without bound.
+Expiry sweeps walk the table from the oldest end and stop at the first
+open window — O(closed windows), not O(table).
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Dict
+
+MAX_ENTRIES = 50_000
+
+
+class _Window:
+    __slots__ = ("opened", "last", "hits", "rule", "src", "dst", "proto", "port")
+
+    def __init__(self, now, rule, src, dst, proto, port):
+        self.opened = now
+        self.last   = now
+        self.hits   = 1
+        self.rule   = rule
+        self.src    = src
+        self.dst    = dst
+        self.proto  = proto
+        self.port   = port
+
+
+class AlertSuppressor:
+    def __init__(self, cooldown: int = 60, max_entries: int = MAX_ENTRIES,
+                 on_summary: Callable[[_Window, float], None] = None):
+        self.cooldown    = cooldown
+        self.max_entries = max_entries
+        self.on_summary  = on_summary
+        self._windows: "collections.OrderedDict[tuple, _Window]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.suppressed = 0
+        self.evicted    = 0
+        self.summaries  = 0
+
+    def hit(self, rule: Dict, src: str, dst: str, proto: str, port: int,
+            now: float = None) -> bool:
+        """Record a rule hit. True = alert it now, False = suppressed."""
+        if self.cooldown <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        key = (rule["id"], src)
+        closed = []
+        with self._lock:
+            win = self._windows.get(key)
+            if win is not None and now - win.opened < self.cooldown:
+                win.hits += 1
+                win.last  = now
+                self.suppressed += 1
+                return False
+            if win is not None:
+                closed.append(self._windows.pop(key))
+            self._windows[key] = _Window(now, rule, src, dst, proto, port)
+            while len(self._windows) > self.max_entries:
+                _, old = self._windows.popitem(last=False)
+                self.evicted += 1
+                closed.append(old)
+        self._summarise(closed)
+        return True
+
+    def sweep(self, now: float = None):
+        """Close every window older than the cooldown and emit summaries."""
+        now = time.monotonic() if now is None else now
+        closed = []
+        with self._lock:
+            while self._windows:
+                key, win = next(iter(self._windows.items()))
+                if now - win.opened < self.cooldown:
+                    break
+                del self._windows[key]
+                closed.append(win)
+        self._summarise(closed)
+
+    def _summarise(self, closed):
+        for win in closed:
+            if win.hits > 1 and self.on_summary:
+                self.summaries += 1
+                try:
+                    self.on_summary(win, max(win.last - win.opened, 1.0))
+                except Exception as e:
+                    print(f"[DEDUP] Summary error: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "open_windows": len(self._windows),
+            "max_windows":  self.max_entries,
+            "cooldown_s":   self.cooldown,
+            "suppressed":   self.suppressed,
+            "evicted":      self.evicted,
+            "summaries":    self.summaries,
+        }
@@ -0,0 +1,201 @@
+"""
+alert_sink.py
+=============
+CyGuardian-X — Batched persistence for signature rule matches
+
+Rule hits are queued (bounded, non-blocking) by the capture thread and a
+single background writer drains them.  High / Critical detections outside
+the rule engine (known-bad IP, port scan, anomaly) come through
+submit_detection() once per pcap evidence file, so their network_alerts
+row carries the pcap link too; they write no log row.
+  • identical hits in a batch are coalesced into one alert/log row
+  • NetworkAlert + NetworkLog rows are COPYed in one transaction (copy_writer.py)
+  • SignatureRule.updated_at is touched once per rule per flush
+  • RansomwareRule.last_triggered is set once per rule per flush
+  • the alert row links the pcap evidence of its first hit (pcap_ring.py)
+A batch is flushed when it reaches BATCH_SIZE or FLUSH_INTERVAL elapses.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+QUEUE_SIZE     = 10_000   # pending matches before new ones are dropped
+BATCH_SIZE     = 500      # flush when this many matches are pending
+FLUSH_INTERVAL = 1.0      # ...or after this many seconds
+
+
+class AlertSink:
+    def __init__(self, maxsize: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.batch_size     = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+
+        # Counters — written by producers / the writer thread, read by the API
+        self.submitted     = 0
+        self.dropped       = 0
+        self.coalesced     = 0
+        self.rows_written  = 0
+        self.flushes       = 0
+        self.errors        = 0
+        self.last_flush_ms = 0.0
+
+    # ── producer side (capture thread) ───────────────────────
+    def submit(self, rule: Dict, src: str, dst: str, proto: str,
+               port: int, action: str, count: int = 1, window_s: float = None,
+               pcap: str = None) -> bool:
+        """
+        Queue one rule match (or a dedup-window summary of `count` hits over
+        `window_s` seconds). Never blocks; returns False if dropped.
+        """
+        try:
+            self._queue.put_nowait((rule["id"], rule["name"], rule["severity"],
+                                    src, dst, proto, port, action, count, window_s,
+                                    rule.get("table", "signature"), pcap))
+            self.submitted += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def submit_detection(self, severity: str, alert_type: str, desc: str,
+                         src: str, dst: str, proto: str, port: int, pcap: str = None) -> bool:
+        """Queue a non-rule alert (state.add_alert with evidence). Never blocks."""
+        try:
+            self._queue.put_nowait((alert_type, desc, severity, src, dst, proto, port,
+                                    "Alert", 1, None, "detection", pcap))
+            self.submitted += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    # ── writer side ──────────────────────────────────────────
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _coalesce(self, batch) -> Dict[Tuple, list]:
+        """Merge identical (rule, src, dst, proto, port, action) hits."""
+        merged: Dict[Tuple, list] = {}
+        for rule_id, name, severity, src, dst, proto, port, action, count, window_s, table, pcap in batch:
+            key = (table, rule_id, src, dst, proto, port, action)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [name, severity, count, window_s, pcap]
+            else:
+                entry[2] += count
+                entry[3] = max(entry[3] or 0, window_s or 0) or None
+                entry[4] = entry[4] or pcap
+                self.coalesced += 1
+        return merged
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        merged = self._coalesce(batch)
+        alerts, logs = [], []
+        touched = {"signature": set(), "ransomware": set()}
+        for (table, rule_id, src, dst, proto, port, action), (name, severity, count, window_s, pcap) in merged.items():
+            if window_s:
+                suffix = f" ({count} more hits in {window_s:.0f} s)"
+            else:
+                suffix = f" (x{count})" if count > 1 else ""
+            if table == "detection":
+                alerts.append({
+                    "severity": severity,
+                    "src_ip":   src,
+                    "dst_ip":   dst,
+                    "message":  f"{rule_id} — {name}{suffix}",
+                    "protocol": proto,
+                    "port":     port,
+                    "pcap_path": pcap,
+                })
+                continue
+            alerts.append({
+                "severity": severity,
+                "src_ip":   src,
+                "dst_ip":   dst,
+                "message":  f"[{rule_id}] {name} — {action}{suffix}",
+                "protocol": proto,
+                "port":     port,
+                "pcap_path": pcap,
+            })
+            logs.append({
+                "status":  str(action).upper(),
+                "src_ip":  src,
+                "event":   "RANSOMWARE_MATCH" if table == "ransomware" else "SIGNATURE_MATCH",
+                "result":  "SUCCESS" if action in ("Block", "Drop") else "INFO",
+                "message": f"Rule {rule_id} matched: {name} | {src}→{dst}:{port}{suffix}",
+            })
+            touched[table].add(rule_id)
+
+        try:
+            from database import SessionLocal
+            from models.network import NetworkAlert, NetworkLog
+            from models.configuration import SignatureRule, RansomwareRule
+            from sqlalchemy.sql import func
+            from copy_writer import insert_rows
+            db = SessionLocal()
+            try:
+                insert_rows(db, NetworkAlert, alerts)
+                insert_rows(db, NetworkLog, logs)
+                if touched["signature"]:
+                    db.query(SignatureRule)\
+                      .filter(SignatureRule.id.in_(touched["signature"]))\
+                      .update({SignatureRule.updated_at: func.now()}, synchronize_session=False)
+                if touched["ransomware"]:
+                    db.query(RansomwareRule)\
+                      .filter(RansomwareRule.id.in_(touched["ransomware"]))\
+                      .update({RansomwareRule.last_triggered: datetime.now().strftime("%Y-%m-%d %H:%M")},
+                              synchronize_session=False)
+                db.commit()
+                self.rows_written += len(alerts) + len(logs)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except Exception as e:
+            self.errors += 1
+            print(f"[ALERT SINK] Flush error ({len(batch)} matches lost): {e}")
+        self.flushes += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    # ── metrics ──────────────────────────────────────────────
+    def stats(self) -> Dict:
+        return {
+            "queue_depth":   self._queue.qsize(),
+            "queue_size":    self._queue.maxsize,
+            "submitted":     self.submitted,
+            "dropped":       self.dropped,
+            "coalesced":     self.coalesced,
+            "rows_written":  self.rows_written,
+            "flushes":       self.flushes,
+            "errors":        self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Global singleton
+alert_sink = AlertSink()
@@ -0,0 +1,319 @@
+"""
+anomaly_engine.py
+=================
+CyGuardian-X — Streaming anomaly detection driven by AnomalyConfig
+
+O(1) work per packet against running baselines (EWMA mean / variance
+with a span of baseline_window samples — seconds for rates, packets for
+sizes):
+  • packet size        per source host  — size > packet_size_mult × mean
+  • new connections/s  per source host  — rate > conn_rate_mult × mean
+  • DNS queries/s      per source host  — rate > dns_query_rate (absolute)
+  • bytes/s            per protocol     — rate > traffic_volume_mult × mean
+`sensitivity` scales every multiplier (Low ×1.5 · Medium ×1 · High ×0.67).
+With capture workers each process sees a host's flows split N ways, so
+set_shares(N) divides the absolute limits (dns_query_rate, MIN_CONN_RATE,
+MIN_VOLUME) by N; the EWMA multipliers are relative and need no change.
+Per-second counters roll over lazily on the next packet of that host /
+protocol, so there is no per-tick walk over all hosts.  Host state is an
+LRU capped at MAX_HOSTS.
+
+Each (host, kind) fires at most once per alert_cooldown: a live dashboard
+alert, plus a Detection row (det_type "Anomaly") written in batches.
+Config is re-read when PATCH /api/configuration/anomaly runs (apply())
+and polled every RELOAD_INTERVAL for worker processes.
+"""
+
+import collections
+import math
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+MAX_HOSTS      = 50_000    # per-host baselines kept (LRU)
+MIN_SAMPLES    = 30        # packets / seconds before a baseline may fire
+MIN_CONN_RATE  = 10        # new connections/s never flagged below this
+MIN_VOLUME     = 100_000   # bytes/s per protocol never flagged below this
+BATCH_SIZE     = 200
+FLUSH_INTERVAL = 2.0
+RELOAD_INTERVAL = 30
+
+_SENSITIVITY = {"Low": 1.5, "Medium": 1.0, "High": 0.67}
+
+
+class Ewma:
+    """Exponentially weighted mean / variance (West's incremental form)."""
+    __slots__ = ("mean", "var", "n")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var  = 0.0
+        self.n    = 0
+
+    def update(self, x: float, alpha: float):
+        self.n += 1
+        alpha = max(alpha, 1.0 / self.n)   # plain running mean while warming up
+        diff = x - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+
+    def decay(self, alpha: float, steps: int):
+        """Fold in `steps` zero samples at once (idle seconds)."""
+        keep = (1 - alpha) ** steps
+        self.var  = keep * (self.var + (1 - keep) * self.mean * self.mean)
+        self.mean *= keep
+        self.n += steps
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class _Rate:
+    """Per-second counter whose completed seconds feed an Ewma."""
+    __slots__ = ("sec", "count", "ewma")
+
+    def __init__(self, sec: int):
+        self.sec   = sec
+        self.count = 0
+        self.ewma  = Ewma()
+
+    def add(self, sec: int, n: int, alpha: float) -> int:
+        if sec != self.sec:
+            self.ewma.update(self.count, alpha)
+            gap = sec - self.sec - 1
+            if gap > 0:
+                self.ewma.decay(alpha, gap)
+            self.sec, self.count = sec, 0
+        self.count += n
+        return self.count
+
+
+class _Host:
+    __slots__ = ("size", "conns", "dns")
+
+    def __init__(self, sec: int):
+        self.size  = Ewma()
+        self.conns = _Rate(sec)
+        self.dns   = _Rate(sec)
+
+
+class AnomalyEngine:
+    def __init__(self):
+        self.enabled = True
+        self._hosts: "collections.OrderedDict[str, _Host]" = collections.OrderedDict()
+        self._protos: Dict[str, _Rate] = {}
+        self._fired: "collections.OrderedDict[Tuple[str, str], float]" = collections.OrderedDict()
+        self._queue: queue.Queue = queue.Queue(maxsize=5_000)
+        self._config_stamp = None
+        self._threads_started = False
+        self.shares = 1                # processes the traffic is split over
+        self.configure()
+
+        self.flagged = collections.Counter()   # by kind
+        self.dropped = 0
+        self.written = 0
+
+    # ── configuration ────────────────────────────────────────
+    def configure(self, enabled: bool = True, sensitivity: str = "Medium",
+                  baseline_window: int = 300, packet_size_mult: float = 3.0,
+                  conn_rate_mult: float = 5.0, dns_query_rate: int = 100,
+                  traffic_volume_mult: float = 10.0, alert_cooldown: int = 60):
+        scale = _SENSITIVITY.get(sensitivity, 1.0)
+        self.enabled         = bool(enabled)
+        self.sensitivity     = sensitivity
+        self.baseline_window = max(int(baseline_window), 10)
+        self.size_mult       = packet_size_mult * scale
+        self.conn_mult       = conn_rate_mult * scale
+        self.dns_query_rate  = dns_query_rate * scale
+        self.volume_mult     = traffic_volume_mult * scale
+        self.cooldown        = alert_cooldown
+        # EWMA span of baseline_window samples (seconds for rates, packets for size)
+        self.alpha = 2.0 / (self.baseline_window + 1)
+        self._share_limits()
+
+    def set_shares(self, n: int):
+        """This process sees 1/n of each host's flows (capture workers) — split the limits."""
+        self.shares = max(int(n), 1)
+        self._share_limits()
+
+    def _share_limits(self):
+        self.dns_limit     = self.dns_query_rate / self.shares
+        self.min_conn_rate = MIN_CONN_RATE / self.shares
+        self.min_volume    = MIN_VOLUME / self.shares
+
+    def apply(self, cfg):
+        """Take an AnomalyConfig row (or anything with its attributes)."""
+        self.configure(cfg.enabled, cfg.sensitivity or "Medium", cfg.baseline_window or 300,
+                       cfg.packet_size_mult or 3.0, cfg.conn_rate_mult or 5.0,
+                       cfg.dns_query_rate or 100, cfg.traffic_volume_mult or 10.0,
+                       cfg.alert_cooldown if cfg.alert_cooldown is not None else 60)
+        self._config_stamp = getattr(cfg, "updated_at", None)
+
+    def load_config(self) -> bool:
+        """Re-read AnomalyConfig if it changed. Returns True if applied."""
+        from database import SessionLocal
+        from models.configuration import AnomalyConfig
+        db = SessionLocal()
+        try:
+            cfg = db.query(AnomalyConfig).first()
+            if cfg is None or (cfg.updated_at == self._config_stamp and self._config_stamp):
+                return False
+            self.apply(cfg)
+        finally:
+            db.close()
+        from sketches import syn_tracker
+        syn_tracker.apply(cfg)
+        print(f"[ANOMALY] Config loaded — {'on' if self.enabled else 'off'}, "
+              f"{self.sensitivity}, baseline {self.baseline_window}s")
+        return True
+
+    # ── packet path ──────────────────────────────────────────
+    def observe(self, meta, new_flow: bool, now: float = None):
+        if not self.enabled:
+            return
+        now = now or time.time()
+        sec = int(now)
+        src = meta.src
+
+        host = self._hosts.get(src)
+        if host is None:
+            if len(self._hosts) >= MAX_HOSTS:
+                self._hosts.popitem(last=False)
+            host = self._hosts[src] = _Host(sec)
+        else:
+            self._hosts.move_to_end(src)
+
+        # Packet size vs this host's running mean
+        size = host.size
+        if size.n >= MIN_SAMPLES and meta.length > self.size_mult * size.mean \
+                and meta.length > size.mean + 3 * size.std:
+            self._flag(meta, "packet_size", meta.length, size.mean, self.size_mult, now,
+                       f"{meta.length} B packet — {meta.length / size.mean:.1f}x the "
+                       f"{size.mean:.0f} B baseline from {src}")
+        size.update(meta.length, self.alpha)
+
+        # New connections per second
+        if new_flow:
+            rate = host.conns.add(sec, 1, self.alpha)
+            base = host.conns.ewma
+            if base.n >= MIN_SAMPLES and rate >= self.min_conn_rate and rate > self.conn_mult * base.mean:
+                self._flag(meta, "conn_rate", rate, base.mean, self.conn_mult, now,
+                           f"{rate} new connections/s from {src} — baseline {base.mean:.1f}/s")
+
+        # DNS query rate (absolute)
+        if meta.dport == 53:
+            rate = host.dns.add(sec, 1, self.alpha)
+            if rate > self.dns_limit:
+                self._flag(meta, "dns_rate", rate, self.dns_limit, 1.0, now,
+                           f"{rate} DNS queries/s from {src} (limit {self.dns_limit:.0f}/s)")
+
+        # Traffic volume per protocol
+        proto = self._protos.get(meta.proto)
+        if proto is None:
+            proto = self._protos[meta.proto] = _Rate(sec)
+        volume = proto.add(sec, meta.length, self.alpha)
+        base = proto.ewma
+        if base.n >= MIN_SAMPLES and volume >= self.min_volume and volume > self.volume_mult * base.mean:
+            self._flag(meta, "volume", volume, base.mean, self.volume_mult, now,
+                       f"{meta.proto} at {volume / 1e6:.2f} MB/s — "
+                       f"{volume / max(base.mean, 1):.1f}x the {base.mean / 1e6:.2f} MB/s baseline",
+                       key=meta.proto)
+
+    def _flag(self, meta, kind: str, value: float, baseline: float, mult: float,
+              now: float, explanation: str, key: str = None):
+        fkey = (key or meta.src, kind)
+        until = self._fired.get(fkey)
+        if until is not None and until > now:
+            return
+        self._fired[fkey] = now + self.cooldown
+        self._fired.move_to_end(fkey)
+        if len(self._fired) > MAX_HOSTS:
+            self._fired.popitem(last=False)
+        self.flagged[kind] += 1
+
+        ratio = value / baseline if baseline else float("inf")
+        severe = ratio >= 2 * mult
+        severity = "High" if severe else "Medium"
+        from network_monitor import state
+        state.add_alert(severity, meta.src, f"Anomaly — {kind.replace('_', ' ')}", explanation, meta=meta)
+        try:
+            self._queue.put_nowait({
+                "timestamp":      datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M"),
+                "src_ip":         meta.src,
+                "dst_ip":         meta.dst,
+                "protocol":       meta.proto,
+                "port":           meta.dport,
+                "det_type":       "Anomaly",
+                "severity":       severity,
+                "classification": "Malicious" if severe else "Suspicious",
+                "explanation":    explanation,
+            })
+        except queue.Full:
+            self.dropped += 1
+
+    # ── background threads ───────────────────────────────────
+    def _writer(self):
+        from database import SessionLocal
+        from models.incident import Detection
+        while True:
+            batch = []
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            db = SessionLocal()
+            try:
+                db.bulk_insert_mappings(Detection, batch)
+                db.commit()
+                self.written += len(batch)
+            except Exception as e:
+                db.rollback()
+                print(f"[ANOMALY] Detection write error: {e}")
+            finally:
+                db.close()
+
+    def _reloader(self):
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                self.load_config()
+            except Exception as e:
+                print(f"[ANOMALY] Config reload failed: {e}")
+
+    def start(self):
+        try:
+            self.load_config()
+        except Exception as e:
+            print(f"[ANOMALY] Could not load config ({e}) — using defaults")
+        if self._threads_started:
+            return
+        self._threads_started = True
+        threading.Thread(target=self._writer, daemon=True).start()
+        threading.Thread(target=self._reloader, daemon=True).start()
+
+    def stats(self):
+        return {
+            "enabled":     self.enabled,
+            "sensitivity": self.sensitivity,
+            "shares":      self.shares,
+            "hosts":       len(self._hosts),
+            "flagged":     dict(self.flagged),
+            "queued":      self._queue.qsize(),
+            "written":     self.written,
+            "dropped":     self.dropped,
+        }
+
+
+# Global singleton
+anomaly_engine = AnomalyEngine()
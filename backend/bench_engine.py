@@ -0,0 +1,689 @@
+"""
+bench_engine.py
+===============
+CyGuardian-X — Sensor micro-benchmarks (no DB / no root needed)
+
+  python bench_engine.py                # run every suite
+  python bench_engine.py signatures     # run one suite
+
+Suites:
+  signatures — packets/sec of signature matching vs. rule count,
+               literal prefilter vs. the old per-rule regex scan
+  buckets    — HTTPS packets against SSH/RDP/SMB-only rule sets; the
+               protocol/port index should make rule count irrelevant
+  snapshot   — per-packet cost of taking the rule snapshot: old
+               lock + list copy vs. reading the published RuleSet
+  reputation — known-bad IP lookups vs. list size: the old
+               `ip in KNOWN_BAD_IPS` list vs. ReputationSet (exact + CIDR)
+  meta       — per-packet field extraction on Scapy packets: the old
+               haslayer() / pkt["LAYER"] chains vs PacketMeta.from_packet
+  counters   — packet-path counter updates while a stats thread holds the
+               state lock (as the old ping-under-lock did): global lock vs
+               per-thread shards — throughput and worst-case stall
+  capture    — per-frame decode: Scapy Ether() vs capture_backend.decode_frame,
+               alone and through the full _process_real_packet pipeline
+  workers    — full _process_real_packet pipeline across 1..N flow-sharded
+               worker processes (scales with cores, not with this thread)
+  sketches   — SYN tracking under a randomised-source flood with a port
+               scanner mixed in: exact per-source dicts vs the sliding-window
+               sketches, alone and split over 4 flow-sharded trackers —
+               memory, µs per SYN and which attackers fired
+  anomaly    — per-host connection and DNS rate bursts through 1, 4 and 8
+               flow-sharded anomaly engines, with and without set_shares —
+               which detectors fired
+  profiles   — replay the synthetic traffic profiles (web, SYN flood, port
+               scan, SMB worm) through the sensor with the seeded rules:
+               pkts/sec, per-stage latency p50/p95/p99 and drop counts.
+               BENCH_PCAP=/path/file.pcap adds a real capture to the set.
+  copy       — captured_packets ingestion at 10k / 50k / 100k offered
+               rows/sec: the old 50-row INSERT batches vs copy_writer's
+               adaptive COPY, into a scratch table.  The one suite that
+               needs PostgreSQL (DATABASE_URL); skipped without it.
+"""
+
+import ast
+import os
+import queue
+import random
+import re
+import string
+import sys
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import signature_engine as se
+from ip_reputation import ReputationSet
+from packet_meta import PacketMeta
+
+random.seed(1337)
+
+_WORDS = ["admin", "login", "select", "update", "passwd", "token", "cookie",
+          "session", "upload", "backup", "shell", "config", "export", "query"]
+_PROTOS = ["HTTP", "HTTPS", "TCP", "UDP", "DNS", "SSH", "ANY"]
+
+
+def _rand_word(n=8):
+    return "".join(random.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def _synthetic_rows(count):
+    """Signature rows shaped like the seeded ones — literal + wildcard + literal."""
+    rows = []
+    for i in range(count):
+        pattern = f"{_rand_word()}{i}.*{random.choice(_WORDS)}"
+        rows.append(SimpleNamespace(
+            id=f"SIG-{i:05d}", name=f"Synthetic rule {i}", category="Bench",
+            severity="Medium", protocol=random.choice(_PROTOS),
+            action="Alert", pattern=pattern,
+        ))
+    return rows
+
+
+def _synthetic_packets(rows, count=2000, hit_ratio=0.02):
+    """HTTP-ish payloads; a small fraction embed a rule's trigger string."""
+    pkts = []
+    for _ in range(count):
+        body = " ".join(random.choice(_WORDS) + _rand_word(4) for _ in range(60))
+        if rows and random.random() < hit_ratio:
+            r = random.choice(rows)
+            lit = r.pattern.split(".*")
+            body = f"{lit[0]} {body} {lit[1]}"
+        pkts.append(("10.0.0.5", "10.0.0.1", "HTTP", 80,
+                     f"GET /{_rand_word()} HTTP/1.1\r\nHost: x\r\n\r\n{body}"))
+    return pkts
+
+
+def _meta(src, dst, proto, port, payload):
+    """PacketMeta for a synthetic (src, dst, proto, port, payload) tuple."""
+    return PacketMeta(src, dst, "TCP", 40000, port, 0x18, len(payload) + 54,
+                      payload.encode())
+
+
+def _naive_scan(rules, src, dst, proto, port, payload):
+    """The pre-prefilter algorithm: every rule, every packet, full regex."""
+    matched = []
+    payload = payload.encode()
+    for rule in rules:
+        if not se._proto_matches(rule["protocol"], proto, port):
+            continue
+        if rule["regex"] and payload and rule["regex"].search(payload):
+            matched.append(rule)
+    return matched
+
+
+def _pps(fn, packets, budget=2.0):
+    """Run fn over the packet list until `budget` seconds elapse."""
+    n = 0
+    start = time.perf_counter()
+    while True:
+        for p in packets:
+            fn(*p)
+        n += len(packets)
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return n / elapsed
+
+
+def bench_signatures():
+    print("\n── Signature matching: packets/sec vs rule count ──")
+    print(f"{'rules':>8} {'prefilter':>12} {'naive':>12} {'speedup':>8}")
+    for count in (10, 100, 1_000, 10_000):
+        rows  = _synthetic_rows(count)
+        rules = [se._compile_rule(r) for r in rows]
+        ruleset = se.RuleSet(rules)
+        packets = _synthetic_packets(rows, count=500)
+
+        metas = [(_meta(*p),) for p in packets]
+        fast = _pps(lambda m: se.find_matches(ruleset, m), metas)
+        slow = _pps(lambda s, d, pr, po, pl: _naive_scan(
+            rules, s, d, pr, po, pl), packets, budget=1.0 if count < 10_000 else 3.0)
+        print(f"{count:>8} {fast:>12,.0f} {slow:>12,.0f} {fast / slow:>7.1f}x")
+
+
+def bench_buckets():
+    print("\n── Protocol/port buckets: HTTPS packets vs SSH/RDP/SMB rules ──")
+    print(f"{'rules':>8} {'pkts/sec':>12}")
+    for count in (10, 1_000, 10_000):
+        rows = _synthetic_rows(count)
+        for r in rows:
+            r.protocol = random.choice(["SSH", "RDP", "SMB"])
+        rules = [se._compile_rule(r) for r in rows]
+        ruleset = se.RuleSet(rules)
+        packets = [("10.0.0.5", "10.0.0.1", "HTTPS", 443, p[4])
+                   for p in _synthetic_packets(rows, count=500, hit_ratio=0.5)]
+        metas = [(_meta(*p),) for p in packets]
+        pps = _pps(lambda m: se.find_matches(ruleset, m), metas, budget=1.0)
+        print(f"{count:>8} {pps:>12,.0f}")
+
+
+def bench_snapshot():
+    print("\n── Rule snapshot per packet: lock+copy vs published RuleSet ──")
+    print(f"{'rules':>8} {'copy ns':>10} {'copy B':>10} {'ref ns':>10} {'ref B':>8}")
+    lock = threading.Lock()
+    n = 20_000
+    for count in (10, 100, 1_000, 10_000):
+        rules = [se._compile_rule(r) for r in _synthetic_rows(count)]
+        rule_list = list(rules)
+        se._install_rules(rules)
+
+        def old_snapshot():
+            with lock:
+                return list(rule_list)
+
+        def new_snapshot():
+            return se._ruleset
+
+        row = [count]
+        for fn in (old_snapshot, new_snapshot):
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            ns = (time.perf_counter() - start) / n * 1e9
+            tracemalloc.start()
+            for _ in range(100):
+                fn()
+            allocated = tracemalloc.get_traced_memory()[1]  # peak = one snapshot
+            tracemalloc.stop()
+            row += [ns, allocated]
+        print(f"{row[0]:>8} {row[1]:>10,.0f} {row[2]:>10,.0f} {row[3]:>10,.0f} {row[4]:>8,.0f}")
+
+
+def _ns_per_lookup(fn, ips, budget=1.0):
+    n = 0
+    start = time.perf_counter()
+    while True:
+        for ip in ips:
+            fn(ip)
+        n += len(ips)
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / n * 1e9
+
+
+def bench_reputation():
+    print("\n── Known-bad IP lookup: list vs ReputationSet (ns/lookup) ──")
+    print(f"{'entries':>10} {'list':>12} {'set hit':>10} {'set miss':>10} {'cidr hit':>10}")
+    for count in (10, 1_000, 100_000, 1_000_000):
+        ips = [f"{random.randint(1, 223)}.{random.randint(0, 255)}."
+               f"{random.randint(0, 255)}.{random.randint(1, 254)}" for _ in range(count)]
+        rep = ReputationSet()
+        rep.replace((ip, "bench") for ip in ips)
+        for i in range(64):  # a few ranges so misses walk the prefix tables
+            rep.add(f"100.{i}.0.0/16", "bench")
+            rep.add(f"198.18.{i}.0/24", "bench")
+        hits   = random.sample(ips, min(1_000, count))
+        misses = [f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.1" for _ in range(1_000)]
+        ranged = [f"100.{random.randint(0, 63)}.7.9" for _ in range(1_000)]
+
+        probe = misses[:max(1, 20_000 // count)]  # a list scan at 1M is ~ms per lookup
+        slow = _ns_per_lookup(lambda ip: ip in ips, probe, budget=0.5)
+        hit  = _ns_per_lookup(rep.lookup, hits)
+        miss = _ns_per_lookup(rep.lookup, misses)
+        rng  = _ns_per_lookup(rep.lookup, ranged)
+        print(f"{count:>10,} {slow:>12,.0f} {hit:>10,.0f} {miss:>10,.0f} {rng:>10,.0f}")
+
+
+def _synthetic_frames(count=20_000, flows=500):
+    from scapy.layers.l2 import Ether
+    from scapy.layers.inet import IP, TCP, UDP
+    from scapy.packet import Raw
+    templates = []
+    for _ in range(flows):
+        src = f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        dport = random.choice([80, 443, 53, 22, 445, 3389, 8080])
+        l4 = UDP(sport=random.randint(1024, 65535), dport=dport) if dport == 53 else \
+             TCP(sport=random.randint(1024, 65535), dport=dport, flags="PA")
+        body = " ".join(random.choice(_WORDS) for _ in range(12)).encode()
+        templates.append(bytes(Ether() / IP(src=src, dst="192.168.1.10") / l4 / Raw(body)))
+    return [random.choice(templates) for _ in range(count)]
+
+
+def _legacy_fields(pkt):
+    """The pre-PacketMeta extraction, as _process_real_packet + callees did it."""
+    if not pkt.haslayer("IP"):
+        return None
+    src, dst, length = pkt["IP"].src, pkt["IP"].dst, len(pkt)
+    if pkt.haslayer("TCP"):
+        proto, port = "TCP", pkt["TCP"].dport
+    elif pkt.haslayer("UDP"):
+        proto, port = "UDP", pkt["UDP"].dport
+    elif pkt.haslayer("ICMP"):
+        proto, port = "ICMP", 0
+    else:
+        proto, port = "OTHER", 0
+    port_proto_map = {
+        80:"HTTP", 443:"HTTPS", 53:"DNS", 22:"SSH",
+        21:"FTP", 25:"SMTP", 3306:"MySQL", 5432:"PostgreSQL",
+        3389:"RDP", 8080:"HTTP-ALT", 8443:"HTTPS-ALT",
+    }
+    display = port_proto_map.get(port, proto)
+    if pkt.haslayer("TCP"):                      # _detect_threats
+        flags = pkt["TCP"].flags == 0x02
+    if proto == "TCP" and pkt.haslayer("TCP"):
+        port = pkt["TCP"].dport
+    payload = ""
+    if pkt.haslayer("Raw"):                      # signature payload
+        payload = pkt["Raw"].load.decode("utf-8", errors="ignore")
+    if pkt.haslayer("TCP"):                      # built-in detectors
+        flags = pkt["TCP"].flags
+    return src, dst, display, port, length, payload
+
+
+def bench_meta():
+    from scapy.layers.l2 import Ether
+    packets = [(Ether(f),) for f in _synthetic_frames(count=2_000)]
+    print("\n── Field extraction on Scapy packets (pkts/sec) ──")
+    old = _pps(_legacy_fields, packets, budget=1.0)
+    new = _pps(lambda p: PacketMeta.from_packet(p).payload, packets, budget=1.0)
+    print(f"{'legacy':>10} {old:>12,.0f}\n{'PacketMeta':>10} {new:>12,.0f}  ({new / old:.1f}x)")
+
+
+def bench_counters():
+    import network_monitor as nm
+    print("\n── Counter updates with a 50 ms lock holder every 200 ms (2 threads) ──")
+    print(f"{'mode':>8} {'ops/sec':>12} {'p99 µs':>9} {'max ms':>9}")
+
+    def run(update, st):
+        stop = time.perf_counter() + 2.0
+        worst = []
+
+        def holder():
+            while time.perf_counter() < stop:
+                with st.lock:
+                    time.sleep(0.05)
+                time.sleep(0.15)
+
+        def producer():
+            lat = []
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter_ns()
+                update(st)
+                lat.append(time.perf_counter_ns() - t0)
+            worst.append(lat)
+
+        threads = [threading.Thread(target=holder)] + \
+                  [threading.Thread(target=producer) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        lat = worst[0] + worst[1]
+        return len(lat) / 2.0, _pct(lat, .99), max(lat) / 1e6
+
+    def locked(st):
+        with st.lock:
+            st.total_packets += 1
+            st.proto_counts["HTTP"] += 1
+
+    def sharded(st):
+        st.count_packet("HTTP", 100)
+
+    for name, fn in (("lock", locked), ("shards", sharded)):
+        ops, p99, worst = run(fn, nm.MonitorState())
+        print(f"{name:>8} {ops:>12,.0f} {p99:>9.1f} {worst:>9.1f}")
+
+
+def bench_capture():
+    import network_monitor as nm
+    from capture_backend import decode_frame
+    from scapy.layers.l2 import Ether
+    frames = _synthetic_frames(count=5_000)
+    print("\n── Frame decode: Scapy vs capture_backend.Frame (pkts/sec) ──")
+    print(f"{'stage':>10} {'scapy':>12} {'frame':>12} {'speedup':>8}")
+    rows = [
+        ("decode",   lambda f: Ether(f), lambda f: decode_frame(memoryview(f))),
+        ("pipeline", lambda f: nm._process_real_packet(Ether(f)),
+                     lambda f: nm._process_real_packet(decode_frame(memoryview(f)))),
+    ]
+    for stage, slow_fn, fast_fn in rows:
+        slow = _pps(slow_fn, [(f,) for f in frames], budget=1.0)
+        fast = _pps(fast_fn, [(f,) for f in frames], budget=1.0)
+        print(f"{stage:>10} {slow:>12,.0f} {fast:>12,.0f} {fast / slow:>7.1f}x")
+
+
+def _seeded_rules(name: str = "SIG_RULES"):
+    """SIG_RULES / RAN_RULES from seed_configuration.py, read without touching the DB."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_configuration.py")
+    for node in ast.parse(open(path).read()).body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", "") == name:
+            return [SimpleNamespace(**r) for r in ast.literal_eval(node.value) if r["enabled"]]
+    return []
+
+
+def _seeded_ruleset():
+    """Signature + ransomware seed rules compiled into one rule list."""
+    return ([se._compile_rule(r) for r in _seeded_rules("SIG_RULES")] +
+            [se._compile_rule(r, "ransomware") for r in _seeded_rules("RAN_RULES")])
+
+
+class _TimedQueue(queue.Queue):
+    """_packet_queue stand-in that times put_nowait and counts drops."""
+
+    def __init__(self, maxsize, samples):
+        super().__init__(maxsize=maxsize)
+        self.samples = samples
+        self.drops = 0
+
+    def put_nowait(self, item):
+        start = time.perf_counter_ns()
+        try:
+            super().put_nowait(item)
+        except queue.Full:
+            self.drops += 1
+            raise
+        finally:
+            self.samples.append(time.perf_counter_ns() - start)
+
+
+def _timed(fn, samples):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter_ns() - start)
+    return wrapper
+
+
+def _pct(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1000
+
+
+def _run_profile(name, records):
+    """Replay records unthrottled through the instrumented pipeline."""
+    import network_monitor as nm
+    from alert_sink import alert_sink
+    from capture_backend import decode_frame
+    from pcap_replay import PcapReplay
+
+    stages = {s: [] for s in ("decode", "detect", "signature", "enqueue", "total")}
+    orig = (nm.state, nm._detect_threats, nm.match_packet, nm._packet_queue)
+    nm.state = nm.MonitorState()
+    nm._detect_threats = _timed(orig[1], stages["detect"])
+    nm.match_packet    = _timed(orig[2], stages["signature"])
+    nm._packet_queue   = _TimedQueue(orig[3].maxsize, stages["enqueue"])
+    sink_dropped = alert_sink.dropped
+
+    def drain():   # stands in for the DB writer
+        while True:
+            nm._packet_queue.get()
+    threading.Thread(target=drain, daemon=True).start()
+
+    replay = PcapReplay(records, speed=0)
+    start = time.perf_counter()
+    try:
+        for _, frame, length in replay.paced():
+            t0 = time.perf_counter_ns()
+            pkt = decode_frame(memoryview(frame), length)
+            t1 = time.perf_counter_ns()
+            if pkt is not None:
+                nm._process_real_packet(pkt)
+            stages["decode"].append(t1 - t0)
+            stages["total"].append(time.perf_counter_ns() - t0)
+        elapsed = time.perf_counter() - start
+        drops = {
+            "packet_q": nm._packet_queue.drops,
+            "alert_sink": alert_sink.dropped - sink_dropped,
+        }
+        alerts = nm.state.aggregate()["detected"]
+    finally:
+        nm.state, nm._detect_threats, nm.match_packet, nm._packet_queue = orig
+
+    print(f"\n{name}: {replay.packets:,} pkts  {replay.packets / elapsed:,.0f} pkts/sec  "
+          f"alerts={alerts}  drops={drops}")
+    print(f"  {'stage':>10} {'calls':>8} {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9}")
+    for stage, samples in stages.items():
+        print(f"  {stage:>10} {len(samples):>8,} {_pct(samples, .50):>9.1f} "
+              f"{_pct(samples, .95):>9.1f} {_pct(samples, .99):>9.1f}")
+
+
+def bench_profiles():
+    from traffic_profiles import PROFILES
+    from pcap_replay import read_pcap
+    se._install_rules(_seeded_ruleset())
+    print("\n── Sensor replay: synthetic traffic profiles (unthrottled) ──")
+    for name, build in PROFILES.items():
+        _run_profile(name, build(20_000))
+    if os.getenv("BENCH_PCAP"):
+        _run_profile(os.getenv("BENCH_PCAP"), list(read_pcap(os.getenv("BENCH_PCAP"))))
+
+
+def _syn_meta(src, dst, dport):
+    return PacketMeta(src, dst, "TCP", random.randint(1024, 65535), dport, 0x02, 54)
+
+
+def _exact_syn_tracking(stream):
+    counts, ports = {}, {}
+    for m in stream:
+        counts[m.src] = counts.get(m.src, 0) + 1
+        ports.setdefault(m.src, set()).add(m.dport)
+    return [("port_scan", ip) for ip, p in ports.items() if len(p) >= 20]
+
+
+def _sketch_syn_tracking(stream):
+    from sketches import SynTracker
+    tracker = SynTracker()
+    fired, now = set(), 0.0
+    for m in stream:
+        now += 0.00002                       # 50k SYN/s
+        for kind in tracker.observe(m, now):
+            fired.add((kind, m.src if kind == "port_scan" else m.dst))
+    return sorted(fired)
+
+
+def _sharded_syn_tracking(stream, workers=4):
+    """The sketch tracker as N flow-sharded capture workers run it."""
+    import zlib
+    from sketches import SynTracker
+    trackers = [SynTracker() for _ in range(workers)]
+    for tracker in trackers:
+        tracker.set_shares(workers)
+    fired, now = set(), 0.0
+    for m in stream:
+        now += 0.00002
+        a, b = sorted(((m.src, m.sport), (m.dst, m.dport)))
+        tracker = trackers[zlib.crc32(f"{a}|{b}".encode()) % workers]
+        for kind in tracker.observe(m, now):
+            fired.add((kind, m.src if kind == "port_scan" else m.dst))
+    return sorted(fired)
+
+
+def bench_sketches():
+    scanner, target = "45.33.32.156", "192.168.1.10"
+    stream = []
+    for i in range(500_000):
+        src = f"{random.randint(11, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        stream.append(_syn_meta(src, target, 80))
+        if i % 50 == 0:
+            stream.append(_syn_meta(scanner, target, 1 + (i // 50) % 65535))
+    print(f"\n── SYN tracking: {len(stream):,} SYNs, randomised-source flood + 1 scanner ──")
+    print(f"{'tracker':>10} {'peak MB':>9} {'µs/SYN':>8}  fired")
+    for name, fn in (("exact", _exact_syn_tracking), ("sketches", _sketch_syn_tracking),
+                     ("4 workers", _sharded_syn_tracking)):
+        start = time.perf_counter()
+        fired = fn(stream)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        fn(stream)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        print(f"{name:>10} {peak:>9.1f} {elapsed / len(stream) * 1e6:>8.2f}  {fired}")
+
+
+def _anomaly_stream():
+    """A host at 2 new conns/s for a minute, then a 30/s burst; another at 150 DNS queries/s."""
+    stream, sport = [], 1024
+    for sec in range(70):
+        conns = 30 if sec >= 65 else 2
+        for i in range(conns):
+            sport += 1
+            stream.append((sec + i / conns, PacketMeta("10.0.0.31", "10.0.0.5", "TCP", sport, 443, 0x02, 60)))
+        if sec >= 60:
+            for i in range(150):
+                sport += 1
+                stream.append((sec + i / 150, PacketMeta("10.0.0.44", "10.0.0.1", "UDP", sport, 53, 0, 70)))
+    return stream
+
+
+def _run_anomaly(stream, workers: int, shares: bool):
+    import zlib
+    from anomaly_engine import AnomalyEngine
+    engines = [AnomalyEngine() for _ in range(workers)]
+    for engine in engines:
+        engine.cooldown = 3600
+        if shares:
+            engine.set_shares(workers)
+    for now, m in stream:
+        a, b = sorted(((m.src, m.sport), (m.dst, m.dport)))
+        engine = engines[zlib.crc32(f"{a}|{b}".encode()) % workers]
+        engine.observe(m, True, 1_700_000_000 + now)
+    return sorted({kind for engine in engines for kind in engine.flagged})
+
+
+def bench_anomaly():
+    stream = _anomaly_stream()
+    print(f"\n── Anomaly rates across flow-sharded workers ({len(stream):,} packets) ──")
+    print(f"{'workers':>8} {'set_shares':>11}  fired (want conn_rate, dns_rate)")
+    for workers, shares in ((1, False), (4, False), (4, True), (8, True)):
+        print(f"{workers:>8} {str(shares):>11}  {_run_anomaly(stream, workers, shares)}")
+
+
+def bench_workers():
+    import os
+    import network_monitor as nm
+    from capture_workers import WorkerPool
+    frames = _synthetic_frames()
+    print(f"\n── Flow-sharded worker processes ({os.cpu_count()} CPUs, {len(frames):,} frames) ──")
+    print(f"{'workers':>8} {'pkts/sec':>12} {'dropped':>8} {'per-worker':>30}")
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        pool = WorkerPool(workers, nm.MonitorState(), services=False)
+        pool.start()
+        time.sleep(3 + workers)  # let the spawned interpreters import scapy
+        start = time.perf_counter()
+        pool.feed(frames)
+        pool.stop(timeout=120)
+        elapsed = time.perf_counter() - start
+        done = sum(pool.processed)
+        print(f"{workers:>8} {done / elapsed:>12,.0f} {pool.dropped:>8} {str(pool.processed):>30}")
+
+
+COPY_RATES    = (10_000, 50_000, 100_000)
+COPY_DURATION = 3.0            # seconds of offered load per run
+COPY_SCRATCH  = "bench_captured_packets"
+
+
+def _packet_row(i):
+    return {"src_ip": f"10.0.{i % 250}.{i % 200 + 1}", "dst_ip": "192.168.1.10",
+            "protocol": "HTTPS", "port": 443, "length": 60 + i % 1400,
+            "status": "Established", "flagged": False}
+
+
+def _insert_batches(engine, table):
+    """The old _db_writer: 50-row batches, a fresh session per flush."""
+    from sqlalchemy.orm import Session
+
+    def write(batch):
+        with Session(engine) as db:
+            db.execute(table.insert(), batch)
+            db.commit()
+    return write, 50
+
+
+def _ingest(rate, write, batch_size):
+    """Offer `rate` rows/s for COPY_DURATION into a 20k queue; drain with write()."""
+    q = queue.Queue(maxsize=20_000)
+    stop = threading.Event()
+    written = [0]
+
+    def drain():
+        while not stop.is_set() or not q.empty():
+            batch = []
+            try:
+                batch.append(q.get(timeout=0.1))
+                while len(batch) < batch_size():
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                write(batch)
+                written[0] += len(batch)
+
+    t = threading.Thread(target=drain, daemon=True)
+    t.start()
+    start = time.perf_counter()
+    offered = dropped = 0
+    while time.perf_counter() - start < COPY_DURATION:
+        due = int((time.perf_counter() - start) * rate)
+        while offered < due:
+            try:
+                q.put_nowait(_packet_row(offered))
+            except queue.Full:
+                dropped += 1
+            offered += 1
+        time.sleep(0.001)
+    stop.set()
+    t.join(timeout=60)
+    elapsed = time.perf_counter() - start
+    return written[0] / elapsed, dropped / max(offered, 1)
+
+
+def bench_copy():
+    from sqlalchemy import MetaData, text
+    from database import engine
+    from models.network import CapturedPacket
+    from copy_writer import CopyWriter, supports_copy
+    print("\n── captured_packets ingestion: INSERT batches vs COPY ──")
+    if not supports_copy(engine):
+        print(f"  needs PostgreSQL + psycopg2 (DATABASE_URL is {engine.dialect.name}) — skipped")
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {COPY_SCRATCH}"))
+            conn.execute(text(f"CREATE TABLE {COPY_SCRATCH} (LIKE captured_packets INCLUDING DEFAULTS)"))
+    except Exception as e:
+        print(f"  cannot reach PostgreSQL ({e}) — skipped")
+        return
+    scratch = CapturedPacket.__table__.to_metadata(MetaData(), name=COPY_SCRATCH)
+    print(f"{'offered/s':>10} {'writer':>7} {'rows/s':>10} {'dropped':>8} {'batch':>6}")
+    try:
+        for rate in COPY_RATES:
+            write, size = _insert_batches(engine, scratch)
+            done, lost = _ingest(rate, write, lambda: size)
+            print(f"{rate:>10,} {'insert':>7} {done:>10,.0f} {lost:>8.1%} {size:>6}")
+
+            writer = CopyWriter(CapturedPacket, name="bench", table_name=COPY_SCRATCH)
+            done, lost = _ingest(rate, writer.write, lambda: writer.batch_size)
+            print(f"{rate:>10,} {'copy':>7} {done:>10,.0f} {lost:>8.1%} {writer.batch_size:>6}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {COPY_SCRATCH}"))
+
+
+SUITES = {
+    "signatures": bench_signatures,
+    "buckets":    bench_buckets,
+    "snapshot":   bench_snapshot,
+    "reputation": bench_reputation,
+    "meta":       bench_meta,
+    "counters":   bench_counters,
+    "capture":    bench_capture,
+    "workers":    bench_workers,
+    "sketches":   bench_sketches,
+    "anomaly":    bench_anomaly,
+    "profiles":   bench_profiles,
+    "copy":       bench_copy,
+}
+
+
+if __name__ == "__main__":
+    wanted = sys.argv[1:] or list(SUITES)
+    for name in wanted:
+        if name not in SUITES:
+            print(f"Unknown suite '{name}'. Available: {', '.join(SUITES)}")
+            sys.exit(1)
+        SUITES[name]()
@@ -0,0 +1,346 @@
+"""
+capture_backend.py
+==================
+CyGuardian-X — Pluggable packet capture backends
+
+CAPTURE_BACKEND (network_monitor.py) selects how frames reach the pipeline:
+  scapy       — scapy.sniff(), a full layered Packet per frame (original mode)
+  tpacket_v3  — AF_PACKET socket with a memory-mapped TPACKET_V3 RX ring;
+                the kernel fills whole blocks of frames, we walk them in place
+  rawsocket   — plain AF_PACKET recv() into a reused buffer (no ring)
+
+Non-Scapy backends hand the pipeline a `Frame`: only the fields it needs are
+decoded (src, dst, proto, ports, TCP flags, length) and the payload is a
+zero-copy memoryview slice.  Frame answers the Scapy calls the pipeline makes
+(haslayer / pkt["TCP"].dport / pkt["Raw"].load / len / summary) and only
+builds a real Scapy packet if something asks for scapy().
+
+A Frame from a ring backend points into kernel memory that is handed back
+once the next frame is requested — call detach() to keep it.
+A BPF filter (CAPTURE_FILTER) is compiled with Scapy/libpcap when available.
+"""
+
+import mmap
+import select
+import socket
+import struct
+from typing import Callable, Iterator, Optional, Tuple
+
+ETH_P_ALL         = 0x0003
+SOL_PACKET        = getattr(socket, "SOL_PACKET", 263)
+PACKET_RX_RING    = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION    = 10
+TPACKET_V3        = 2
+TP_STATUS_KERNEL  = 0
+TP_STATUS_USER    = 1
+
+BLOCK_SIZE    = 1 << 22     # 4 MiB per ring block
+BLOCK_COUNT   = 64          # 256 MiB ring
+FRAME_SIZE    = 2048
+BLOCK_TIMEOUT = 10          # ms before the kernel retires a partly-filled block
+POLL_TIMEOUT  = 100         # ms
+
+_U32   = struct.Struct("=I")
+_REQ3  = struct.Struct("=7I")         # struct tpacket_req3
+_HDR3  = struct.Struct("=6IH")        # tpacket3_hdr up to tp_mac
+_STATS = struct.Struct("=3I")         # struct tpacket_stats_v3
+_HH    = struct.Struct("!HH")
+
+_IP_PROTOS = {6: "TCP", 17: "UDP", 1: "ICMP", 58: "ICMP"}
+
+
+# ── Decoded frame ──────────────────────────────────────────────
+class Frame:
+    """Minimal decoded frame with a Scapy-compatible surface."""
+
+    __slots__ = ("raw", "length", "src", "dst", "proto", "sport", "dport",
+                 "flags", "payload", "_layers", "_pkt")
+
+    def __init__(self, raw, length, src="", dst="", proto="OTHER", sport=0,
+                 dport=0, flags=0, payload=b"", layers=frozenset()):
+        self.raw     = raw
+        self.length  = length
+        self.src     = src
+        self.dst     = dst
+        self.proto   = proto
+        self.sport   = sport
+        self.dport   = dport
+        self.flags   = flags
+        self.payload = payload
+        self._layers = layers
+        self._pkt    = None
+
+    # Scapy-style access — every present layer resolves to the frame itself
+    def haslayer(self, name) -> bool:
+        return name in self._layers
+
+    def __getitem__(self, name):
+        if name not in self._layers:
+            raise IndexError(f"Layer [{name}] not found")
+        return self
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def load(self) -> bytes:
+        return bytes(self.payload)
+
+    def scapy(self):
+        """Full Scapy packet, built on first use."""
+        if self._pkt is None:
+            from scapy.layers.l2 import Ether
+            self._pkt = Ether(bytes(self.raw))
+        return self._pkt
+
+    def summary(self) -> str:
+        """Scapy-like one-liner from the decoded fields (no Scapy build)."""
+        layers = "IPv6" if "IPv6" in self._layers else "IP" if "IP" in self._layers else ""
+        if not layers:
+            return "Ether"
+        if self.proto in ("TCP", "UDP"):
+            line = f"Ether / {layers} / {self.proto} {self.src}:{self.sport} > {self.dst}:{self.dport}"
+        else:
+            line = f"Ether / {layers} / {self.proto} {self.src} > {self.dst}"
+        return line + (" / Raw" if "Raw" in self._layers else "")
+
+    def detach(self) -> "Frame":
+        """Copy out of the capture buffer so the frame outlives the callback."""
+        frame = decode_frame(memoryview(bytes(self.raw)), self.length)
+        frame._pkt = self._pkt
+        return frame
+
+
+def decode_frame(view: memoryview, length: int = None) -> Optional[Frame]:
+    """Decode Ethernet → IPv4/IPv6 → TCP/UDP/ICMP headers from a raw frame."""
+    n = len(view)
+    length = n if length is None else length
+    if n < 14:
+        return None
+    off = 12
+    ethertype = (view[12] << 8) | view[13]
+    while ethertype in (0x8100, 0x88A8) and n >= off + 6:     # VLAN tags
+        off += 4
+        ethertype = (view[off] << 8) | view[off + 1]
+    off += 2
+
+    if ethertype == 0x0800 and n >= off + 20:
+        ihl   = (view[off] & 0x0F) * 4
+        total = (view[off + 2] << 8) | view[off + 3]
+        num   = view[off + 9]
+        src   = socket.inet_ntoa(view[off + 12:off + 16])
+        dst   = socket.inet_ntoa(view[off + 16:off + 20])
+        frag  = ((view[off + 6] & 0x1F) << 8) | view[off + 7]
+        end   = min(n, off + total) if total else n
+        l4    = off + ihl if not frag else -1
+        layer = "IP"
+    elif ethertype == 0x86DD and n >= off + 40:
+        num   = view[off + 6]
+        src   = socket.inet_ntop(socket.AF_INET6, view[off + 8:off + 24])
+        dst   = socket.inet_ntop(socket.AF_INET6, view[off + 24:off + 40])
+        end   = min(n, off + 40 + ((view[off + 4] << 8) | view[off + 5]))
+        l4    = off + 40
+        layer = "IPv6"
+    else:
+        return Frame(view, length)
+
+    proto = _IP_PROTOS.get(num, "OTHER")
+    sport = dport = flags = 0
+    data  = b""
+    if l4 < 0:
+        proto = "OTHER"
+    elif proto == "TCP" and end >= l4 + 20:
+        sport, dport = _HH.unpack_from(view, l4)
+        flags = view[l4 + 13]
+        data  = view[l4 + (view[l4 + 12] >> 4) * 4:end]
+    elif proto == "UDP" and end >= l4 + 8:
+        sport, dport = _HH.unpack_from(view, l4)
+        data  = view[l4 + 8:end]
+    elif proto == "ICMP" and end >= l4 + 8:
+        data  = view[l4 + 8:end]
+    else:
+        proto = "OTHER"
+
+    layers = {layer}
+    if proto != "OTHER":
+        layers.add(proto)
+    if len(data):
+        layers.add("Raw")
+    return Frame(view, length, src, dst, proto, sport, dport, flags, data, frozenset(layers))
+
+
+def _attach_bpf(sock: socket.socket, bpf: str, iface: str):
+    """Compile + attach a BPF filter via Scapy (libpcap / tcpdump under the hood)."""
+    if not bpf:
+        return
+    try:
+        from scapy.arch.linux import attach_filter
+    except ImportError:
+        print("[CAPTURE] Scapy not available — BPF filter ignored")
+        return
+    try:
+        attach_filter(sock, bpf, iface)
+    except Exception as e:   # no libpcap / tcpdump to compile with
+        print(f"[CAPTURE] BPF filter '{bpf}' not applied: {e}")
+
+
+def _packet_socket(iface: str) -> socket.socket:
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
+    sock.bind((iface, 0))
+    return sock
+
+
+# ── Backends ───────────────────────────────────────────────────
+class ScapySniffBackend:
+    name = "scapy"
+
+    def __init__(self, iface: str, bpf: str = ""):
+        self.iface = iface
+        self.bpf   = bpf or None
+
+    def run(self, callback: Callable):
+        from scapy.all import sniff
+        sniff(iface=self.iface, prn=callback, store=False, filter=self.bpf)
+
+    def raw_frames(self) -> Iterator[bytes]:
+        # Worker mode doesn't need Scapy in the capture thread at all
+        return RawSocketBackend(self.iface, self.bpf or "").raw_frames()
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class RawSocketBackend:
+    name = "rawsocket"
+
+    def __init__(self, iface: str, bpf: str = "", snaplen: int = 65535):
+        self.iface   = iface
+        self.bpf     = bpf
+        self.snaplen = snaplen
+        self.packets = 0
+        self._sock   = None
+
+    def _open(self):
+        self._sock = _packet_socket(self.iface)
+        _attach_bpf(self._sock, self.bpf, self.iface)
+        return self._sock
+
+    def frames(self) -> Iterator[Tuple[memoryview, int]]:
+        sock = self._open()
+        buf  = bytearray(self.snaplen)
+        view = memoryview(buf)
+        while True:
+            n = sock.recv_into(buf)
+            self.packets += 1
+            yield view[:n], n
+
+    def raw_frames(self) -> Iterator[bytes]:
+        sock = self._open()
+        while True:
+            frame = sock.recv(self.snaplen)
+            self.packets += 1
+            yield frame
+
+    def run(self, callback: Callable):
+        for view, length in self.frames():
+            frame = decode_frame(view, length)
+            if frame is not None:
+                callback(frame)
+
+    def stats(self):
+        return {"backend": self.name, "packets": self.packets}
+
+
+class TPacketV3Backend:
+    """AF_PACKET + PACKET_RX_RING (TPACKET_V3) — block-at-a-time, no per-packet syscall."""
+
+    name = "tpacket_v3"
+
+    def __init__(self, iface: str, bpf: str = "", block_size: int = BLOCK_SIZE,
+                 block_count: int = BLOCK_COUNT, frame_size: int = FRAME_SIZE):
+        self.iface       = iface
+        self.bpf         = bpf
+        self.block_size  = block_size
+        self.block_count = block_count
+        self.frame_size  = frame_size
+        self._sock = None
+        self._ring = None
+
+        self.packets = 0
+        self.blocks  = 0
+        self.drops   = 0
+
+    def _open(self):
+        sock = _packet_socket(self.iface)
+        sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        frame_nr = self.block_size * self.block_count // self.frame_size
+        req = _REQ3.pack(self.block_size, self.block_count, self.frame_size,
+                         frame_nr, BLOCK_TIMEOUT, 0, 0)
+        sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        _attach_bpf(sock, self.bpf, self.iface)
+        self._ring = mmap.mmap(sock.fileno(), self.block_size * self.block_count,
+                               mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._sock = sock
+
+    def frames(self) -> Iterator[Tuple[memoryview, int]]:
+        """
+        Yield (frame view, wire length) straight out of the ring.  A block is
+        returned to the kernel when the consumer asks for the frame after its
+        last one, so each view is valid until the next iteration.
+        """
+        self._open()
+        ring, view = self._ring, memoryview(self._ring)
+        poller = select.poll()
+        poller.register(self._sock, select.POLLIN | select.POLLERR)
+        block = 0
+        while True:
+            base = block * self.block_size
+            if not _U32.unpack_from(ring, base + 8)[0] & TP_STATUS_USER:
+                poller.poll(POLL_TIMEOUT)
+                continue
+            count = _U32.unpack_from(ring, base + 12)[0]
+            off   = base + _U32.unpack_from(ring, base + 16)[0]
+            for _ in range(count):
+                next_off, _, _, snaplen, wire_len, _, mac = _HDR3.unpack_from(ring, off)
+                start = off + mac
+                yield view[start:start + snaplen], wire_len
+                off += next_off
+            self.packets += count
+            self.blocks  += 1
+            _U32.pack_into(ring, base + 8, TP_STATUS_KERNEL)
+            block = (block + 1) % self.block_count
+
+    def raw_frames(self) -> Iterator[bytes]:
+        for view, _ in self.frames():
+            yield bytes(view)
+
+    def run(self, callback: Callable):
+        for view, length in self.frames():
+            frame = decode_frame(view, length)
+            if frame is not None:
+                callback(frame)
+
+    def stats(self):
+        if self._sock is not None:
+            try:
+                raw = self._sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _STATS.size)
+                _, drops, _ = _STATS.unpack(raw)   # counters reset on read
+                self.drops += drops
+            except OSError:
+                pass
+        return {"backend": self.name, "packets": self.packets,
+                "blocks": self.blocks, "kernel_drops": self.drops}
+
+
+BACKENDS = {
+    "scapy":      ScapySniffBackend,
+    "tpacket_v3": TPacketV3Backend,
+    "rawsocket":  RawSocketBackend,
+}
+
+
+def open_backend(name: str, iface: str, bpf: str = ""):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown capture backend '{name}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name](iface, bpf)
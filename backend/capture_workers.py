@@ -0,0 +1,335 @@
+"""
+capture_workers.py
+==================
+CyGuardian-X — Multi-process detection workers sharded by flow hash
+
+The parent process only reads raw frames and routes them; parsing,
+_detect_threats, signature matching and DB writes run in N worker
+processes, each with its own MonitorState / RuleSet / alert sink.
+
+  • sharding  — symmetric 5-tuple hash (both directions of a flow land on
+                the same worker, so per-flow state never crosses processes)
+  • transport — frames are batched per worker (BATCH_FRAMES / BATCH_WAIT)
+                to amortise pickling; a full worker queue drops the batch
+  • merging   — once per second each worker ships a delta (counters, new
+                logs / alerts, recent flows, firewall requests) which the
+                parent folds into the global `state`
+  • control   — API-side changes made in the parent are broadcast to every
+                worker on a separate control queue (never dropped, unlike
+                frame batches) and applied within TICK_INTERVAL:
+                  reputation  block / unblock / whitelist (IPReputation.on_change)
+                  rule        signature_engine.invalidate_rule
+                  anomaly     AnomalyConfig re-read (+ dedup cooldown)
+                  system      SystemSettings re-read (persistence policy)
+                The periodic DB reloads in each worker stay as a backstop.
+
+Each worker runs its own DB writer for the packets it persists, with its
+own spill queue (packets-w<index>); the parent's _db_writer only carries
+rows the parent enqueues itself, which is none while workers are active.
+
+Enabled with CAPTURE_WORKERS > 0 in network_monitor.py.
+"""
+
+import collections
+import multiprocessing as mp
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional
+
+BATCH_FRAMES  = 256     # frames per queue message
+BATCH_WAIT    = 0.05    # seconds before a partial batch is sent anyway
+QUEUE_BATCHES = 256     # per-worker queue bound (batches)
+TICK_INTERVAL = 1.0     # seconds between worker → parent deltas
+
+_SHORT    = struct.Struct("!H")
+_PORTS    = struct.Struct("!HH")
+
+
+# ── Flow hashing (raw bytes, no Scapy) ─────────────────────────
+def flow_key(frame: bytes) -> Optional[bytes]:
+    """
+    Direction-independent 5-tuple of an Ethernet frame:
+    sorted((addr, port) endpoints) + proto.  None for non-IP frames.
+    """
+    if len(frame) < 14:
+        return None
+    off = 12
+    ethertype = _SHORT.unpack_from(frame, off)[0]
+    while ethertype in (0x8100, 0x88A8) and len(frame) >= off + 6:   # VLAN tags
+        off += 4
+        ethertype = _SHORT.unpack_from(frame, off)[0]
+    off += 2
+
+    if ethertype == 0x0800 and len(frame) >= off + 20:
+        ihl   = (frame[off] & 0x0F) * 4
+        proto = frame[off + 9]
+        a, b  = frame[off + 12:off + 16], frame[off + 16:off + 20]
+        frag  = _SHORT.unpack_from(frame, off + 6)[0] & 0x1FFF
+        l4    = off + ihl if not frag else -1
+    elif ethertype == 0x86DD and len(frame) >= off + 40:
+        proto = frame[off + 6]
+        a, b  = frame[off + 8:off + 24], frame[off + 24:off + 40]
+        l4    = off + 40
+    else:
+        return None
+
+    pa = pb = 0
+    if proto in (6, 17) and l4 >= 0 and len(frame) >= l4 + 4:
+        pa, pb = _PORTS.unpack_from(frame, l4)
+    ea, eb = a + _SHORT.pack(pa), b + _SHORT.pack(pb)
+    if ea > eb:
+        ea, eb = eb, ea
+    return ea + eb + bytes((proto,))
+
+
+def shard_of(frame: bytes, workers: int) -> int:
+    key = flow_key(frame)
+    if key is None:
+        return 0
+    return zlib.crc32(key) % workers
+
+
+# ── Worker process side ────────────────────────────────────────
+def _drain(dq) -> List[Dict]:
+    """Pop everything from a newest-first deque, returned oldest first."""
+    items = []
+    while True:
+        try:
+            items.append(dq.pop())
+        except IndexError:
+            return items
+
+
+def _collect_delta(state) -> Dict:
+    """Take everything the worker produced since the previous tick."""
+    from firewall import firewall
+    delta = state.aggregate()
+    delta["logs"]        = _drain(state.logs)
+    delta["alerts"]      = _drain(state.alerts)
+    delta["connections"] = list(state.connections)   # this worker's recent flows
+    delta["flows"]       = state.active_connections
+    delta["firewall"]    = firewall.drain_pending()
+    return delta
+
+
+def _apply_control(nm, op: str, args: tuple):
+    """Apply one control message broadcast by the parent."""
+    if op == "reputation":
+        method, *rest = args
+        if method in ("block", "unblock", "whitelist"):
+            getattr(nm.reputation, method)(*rest)
+    elif op == "rule":
+        from signature_engine import invalidate_rule
+        invalidate_rule(*args)
+    elif op == "anomaly":
+        nm.anomaly_engine.load_config()
+        if nm.SIG_ENGINE_AVAILABLE:
+            from signature_engine import set_alert_cooldown
+            set_alert_cooldown(nm.anomaly_engine.cooldown)
+    elif op == "system":
+        nm.persistence.load_config()
+
+
+def _drain_control(nm, ctl_q):
+    while True:
+        try:
+            op, args = ctl_q.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            _apply_control(nm, op, args)
+        except Exception as e:
+            print(f"[WORKERS] Control {op} failed: {e}")
+
+
+def _worker_main(index: int, workers: int, in_q, ctl_q, out_q, services: bool):
+    """Entry point of one worker process (spawned — fresh interpreter)."""
+    import network_monitor as nm
+    from capture_backend import decode_frame
+
+    nm.persistence.set_shares(workers)   # max_packet_capture is the total
+    nm.syn_tracker.set_shares(workers)   # each worker sees 1/N of a source's SYNs
+    nm.anomaly_engine.set_shares(workers)   # ...and of each host's DNS / connection rate
+    if services:
+        threading.Thread(target=nm._db_writer, args=(f"packets-w{index}",), daemon=True).start()
+        nm.reputation.start()
+        nm.flows.start()
+        nm.anomaly_engine.start()
+        nm.persistence.start()
+        if nm.SIG_ENGINE_AVAILABLE:
+            from signature_engine import start_signature_engine
+            start_signature_engine(enforce=False)
+
+    nm.pcap_ring.set_shares(workers)   # PCAP_RING_MB is the total
+    nm.pcap_ring.start()               # evidence for this worker's flows
+    nm.alert_sink.start()
+
+    state = nm.state
+    processed = 0
+    next_tick = time.monotonic() + TICK_INTERVAL
+
+    while True:
+        try:
+            batch = in_q.get(timeout=TICK_INTERVAL)
+        except queue.Empty:
+            batch = []
+        if batch is None:
+            break
+        _drain_control(nm, ctl_q)
+        for frame in batch:
+            try:
+                pkt = decode_frame(memoryview(frame))
+                if pkt is not None:
+                    nm._process_real_packet(pkt)
+            except Exception:
+                pass  # never crash the worker on a malformed frame
+        processed += len(batch)
+        if time.monotonic() >= next_tick:
+            next_tick = time.monotonic() + TICK_INTERVAL
+            nm.publish_flows()
+            delta = _collect_delta(state)
+            delta["worker"], delta["processed"] = index, processed
+            out_q.put(delta)
+
+    nm.flows.flush()
+    nm.publish_flows()
+    delta = _collect_delta(state)
+    delta["worker"], delta["processed"], delta["final"] = index, processed, True
+    out_q.put(delta)
+
+
+# ── Parent side ────────────────────────────────────────────────
+class WorkerPool:
+    def __init__(self, workers: int, state, services: bool = True,
+                 on_delta: Callable[[Dict], None] = None):
+        self.workers  = max(1, workers)
+        self.state    = state
+        self.services = services
+        self.on_delta = on_delta
+        ctx = mp.get_context("spawn")
+        self._in   = [ctx.Queue(maxsize=QUEUE_BATCHES) for _ in range(self.workers)]
+        self._ctl  = [ctx.Queue() for _ in range(self.workers)]
+        self._out  = ctx.Queue()
+        self._procs = [
+            ctx.Process(target=_worker_main, args=(i, self.workers, self._in[i], self._ctl[i], self._out, services),
+                        daemon=True, name=f"cyg-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._collector = None
+        self._finished  = 0
+
+        self._conns: List[List[Dict]] = [[] for _ in range(self.workers)]
+        self._flows = [0] * self.workers
+        self.dispatched = [0] * self.workers
+        self.processed  = [0] * self.workers
+        self.dropped    = 0
+        self.batches    = 0
+        self.deltas     = 0
+        self.controls   = 0
+
+    def start(self):
+        for p in self._procs:
+            p.start()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        print(f"[WORKERS] {self.workers} capture workers started")
+
+    # ── dispatch ─────────────────────────────────────────────
+    def broadcast(self, op: str, *args):
+        """Send a control message to every worker (see _apply_control)."""
+        for q in self._ctl:
+            q.put((op, args))
+        self.controls += 1
+
+    def _send(self, index: int, batch: List[bytes]):
+        try:
+            self._in[index].put_nowait(batch)
+            self.dispatched[index] += len(batch)
+            self.batches += 1
+        except queue.Full:
+            self.dropped += len(batch)
+
+    def feed(self, frames: Iterable[bytes]):
+        """Route frames to workers until the source is exhausted."""
+        n = self.workers
+        pending: List[List[bytes]] = [[] for _ in range(n)]
+        deadline = time.monotonic() + BATCH_WAIT
+        for frame in frames:
+            i = shard_of(frame, n) if n > 1 else 0
+            pending[i].append(frame)
+            if len(pending[i]) >= BATCH_FRAMES:
+                self._send(i, pending[i])
+                pending[i] = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + BATCH_WAIT
+                for j in range(n):
+                    if pending[j]:
+                        self._send(j, pending[j])
+                        pending[j] = []
+        for j in range(n):
+            if pending[j]:
+                self._send(j, pending[j])
+
+    def stop(self, timeout: float = 30.0):
+        """Drain: signal end-of-stream and wait for every worker's final delta."""
+        for q in self._in:
+            q.put(None)
+        end = time.monotonic() + timeout
+        while self._finished < self.workers and time.monotonic() < end:
+            time.sleep(0.05)
+        for p in self._procs:
+            p.join(timeout=1)
+
+    # ── merge ────────────────────────────────────────────────
+    def _collect(self):
+        while True:
+            delta = self._out.get()
+            try:
+                self.merge(delta)
+            except Exception as e:
+                print(f"[WORKERS] Merge error: {e}")
+            if delta.get("final"):
+                self._finished += 1
+
+    def merge(self, delta: Dict):
+        st = self.state
+        st.absorb(delta)   # into this (collector) thread's counter shard
+        st.logs.extendleft(delta["logs"])
+        st.alerts.extendleft(delta["alerts"])
+        # Each worker owns its flows (symmetric sharding) — keep the latest
+        # view per worker and merge them newest first
+        self._conns[delta["worker"]] = delta["connections"]
+        self._flows[delta["worker"]] = delta["flows"]
+        merged = sorted((c for rows in self._conns for c in rows),
+                        key=lambda c: c["timestamp"], reverse=True)
+        st.connections = collections.deque(merged, maxlen=st.connections.maxlen)
+        st.active_connections = sum(self._flows)
+        if delta["firewall"]:
+            from firewall import firewall
+            from ip_reputation import reputation
+            for ip, want in delta["firewall"].items():
+                if want:
+                    reputation.flag(ip)
+                    firewall.block(ip)
+                else:
+                    firewall.unblock(ip)
+        self.processed[delta["worker"]] = delta["processed"]
+        self.deltas += 1
+        if self.on_delta:
+            self.on_delta(delta)
+
+    def stats(self) -> Dict:
+        return {
+            "workers":    self.workers,
+            "alive":      sum(p.is_alive() for p in self._procs),
+            "dispatched": list(self.dispatched),
+            "processed":  list(self.processed),
+            "queued":     [q.qsize() for q in self._in],
+            "dropped":    self.dropped,
+            "batches":    self.batches,
+            "deltas":     self.deltas,
+            "controls":   self.controls,
+        }
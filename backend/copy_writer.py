@@ -0,0 +1,345 @@
+"""
+copy_writer.py
+==============
+CyGuardian-X — COPY-based bulk ingestion for high-volume tables
+
+Rows are streamed into PostgreSQL with `COPY table (cols) FROM STDIN (FORMAT
+csv)` instead of INSERT batches:
+  • CopyWriter  — owns one long-lived connection and drains a queue
+                  (captured_packets); batch size adapts so each COPY takes
+                  about TARGET_MS, between MIN_BATCH and MAX_BATCH rows
+  • insert_rows — COPY inside an existing Session transaction
+                  (network_alerts / network_logs from alert_sink)
+
+With a spill_queue.SpillQueue a failed batch goes straight to local
+disk — no sleeping retries on the writer thread, which would stall the
+capture queue behind it — and so does every later batch until the
+backlog is gone, so rows reach the table in capture order.  Replay is the
+retry: it runs for up to REPLAY_SLICE per loop, on a fresh connection,
+and backs off up to REPLAY_BACKOFF while the database is still failing.
+Without a spill queue a failed COPY is retried MAX_RETRIES times with
+exponential backoff.  Replayed rows keep the time they were first written as
+created_at.  Without a spill queue (or once its disk budget is used up) a
+failed batch is dropped and counted as lost.
+
+Databases other than PostgreSQL (SQLite in development) fall back to
+bulk_insert_mappings with the same interface.
+
+Columns are every table column except the autoincrement id and columns
+filled by a server default (created_at); rows missing a column get the
+column's Python-side scalar default, as the ORM would have done.
+"""
+
+import csv
+import enum
+import io
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MIN_BATCH      = 50
+MAX_BATCH      = 20_000
+TARGET_MS      = 50.0       # aim for COPYs of about this duration
+FLUSH_INTERVAL = 0.5        # seconds — flush a partial batch after this
+MAX_RETRIES    = 3          # only without a spill queue
+RETRY_BACKOFF  = 0.5        # seconds, doubled per retry
+REPLAY_SLICE   = 0.25       # seconds of replay per drain loop
+REPLAY_BACKOFF = 5.0        # max seconds between replay attempts while failing
+
+
+def copy_columns(table) -> List[Tuple[str, object]]:
+    """[(column name, default for missing values)] for a COPY into `table`."""
+    cols = []
+    for col in table.columns:
+        if col.primary_key and col.autoincrement in (True, "auto") and not col.default:
+            continue
+        default = col.default.arg if col.default is not None and col.default.is_scalar else None
+        if col.server_default is not None and default is None:
+            continue
+        cols.append((col.name, default))
+    return cols
+
+
+def _copy_sql(table, cols, table_name: str = None) -> str:
+    names = [name for name, _ in cols]
+    # Unquoted empty fields are NULL in CSV; keep NOT NULL text columns as ''
+    keep = [name for name in names
+            if not table.columns[name].nullable
+            and getattr(table.columns[name].type, "python_type", None) is str]
+    opts = "FORMAT csv" + (f", FORCE_NOT_NULL ({', '.join(keep)})" if keep else "")
+    return f"COPY {table_name or table.name} ({', '.join(names)}) FROM STDIN WITH ({opts})"
+
+
+def _csv_buffer(rows: Iterable[Dict], cols, plain: bool = False) -> io.StringIO:
+    """
+    Render rows as CSV.  plain=True unwraps Enum members (str-Enum values
+    would otherwise render as 'SeverityEnum.high') — off on the hot path,
+    where rows only hold str / int / bool.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if plain:
+        writer.writerows([_plain(row.get(name, d)) for name, d in cols] for row in rows)
+    else:
+        writer.writerows([row.get(name, d) for name, d in cols] for row in rows)
+    buf.seek(0)
+    return buf
+
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def supports_copy(bind) -> bool:
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def insert_rows(db, model, rows: List[Dict]) -> int:
+    """
+    Insert rows inside the Session's current transaction — COPY on
+    PostgreSQL, bulk_insert_mappings elsewhere.  Caller commits.
+    """
+    if not rows:
+        return 0
+    if not supports_copy(db.get_bind()):
+        db.bulk_insert_mappings(model, rows)
+        return len(rows)
+    table = model.__table__
+    cols = copy_columns(table)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(_copy_sql(table, cols), _csv_buffer(rows, cols, plain=True))
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+class CopyWriter:
+    def __init__(self, model, name: str = None, table_name: str = None,
+                 on_flush: Optional[Callable[[], None]] = None, spill=None):
+        self.model      = model
+        self.table_name = table_name or model.__table__.name
+        self.name       = name or self.table_name
+        self.cols       = copy_columns(model.__table__)
+        self.sql        = _copy_sql(model.__table__, self.cols, self.table_name)
+        # Replayed batches carry their original time in created_at
+        self.stamped_cols = self.cols + ([("created_at", None)]
+                                         if "created_at" in model.__table__.columns else [])
+        self.stamped_sql  = _copy_sql(model.__table__, self.stamped_cols, self.table_name)
+        self.spill      = spill          # spill_queue.SpillQueue or None
+        self.on_flush   = on_flush
+        self.batch_size = MIN_BATCH * 4
+
+        self._engine = None
+        self._conn   = None              # long-lived DBAPI connection
+        self._copy   = None              # True = COPY, False = ORM fallback
+        self._replay_at    = 0.0
+        self._replay_delay = RETRY_BACKOFF
+
+        self.rows_written = 0
+        self.flushes      = 0
+        self.retries      = 0
+        self.errors       = 0
+        self.spilled      = 0
+        self.replayed     = 0
+        self.lost         = 0
+        self.last_ms      = 0.0
+        self.ewma_row_us  = 0.0
+
+    # ── connection ───────────────────────────────────────────
+    def _connect(self):
+        if self._engine is None:
+            from database import engine
+            self._engine = engine
+            self._copy = supports_copy(engine)
+        if self._copy and self._conn is None:
+            self._conn = self._engine.raw_connection()
+        return self._conn
+
+    def _reset(self):
+        if self._conn is not None:
+            try:
+                self._conn.invalidate()
+            except Exception:
+                pass
+            self._conn = None
+
+    # ── writing ──────────────────────────────────────────────
+    def _write_once(self, rows: List[Dict], stamped: bool = False):
+        conn = self._connect()
+        if not self._copy:
+            from database import SessionLocal
+            db = SessionLocal()
+            try:
+                db.bulk_insert_mappings(self.model, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            return
+        cursor = conn.cursor()
+        try:
+            if stamped:
+                cursor.copy_expert(self.stamped_sql, _csv_buffer(rows, self.stamped_cols))
+            else:
+                cursor.copy_expert(self.sql, _csv_buffer(rows, self.cols))
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+    def write(self, rows: List[Dict]) -> bool:
+        """COPY one batch; spill it on failure (retry first if there is no spill queue)."""
+        stamp = time.time()
+        delay = RETRY_BACKOFF
+        retries = MAX_RETRIES if self.spill is None else 0
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                self._write_once(rows)
+            except Exception as e:
+                self.errors += 1
+                self._reset()
+                if attempt == retries:
+                    reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+                    outcome = "spilled" if self._park(rows, stamp) else "dropped"
+                    print(f"[COPY] {self.name}: write failed after {attempt + 1} attempts ({reason}) "
+                          f"— {outcome} {len(rows)} rows")
+                    # replay retries the database, after the first backoff
+                    self._replay_at = time.monotonic() + RETRY_BACKOFF
+                    return False
+                self.retries += 1
+                time.sleep(delay)
+                delay *= 2
+                continue
+            self._tune(len(rows), (time.perf_counter() - start) * 1000)
+            return True
+        return False
+
+    def _tune(self, n: int, ms: float):
+        """Resize batches so one COPY takes about TARGET_MS."""
+        self.rows_written += n
+        self.flushes += 1
+        self.last_ms = ms
+        per_row = ms * 1000 / n
+        self.ewma_row_us = per_row if not self.ewma_row_us else 0.8 * self.ewma_row_us + 0.2 * per_row
+        ideal = TARGET_MS * 1000 / max(self.ewma_row_us, 0.1)
+        self.batch_size = int(min(max((self.batch_size + ideal) / 2, MIN_BATCH), MAX_BATCH))
+
+    # ── spill / replay ───────────────────────────────────────
+    def _park(self, rows: List[Dict], stamp: float = None) -> bool:
+        """Spill a batch; False if it was dropped (no spill queue or no disk budget)."""
+        if self.spill is not None:
+            payload = json.dumps({"cols": [name for name, _ in self.cols],
+                                  "rows": [[row.get(name, d) for name, d in self.cols] for row in rows]},
+                                 separators=(",", ":")).encode()
+            if self.spill.append(payload, len(rows), stamp):
+                self.spilled += len(rows)
+                return True
+        self.lost += len(rows)
+        return False
+
+    def _replay(self):
+        """Write the oldest spilled batches, in order, for up to REPLAY_SLICE."""
+        now = time.monotonic()
+        if now < self._replay_at:
+            return
+        deadline = now + REPLAY_SLICE
+        while self.spill.pending_rows and time.monotonic() < deadline:
+            rec = self.spill.peek()
+            if rec is None:
+                break
+            _, ts, payload = rec
+            try:
+                data = json.loads(payload)
+                rows = [dict(zip(data["cols"], values)) for values in data["rows"]]
+                if len(self.stamped_cols) > len(self.cols):
+                    created = datetime.fromtimestamp(ts, timezone.utc)
+                    for row in rows:
+                        row["created_at"] = created
+            except (ValueError, KeyError, TypeError):
+                self.spill.skip()
+                continue
+            start = time.perf_counter()
+            try:
+                self._write_once(rows, stamped=True)
+            except Exception as e:
+                self.errors += 1
+                self._reset()
+                self._replay_at = time.monotonic() + self._replay_delay
+                self._replay_delay = min(self._replay_delay * 2, REPLAY_BACKOFF)
+                reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+                print(f"[COPY] {self.name}: replay failed ({reason}) — "
+                      f"{self.spill.pending_rows:,} rows still spilled")
+                return
+            self.spill.ack()
+            self.replayed += len(rows)
+            self._tune(len(rows), (time.perf_counter() - start) * 1000)
+        self._replay_delay = RETRY_BACKOFF
+
+    # ── queue drain loop ─────────────────────────────────────
+    def _collect(self, q: queue.Queue) -> List[Dict]:
+        batch = []
+        try:
+            batch.append(q.get(timeout=2))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(q.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+        return batch
+
+    def drain(self, q: queue.Queue):
+        """Run forever: collect adaptive batches from q and write them."""
+        while True:
+            batch = self._collect(q)
+            backlog = self.spill is not None and self.spill.pending_rows > 0
+            if batch:
+                if backlog:
+                    self._park(batch, time.time())   # stay behind the spilled rows
+                else:
+                    self.write(batch)
+            if backlog:
+                self._replay()
+            if self.on_flush is not None:
+                self.on_flush()
+
+    def start(self, q: queue.Queue) -> threading.Thread:
+        t = threading.Thread(target=self.drain, args=(q,), daemon=True)
+        t.start()
+        return t
+
+    def stats(self):
+        return {
+            "mode":         None if self._copy is None else ("copy" if self._copy else "orm"),
+            "batch_size":   self.batch_size,
+            "rows_written": self.rows_written,
+            "flushes":      self.flushes,
+            "last_ms":      round(self.last_ms, 2),
+            "row_us":       round(self.ewma_row_us, 2),
+            "retries":      self.retries,
+            "errors":       self.errors,
+            "spilled":      self.spilled,
+            "replayed":     self.replayed,
+            "lost":         self.lost,
+            "spill":        self.spill.stats() if self.spill is not None else None,
+        }
@@ -0,0 +1,370 @@
+"""
+firewall.py
+===========
+CyGuardian-X — Batched, asynchronous firewall enforcement
+
+Block / unblock requests are queued by the capture thread and the API and
+applied off the packet path by a single worker, one kernel transaction per
+batch instead of two `sudo iptables` processes per IP.
+
+Backends (FIREWALL_BACKEND, overridable via env):
+  ipset     — IPs live in an ipset (hash:net) matched by ONE iptables rule;
+              each batch is a single `ipset restore`.  Falls back to
+              iptables when the ipset binary is not installed.
+  iptables  — one `iptables-restore --noflush` per batch (-A / -D lines)
+  dryrun    — no system calls; keeps the "kernel" set in memory (no root)
+An unknown backend name raises instead of silently disabling enforcement.
+
+A batch the backend rejects is retried one entry at a time; entries that
+fail on their own are dropped with a log line so one bad address cannot
+hold back every later block.  If every entry fails the backend itself is
+treated as down and the batch is retried on the next wake.
+
+The worker keeps `kernel`, an in-memory view of what is actually installed,
+and re-reads it from the backend every RECONCILE_INTERVAL seconds to repair
+drift (manual flushes, reboots, another tool deleting entries).
+"""
+
+import ipaddress
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, List, Set
+
+FIREWALL_BACKEND   = os.getenv("FIREWALL_BACKEND", "ipset")   # ipset | iptables | dryrun
+IPSET_NAME         = "cyguardian_block"
+BATCH_INTERVAL     = 0.5    # seconds between batch applies
+RECONCILE_INTERVAL = 60     # seconds between kernel re-reads
+
+
+def _normalise(ip: str):
+    """Canonical string form, or None if `ip` is not an address/CIDR."""
+    try:
+        net = ipaddress.ip_network(ip.strip(), strict=False)
+    except (ValueError, AttributeError):
+        return None
+    if net.prefixlen == net.max_prefixlen:
+        return str(net.network_address)
+    return str(net)
+
+
+def _is_v6(ip: str) -> bool:
+    return ":" in ip
+
+
+def _run(cmd: List[str], stdin: str = None, timeout: int = 10):
+    return subprocess.run(cmd, input=stdin, capture_output=True, text=True, timeout=timeout)
+
+
+# ── Backends ───────────────────────────────────────────────────
+class DryRunBackend:
+    """In-memory stand-in for the kernel — used for tests and without root."""
+
+    name = "dryrun"
+
+    def __init__(self):
+        self.installed: Set[str] = set()
+        self.transactions: List[Dict] = []
+
+    def setup(self):
+        pass
+
+    def apply(self, adds: Set[str], removes: Set[str]):
+        self.transactions.append({"add": sorted(adds), "del": sorted(removes)})
+        self.installed |= adds
+        self.installed -= removes
+
+    def list_blocked(self) -> Set[str]:
+        return set(self.installed)
+
+
+class IpsetBackend:
+    """One hash:net set per family + one DROP rule referencing it."""
+
+    name = "ipset"
+
+    def __init__(self, set_name: str = IPSET_NAME):
+        self.sets = {False: set_name, True: f"{set_name}6"}
+
+    def setup(self):
+        for v6, set_name in self.sets.items():
+            family = "inet6" if v6 else "inet"
+            tables = "ip6tables" if v6 else "iptables"
+            _run(["sudo", "ipset", "create", set_name, "hash:net", "family", family, "-exist"])
+            rule = ["INPUT", "-m", "set", "--match-set", set_name, "src", "-j", "DROP"]
+            if _run(["sudo", tables, "-C"] + rule).returncode != 0:
+                result = _run(["sudo", tables, "-I"] + rule)
+                if result.returncode != 0:
+                    raise RuntimeError(f"{tables} rule for {set_name} failed: {result.stderr.strip()}")
+
+    def apply(self, adds: Set[str], removes: Set[str]):
+        lines = [f"add {self.sets[_is_v6(ip)]} {ip} -exist" for ip in sorted(adds)]
+        lines += [f"del {self.sets[_is_v6(ip)]} {ip} -exist" for ip in sorted(removes)]
+        result = _run(["sudo", "ipset", "restore"], stdin="\n".join(lines) + "\n")
+        if result.returncode != 0:
+            raise RuntimeError(f"ipset restore failed: {result.stderr.strip()}")
+
+    def list_blocked(self) -> Set[str]:
+        found = set()
+        for set_name in self.sets.values():
+            result = _run(["sudo", "ipset", "list", set_name, "-o", "save"])
+            if result.returncode != 0:
+                raise RuntimeError(f"ipset list failed: {result.stderr.strip()}")
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == "add":
+                    ip = _normalise(parts[2])
+                    if ip:
+                        found.add(ip)
+        return found
+
+
+class IptablesRestoreBackend:
+    """Plain per-IP DROP rules, but written in one iptables-restore per batch."""
+
+    name = "iptables"
+
+    def setup(self):
+        pass
+
+    def apply(self, adds: Set[str], removes: Set[str]):
+        for v6 in (False, True):
+            lines = [f"-A INPUT -s {ip} -j DROP" for ip in sorted(adds) if _is_v6(ip) == v6]
+            lines += [f"-D INPUT -s {ip} -j DROP" for ip in sorted(removes) if _is_v6(ip) == v6]
+            if not lines:
+                continue
+            tool = "ip6tables-restore" if v6 else "iptables-restore"
+            payload = "*filter\n" + "\n".join(lines) + "\nCOMMIT\n"
+            result = _run(["sudo", tool, "--noflush"], stdin=payload)
+            if result.returncode != 0:
+                raise RuntimeError(f"{tool} failed: {result.stderr.strip()}")
+
+    def list_blocked(self) -> Set[str]:
+        found = set()
+        for tool in ("iptables", "ip6tables"):
+            result = _run(["sudo", tool, "-S", "INPUT"])
+            if result.returncode != 0:
+                raise RuntimeError(f"{tool} -S failed: {result.stderr.strip()}")
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if parts[:2] == ["-A", "INPUT"] and "-s" in parts and parts[-2:] == ["-j", "DROP"]:
+                    ip = _normalise(parts[parts.index("-s") + 1])
+                    if ip:
+                        found.add(ip)
+        return found
+
+
+BACKENDS = {
+    "ipset":    IpsetBackend,
+    "iptables": IptablesRestoreBackend,
+    "dryrun":   DryRunBackend,
+}
+
+
+def make_backend(name: str = FIREWALL_BACKEND):
+    """Backend instance for a FIREWALL_BACKEND name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown FIREWALL_BACKEND {name!r} — expected one of {', '.join(BACKENDS)}")
+    if name == "ipset" and shutil.which("ipset") is None:
+        print("[FIREWALL] ipset not installed — falling back to the iptables backend")
+        name = "iptables"
+    return BACKENDS[name]()
+
+
+# ── Worker ─────────────────────────────────────────────────────
+class FirewallWorker:
+    """
+    desired  — what the IDPS wants blocked
+    kernel   — last known installed set (reconciled against the backend)
+    pending  — ip -> True (block) / False (unblock), last request wins
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or make_backend()
+        self.desired: Set[str] = set()
+        self.kernel:  Set[str] = set()
+        self._pending: Dict[str, bool] = {}
+        self._lock       = threading.Lock()   # guards desired / _pending
+        self._apply_lock = threading.Lock()   # one kernel transaction at a time
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_reconcile = 0.0
+
+        self.batches   = 0
+        self.applied   = 0
+        self.errors    = 0
+        self.invalid   = 0
+        self.rejected  = 0        # entries the backend refused on their own
+        self.repaired  = 0
+        self.last_error = None
+        self.last_batch_ms = 0.0
+
+    # ── producer side ────────────────────────────────────────
+    def block(self, ip: str, reason: str = "") -> bool:
+        """Queue a block. Cheap no-op if already blocked. Never blocks the caller."""
+        if ip in self.desired:
+            return True
+        norm = _normalise(ip)
+        if norm is None:
+            self.invalid += 1
+            return False
+        with self._lock:
+            self.desired.add(norm)
+            self._pending[norm] = True
+        self._wake.set()
+        if reason:
+            print(f"[FIREWALL] Queued block for {norm} — {reason}")
+        return True
+
+    def unblock(self, ip: str) -> bool:
+        norm = _normalise(ip)
+        if norm is None:
+            self.invalid += 1
+            return False
+        with self._lock:
+            self.desired.discard(norm)
+            self._pending[norm] = False
+        self._wake.set()
+        return True
+
+    def block_many(self, ips: Iterable[str]) -> int:
+        """Queue many blocks, re-asserting ones already desired. Returns valid count."""
+        count = 0
+        with self._lock:
+            for ip in ips:
+                norm = _normalise(ip)
+                if norm is None:
+                    self.invalid += 1
+                    continue
+                self.desired.add(norm)
+                self._pending[norm] = True
+                count += 1
+        self._wake.set()
+        return count
+
+    def drain_pending(self) -> Dict[str, bool]:
+        """Hand over queued requests without applying them (capture workers → parent)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    # ── worker side ──────────────────────────────────────────
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        try:
+            self.backend.setup()
+            self.kernel = self.backend.list_blocked()
+            self._last_reconcile = time.monotonic()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"[FIREWALL] {self.backend.name} setup error: {e}")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"[FIREWALL] Worker started — backend: {self.backend.name}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=RECONCILE_INTERVAL)
+            self._wake.clear()
+            time.sleep(BATCH_INTERVAL)  # let a burst of requests accumulate
+            self.flush()
+            if time.monotonic() - self._last_reconcile >= RECONCILE_INTERVAL:
+                self.reconcile()
+
+    def flush(self) -> int:
+        """Apply everything pending in one backend transaction. Returns IPs changed."""
+        with self._apply_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            adds    = {ip for ip, want in pending.items() if want and ip not in self.kernel}
+            removes = {ip for ip, want in pending.items() if not want and ip in self.kernel}
+            if not adds and not removes:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.backend.apply(adds, removes)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"[FIREWALL] Batch of {len(adds) + len(removes)} failed: {e} — retrying per entry")
+                adds, removes = self._apply_each(adds, removes, pending)
+            self.kernel |= adds
+            self.kernel -= removes
+            if not adds and not removes:
+                return 0
+            self.batches += 1
+            self.applied += len(adds) + len(removes)
+            self.last_batch_ms = round((time.perf_counter() - start) * 1000, 2)
+            print(f"[FIREWALL] Applied batch — +{len(adds)} / -{len(removes)} "
+                  f"via {self.backend.name} in {self.last_batch_ms} ms")
+            return len(adds) + len(removes)
+
+    def _apply_each(self, adds: Set[str], removes: Set[str], pending: Dict[str, bool]):
+        """Apply a rejected batch entry by entry. Returns the (adds, removes) that went in."""
+        ok_adds, ok_removes, failed = set(), set(), {}
+        for ip in sorted(adds | removes):
+            add = ip in adds
+            try:
+                self.backend.apply({ip} if add else set(), set() if add else {ip})
+            except Exception as e:
+                failed[ip] = str(e)
+                continue
+            (ok_adds if add else ok_removes).add(ip)
+        if failed and not ok_adds and not ok_removes:
+            # Nothing went in — the backend is down, not the entries
+            with self._lock:
+                for ip, want in pending.items():
+                    self._pending.setdefault(ip, want)  # retry unless superseded
+            return ok_adds, ok_removes
+        with self._lock:
+            for ip, err in failed.items():
+                if ip in adds:
+                    self.desired.discard(ip)       # keep reconcile from re-queuing it
+                self.rejected += 1
+                print(f"[FIREWALL] Dropped {'block' if ip in adds else 'unblock'} of {ip}: {err}")
+        return ok_adds, ok_removes
+
+    def reconcile(self):
+        """Re-read the kernel set and re-queue anything that went missing."""
+        self._last_reconcile = time.monotonic()
+        try:
+            with self._apply_lock:
+                self.kernel = self.backend.list_blocked()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"[FIREWALL] Reconcile error: {e}")
+            return
+        with self._lock:
+            missing = [ip for ip in self.desired if ip not in self.kernel and ip not in self._pending]
+            for ip in missing:
+                self._pending[ip] = True
+        if missing:
+            self.repaired += len(missing)
+            print(f"[FIREWALL] Reconcile — re-queuing {len(missing)} missing entries")
+            self._wake.set()
+
+    # ── metrics ──────────────────────────────────────────────
+    def stats(self) -> Dict:
+        return {
+            "backend":       self.backend.name,
+            "desired":       len(self.desired),
+            "installed":     len(self.kernel),
+            "pending":       len(self._pending),
+            "batches":       self.batches,
+            "applied":       self.applied,
+            "errors":        self.errors,
+            "invalid":       self.invalid,
+            "rejected":      self.rejected,
+            "repaired":      self.repaired,
+            "last_batch_ms": self.last_batch_ms,
+            "last_error":    self.last_error,
+        }
+
+
+# Global singleton
+firewall = FirewallWorker()
@@ -0,0 +1,299 @@
+"""
+flow_table.py
+=============
+CyGuardian-X — Per-5-tuple flow tracking with timeout eviction
+
+Every captured IPv4 packet updates one FlowRecord keyed by
+(src, sport, dst, dport, transport); the reply direction finds the same
+record through the reversed key.  Records are compact (__slots__) and
+hold packets / bytes, first / last seen, the OR of TCP flags and a small
+TCP state machine.
+
+Flows leave the table (and are exported to `network_flows`) when:
+  • idle     — no packet for IDLE_TIMEOUT seconds
+  • closed   — FIN from both sides or a RST, after CLOSED_TIMEOUT
+  • active   — open for ACTIVE_TIMEOUT; a record is exported and the
+               counters restart (NetFlow-style), the flow stays tracked
+  • evicted  — the table is at MAX_FLOWS; the least recently seen flow
+               makes room (bounded memory, ~300 B per flow)
+
+The table is an OrderedDict kept in last-seen order, so the idle sweep
+only ever touches flows that actually expire.  Exported records go
+through a bounded queue to a batch writer thread.
+"""
+
+import collections
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+MAX_FLOWS      = 100_000   # memory budget (flows)
+IDLE_TIMEOUT   = 60        # seconds without a packet
+CLOSED_TIMEOUT = 5         # seconds after FIN/FIN or RST
+ACTIVE_TIMEOUT = 1800      # long-lived flows are exported every 30 min
+EXPORT_BATCH   = 200
+
+_FIN, _SYN, _RST, _ACK = 0x01, 0x02, 0x04, 0x10
+_STATUS_RANK = {"Established": 0, "Suspicious": 1, "Blocked": 2}
+_ids = itertools.count()
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+class FlowRecord:
+    __slots__ = ("id", "src", "dst", "sport", "dport", "transport", "proto",
+                 "packets", "bytes", "first_seen", "last_seen", "started",
+                 "flags", "fins", "tcp_state", "status", "is_new")
+
+    def __init__(self, meta, now: float):
+        self.id         = int(now * 1000) + next(_ids) % 1000
+        self.src        = meta.src
+        self.dst        = meta.dst
+        self.sport      = meta.sport
+        self.dport      = meta.dport
+        self.transport  = meta.transport
+        self.proto      = meta.proto
+        self.packets    = 0
+        self.bytes      = 0
+        self.first_seen = now
+        self.last_seen  = now
+        self.started    = now          # start of the current export interval
+        self.flags      = 0
+        self.fins       = 0            # bit 0 = FIN from src, bit 1 = FIN from dst
+        self.tcp_state  = "NEW" if meta.transport == "TCP" else "ACTIVE"
+        self.status     = "Established"
+        self.is_new     = True         # set by FlowTable.update: this packet created the flow
+
+    def track_tcp(self, flags: int, reverse: bool):
+        self.flags |= flags
+        if flags & _RST:
+            self.tcp_state = "RESET"
+        elif flags & _FIN:
+            self.fins |= 2 if reverse else 1
+            self.tcp_state = "CLOSED" if self.fins == 3 else "CLOSING"
+        elif flags & _SYN:
+            if self.tcp_state == "NEW":
+                self.tcp_state = "SYN_RCVD" if flags & _ACK else "SYN_SENT"
+            elif flags & _ACK:
+                self.tcp_state = "SYN_RCVD"
+        elif flags & _ACK and self.tcp_state in ("NEW", "SYN_SENT", "SYN_RCVD"):
+            self.tcp_state = "ESTABLISHED"
+
+    @property
+    def finished(self) -> bool:
+        return self.tcp_state in ("CLOSED", "RESET")
+
+    def as_connection(self) -> Dict:
+        """Row for state.connections / the /connections endpoint."""
+        secs = int(self.last_seen - self.first_seen)
+        return {
+            "id":        self.id,
+            "srcIp":     self.src,
+            "dstIp":     self.dst,
+            "protocol":  self.proto,
+            "port":      self.dport,
+            "status":    self.status,
+            "data":      _fmt_bytes(self.bytes),
+            "duration":  f"{secs // 60}m {secs % 60}s",
+            "flagged":   self.status != "Established",
+            "timestamp": _iso(self.last_seen),
+            "packets":   self.packets,
+            "bytes":     self.bytes,
+            "state":     self.tcp_state,
+        }
+
+    def export(self, reason: str) -> Dict:
+        """Row for the network_flows table."""
+        return {
+            "src_ip":     self.src,
+            "dst_ip":     self.dst,
+            "src_port":   self.sport,
+            "dst_port":   self.dport,
+            "transport":  self.transport,
+            "protocol":   self.proto,
+            "packets":    self.packets,
+            "bytes":      self.bytes,
+            "tcp_flags":  self.flags,
+            "tcp_state":  self.tcp_state,
+            "status":     self.status,
+            "flagged":    self.status != "Established",
+            "end_reason": reason,
+            "first_seen": datetime.fromtimestamp(self.started, timezone.utc),
+            "last_seen":  datetime.fromtimestamp(self.last_seen, timezone.utc),
+        }
+
+
+class FlowTable:
+    def __init__(self, max_flows: int = MAX_FLOWS, idle_timeout: float = IDLE_TIMEOUT,
+                 active_timeout: float = ACTIVE_TIMEOUT, closed_timeout: float = CLOSED_TIMEOUT):
+        self.max_flows      = max_flows
+        self.idle_timeout   = idle_timeout
+        self.active_timeout = active_timeout
+        self.closed_timeout = closed_timeout
+
+        self._flows: "collections.OrderedDict[tuple, FlowRecord]" = collections.OrderedDict()
+        self._closing: Dict[tuple, None] = {}  # keys of FIN/FIN or RST flows
+        self._lock  = threading.Lock()   # capture thread vs the 1 s sweep
+        self.export_queue: queue.Queue = queue.Queue(maxsize=20_000)
+
+        self.created  = 0
+        self.exported = collections.Counter()   # by end reason
+        self.dropped  = 0                       # export queue full
+        self._writer: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return len(self._flows)
+
+    # ── packet path ──────────────────────────────────────────
+    def update(self, meta, status: str = "Established", now: float = None) -> FlowRecord:
+        now = now or time.time()
+        key = (meta.src, meta.sport, meta.dst, meta.dport, meta.transport)
+        with self._lock:
+            flows = self._flows
+            rec = flows.get(key)
+            reverse = is_new = False
+            if rec is None:
+                rkey = (meta.dst, meta.dport, meta.src, meta.sport, meta.transport)
+                rec = flows.get(rkey)
+                if rec is not None:
+                    key, reverse = rkey, True
+                else:
+                    if len(flows) >= self.max_flows:
+                        old_key, old = flows.popitem(last=False)
+                        self._closing.pop(old_key, None)
+                        self._export(old, "evicted")
+                    rec = flows[key] = FlowRecord(meta, now)
+                    self.created += 1
+                    is_new = True
+            flows.move_to_end(key)
+
+            if now - rec.started >= self.active_timeout:
+                self._export(rec, "active")
+                rec.packets = rec.bytes = rec.flags = 0
+                rec.started = now
+            rec.packets  += 1
+            rec.bytes    += meta.length
+            rec.last_seen = now
+            rec.is_new    = is_new
+            if meta.transport == "TCP":
+                rec.track_tcp(meta.flags, reverse)
+                if rec.finished:
+                    self._closing[key] = None
+            if _STATUS_RANK.get(status, 0) > _STATUS_RANK.get(rec.status, 0):
+                rec.status = status
+            return rec
+
+    # ── tick path ────────────────────────────────────────────
+    def sweep(self, now: float = None) -> int:
+        """Export idle and closed flows. Returns the number removed."""
+        now = now or time.time()
+        idle_cut   = now - self.idle_timeout
+        closed_cut = now - self.closed_timeout
+        removed = 0
+        with self._lock:
+            flows = self._flows
+            # Oldest-seen first: stop at the first flow still inside the idle window
+            while flows:
+                key, rec = next(iter(flows.items()))
+                if rec.last_seen >= idle_cut:
+                    break
+                del flows[key]
+                self._export(rec, "closed" if rec.finished else "idle")
+                removed += 1
+            # Finished TCP flows go after a short grace period (late ACKs)
+            for key in list(self._closing):
+                rec = flows.get(key)
+                if rec is None:
+                    del self._closing[key]
+                elif rec.last_seen < closed_cut:
+                    del self._closing[key], flows[key]
+                    self._export(rec, "closed")
+                    removed += 1
+        return removed
+
+    def recent(self, n: int = 60) -> List[Dict]:
+        """The n most recently seen flows as connection rows (newest first)."""
+        with self._lock:
+            rows = []
+            for rec in reversed(self._flows.values()):
+                rows.append(rec.as_connection())
+                if len(rows) >= n:
+                    break
+        return rows
+
+    def flush(self):
+        """Export every tracked flow (shutdown)."""
+        with self._lock:
+            while self._flows:
+                _, rec = self._flows.popitem(last=False)
+                self._export(rec, "closed" if rec.finished else "idle")
+            self._closing.clear()
+
+    def _export(self, rec: FlowRecord, reason: str):
+        self.exported[reason] += 1
+        if not rec.packets:
+            return
+        try:
+            self.export_queue.put_nowait(rec.export(reason))
+        except queue.Full:
+            self.dropped += 1
+
+    # ── batch export to PostgreSQL ───────────────────────────
+    def _flow_writer(self):
+        from database import SessionLocal
+        from models.network import NetworkFlow
+
+        batch = []
+        while True:
+            try:
+                batch.append(self.export_queue.get(timeout=2))
+                if len(batch) < EXPORT_BATCH:
+                    continue
+            except queue.Empty:
+                if not batch:
+                    continue
+            db = SessionLocal()
+            try:
+                db.bulk_insert_mappings(NetworkFlow, batch)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"[FLOWS] Export error: {e}")
+            finally:
+                db.close()
+            batch = []
+
+    def start(self):
+        if self._writer is not None:
+            return
+        self._writer = threading.Thread(target=self._flow_writer, daemon=True)
+        self._writer.start()
+        print(f"[FLOWS] Flow exporter started (max {self.max_flows:,} flows, "
+              f"idle {self.idle_timeout}s, active {self.active_timeout}s)")
+
+    def stats(self):
+        return {
+            "active":   len(self._flows),
+            "created":  self.created,
+            "exported": dict(self.exported),
+            "queued":   self.export_queue.qsize(),
+            "dropped":  self.dropped,
+            "max":      self.max_flows,
+        }
+
+
+# Global singleton
+flows = FlowTable()
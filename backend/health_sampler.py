@@ -0,0 +1,125 @@
+"""
+health_sampler.py
+=================
+CyGuardian-X — System health sampling off the stats critical section
+
+Runs on its own daemon thread and cadence so nothing slow ever executes
+while state.lock is held:
+  • latency     — in-process TCP connect RTT to PROBE_HOST:PROBE_PORT
+                  (no `ping` subprocess); on failure the last good value
+                  is kept and `latency_ok` goes False
+  • connections — line count of /proc/net/{tcp,tcp6,udp,udp6}; psutil's
+                  net_connections() is only the fallback (it walks every
+                  process's fd table)
+  • cpu / mem   — psutil, non-blocking
+Each sample is built into a fresh dict and published with one reference
+assignment, so `health.latest` is always a complete, consistent sample.
+"""
+
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import psutil
+
+SAMPLE_INTERVAL = 5.0           # seconds between samples
+PROBE_HOST      = "8.8.8.8"
+PROBE_PORT      = 53
+PROBE_TIMEOUT   = 1.0
+
+_PROC_NET = ("/proc/net/tcp", "/proc/net/tcp6", "/proc/net/udp", "/proc/net/udp6")
+
+
+def tcp_rtt(host: str = PROBE_HOST, port: int = PROBE_PORT,
+            timeout: float = PROBE_TIMEOUT) -> Optional[float]:
+    """TCP handshake time in ms, or None if the connect failed."""
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return (time.perf_counter() - start) * 1000
+    except OSError:
+        return None
+
+
+def count_connections() -> int:
+    """Number of inet sockets, read from /proc/net (psutil fallback)."""
+    total = 0
+    found = False
+    for path in _PROC_NET:
+        try:
+            with open(path, "rb") as f:
+                total += max(f.read().count(b"\n") - 1, 0)   # minus header row
+            found = True
+        except OSError:
+            continue
+    if found:
+        return total
+    return len(psutil.net_connections(kind="inet"))
+
+
+class HealthSampler:
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.latest: Dict[str, Any] = {
+            "cpu": 0, "mem": 0, "latency": 0, "latency_ok": False,
+            "connections": 0, "sampled_at": 0.0,
+        }
+        self.samples        = 0
+        self.probe_failures = 0
+        self.sample_ms      = 0.0     # duration of the last sample
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        prev = self.latest
+        rtt = tcp_rtt()
+        if rtt is None:
+            self.probe_failures += 1
+        try:
+            conns = count_connections()
+        except Exception:
+            conns = prev["connections"]
+        sample = {
+            "cpu":         int(psutil.cpu_percent(interval=None)),
+            "mem":         int(psutil.virtual_memory().percent),
+            "latency":     int(rtt) if rtt is not None else prev["latency"],
+            "latency_ok":  rtt is not None,
+            "connections": conns,
+            "sampled_at":  time.time(),
+        }
+        self.latest = sample          # atomic publish
+        self.samples  += 1
+        self.sample_ms = (time.perf_counter() - start) * 1000
+        return sample
+
+    def _loop(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[HEALTH] Sample failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        psutil.cpu_percent(interval=None)   # prime the cpu counter
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"[HEALTH] Sampler started (every {self.interval:.0f}s, "
+              f"probe {PROBE_HOST}:{PROBE_PORT})")
+
+    def stats(self):
+        return {
+            "samples":        self.samples,
+            "probe_failures": self.probe_failures,
+            "sample_ms":      round(self.sample_ms, 2),
+            "age_s":          round(time.time() - self.latest["sampled_at"], 1)
+                              if self.latest["sampled_at"] else None,
+            "latest":         dict(self.latest),
+        }
+
+
+# Global singleton
+health = HealthSampler()
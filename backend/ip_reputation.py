@@ -0,0 +1,256 @@
+"""
+ip_reputation.py
+================
+CyGuardian-X — O(1) known-bad / allow-list IP lookups with CIDR support
+
+Replaces the `src in KNOWN_BAD_IPS` list scan on the packet path.
+  • exact addresses  — one dict lookup on the source string (no parsing)
+  • CIDR ranges      — one hash table per prefix length actually present;
+                       a lookup masks the address once per length, so the
+                       cost is bounded by 33 (v4) / 129 (v6) probes no matter
+                       how many ranges are loaded — in practice a handful.
+Sources: BlockedIP, MaliciousIP, DetectionIPAction (Blocked / Whitelisted),
+the built-in seed list, and auto-blocks from Block signature rules.  The
+API endpoints update the sets incrementally; a full reload runs on start
+and every RELOAD_INTERVAL seconds.  block / unblock / whitelist are also
+reported to `on_change`, which the parent process points at the capture
+worker pool so every worker's copy follows (capture_workers.py).
+"""
+
+import collections
+import ipaddress
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+RELOAD_INTERVAL     = 300       # seconds between full DB reloads
+MAX_DYNAMIC_ENTRIES = 100_000   # cap on auto-blocked IPs from signature hits
+
+
+def _parse(ip: str) -> Optional[Tuple[int, int, int]]:
+    """(version, network int, prefixlen) for an address or CIDR string."""
+    try:
+        net = ipaddress.ip_network(ip.strip(), strict=False)
+    except (ValueError, AttributeError):
+        return None
+    return net.version, int(net.network_address) >> (net.max_prefixlen - net.prefixlen), net.prefixlen
+
+
+class ReputationSet:
+    """
+    Exact + prefix lookup table.  Readers never lock: writers mutate the
+    dicts in place (atomic under the GIL) and republish the per-family
+    (prefixlen, table) tuples by reference when a new length appears.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, str] = {}                       # "1.2.3.4" -> source
+        self._nets:  Dict[Tuple[int, int], Dict[int, str]] = {}  # (ver, plen) -> {net: source}
+        self._v4: Tuple[Tuple[int, Dict[int, str]], ...] = ()
+        self._v6: Tuple[Tuple[int, Dict[int, str]], ...] = ()
+        self._lock = threading.Lock()
+
+    def _republish(self):
+        by_len = sorted(self._nets.items(), key=lambda kv: -kv[0][1])  # longest prefix first
+        self._v4 = tuple((plen, t) for (ver, plen), t in by_len if ver == 4 and t)
+        self._v6 = tuple((plen, t) for (ver, plen), t in by_len if ver == 6 and t)
+
+    def add(self, ip: str, source: str = "manual") -> bool:
+        parsed = _parse(ip)
+        if parsed is None:
+            return False
+        ver, net, plen = parsed
+        with self._lock:
+            if plen == (32 if ver == 4 else 128):
+                self._exact[str(ipaddress.ip_address(net))] = source
+            else:
+                table = self._nets.setdefault((ver, plen), {})
+                fresh = not table
+                table[net] = source
+                if fresh:
+                    self._republish()
+        return True
+
+    def remove(self, ip: str, keep: str = None) -> bool:
+        """Drop the entry for `ip` — unless its source is `keep`."""
+        parsed = _parse(ip)
+        if parsed is None:
+            return False
+        ver, net, plen = parsed
+        with self._lock:
+            if plen == (32 if ver == 4 else 128):
+                key = str(ipaddress.ip_address(net))
+                if keep is not None and self._exact.get(key) == keep:
+                    return False
+                return self._exact.pop(key, None) is not None
+            table = self._nets.get((ver, plen))
+            if not table or (keep is not None and table.get(net) == keep) \
+                    or table.pop(net, None) is None:
+                return False
+            if not table:
+                self._republish()
+            return True
+
+    def replace(self, entries: Iterable[Tuple[str, str]]):
+        """Bulk (re)load from (ip_or_cidr, source) pairs."""
+        fresh = ReputationSet()
+        for ip, source in entries:
+            fresh.add(ip, source)
+        with self._lock:
+            self._exact, self._nets = fresh._exact, fresh._nets
+            self._republish()
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Source label for `ip` if it is listed (exactly or inside a range)."""
+        hit = self._exact.get(ip)
+        if hit is not None:
+            return hit
+        if ":" in ip:
+            tables, bits, family = self._v6, 128, socket.AF_INET6
+        else:
+            tables, bits, family = self._v4, 32, socket.AF_INET
+        if not tables:
+            return None
+        try:
+            addr = int.from_bytes(socket.inet_pton(family, ip), "big")
+        except (OSError, ValueError):
+            return None
+        for plen, table in tables:
+            hit = table.get(addr >> (bits - plen))
+            if hit is not None:
+                return hit
+        return None
+
+    def __contains__(self, ip: str) -> bool:
+        return self.lookup(ip) is not None
+
+    def __len__(self):
+        return len(self._exact) + sum(len(t) for t in self._nets.values())
+
+    def stats(self) -> Dict:
+        return {
+            "exact":       len(self._exact),
+            "ranges":      sum(len(t) for t in self._nets.values()),
+            "prefix_lens": [plen for plen, _ in self._v4] + [plen for plen, _ in self._v6],
+        }
+
+
+class IPReputation:
+    """Block list + allow list; an allow-listed address is never 'bad'."""
+
+    def __init__(self):
+        self.bad     = ReputationSet()
+        self.allowed = ReputationSet()
+        self._seed: list = []
+        self._dynamic: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+        self._dyn_lock = threading.Lock()
+        self.on_change: Optional[Callable[..., None]] = None   # (method, *args)
+
+    def _changed(self, method: str, *args):
+        if self.on_change is not None:
+            try:
+                self.on_change(method, *args)
+            except Exception as e:
+                print(f"[REPUTATION] Change broadcast failed: {e}")
+
+    def seed(self, ips: Iterable[str]):
+        """Built-in entries that survive every DB reload."""
+        for ip in ips:
+            self._seed.append(ip)
+            self.bad.add(ip, "builtin")
+
+    # ── packet path ──────────────────────────────────────────
+    def is_bad(self, ip: str) -> bool:
+        if self.bad.lookup(ip) is None:
+            return False
+        return self.allowed.lookup(ip) is None
+
+    # ── incremental updates (API / engine) ───────────────────
+    def block(self, ip: str, source: str = "manual"):
+        self.allowed.remove(ip)
+        self.bad.add(ip, "builtin" if ip in self._seed else source)
+        self._changed("block", ip, source)
+
+    def unblock(self, ip: str):
+        """Remove a runtime / DB block — built-in seed entries stay."""
+        self._forget(ip)
+        self.bad.remove(ip, keep="builtin")
+        self._changed("unblock", ip)
+
+    def whitelist(self, ip: str):
+        """
+        Allow-list in memory.  Callers persist it as a DetectionIPAction
+        "Whitelisted" row, or the next load_from_db drops it again.
+        """
+        self._forget(ip)
+        self.bad.remove(ip, keep="builtin")
+        self.allowed.add(ip, "whitelist")
+        self._changed("whitelist", ip)
+
+    def _forget(self, ip: str):
+        """Drop an auto-flagged entry, or load_from_db would re-add it."""
+        with self._dyn_lock:
+            self._dynamic.pop(ip, None)
+
+    def flag(self, ip: str):
+        """Auto-block from a signature hit — bounded FIFO so floods can't grow it forever."""
+        if self.bad.lookup(ip) is not None or self.allowed.lookup(ip) is not None:
+            return
+        self.bad.add(ip, "signature")
+        with self._dyn_lock:
+            self._dynamic[ip] = None
+            while len(self._dynamic) > MAX_DYNAMIC_ENTRIES:
+                old, _ = self._dynamic.popitem(last=False)
+                if self.bad.lookup(old) == "signature":
+                    self.bad.remove(old)
+
+    # ── full reload ──────────────────────────────────────────
+    def load_from_db(self) -> int:
+        try:
+            from database import SessionLocal
+            from models.network import BlockedIP
+            from models.audit import MaliciousIP
+            from models.incident import DetectionIPAction
+            db = SessionLocal()
+            try:
+                bad = [(ip, "builtin") for ip in self._seed]
+                bad += [(ip, "blocked_ips") for (ip,) in db.query(BlockedIP.ip).all()]
+                bad += [(ip, "malicious_ips") for (ip,) in db.query(MaliciousIP.ip).all()]
+                allowed = []
+                for ip, action in db.query(DetectionIPAction.ip, DetectionIPAction.action).all():
+                    if (action or "").lower().startswith("block"):
+                        bad.append((ip, "detection_action"))
+                    elif (action or "").lower().startswith(("whitelist", "allow")):
+                        allowed.append((ip, "whitelist"))
+            finally:
+                db.close()
+            with self._dyn_lock:
+                bad += [(ip, "signature") for ip in self._dynamic]
+            self.bad.replace(bad)
+            self.allowed.replace(allowed)
+            print(f"[REPUTATION] Loaded {len(self.bad)} bad / {len(self.allowed)} allowed entries")
+            return len(self.bad)
+        except Exception as e:
+            print(f"[REPUTATION] Load error: {e}")
+            return 0
+
+    def _reloader(self):
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            self.load_from_db()
+
+    def start(self):
+        self.load_from_db()
+        threading.Thread(target=self._reloader, daemon=True).start()
+
+    def stats(self) -> Dict:
+        return {
+            "bad":     self.bad.stats(),
+            "allowed": self.allowed.stats(),
+            "dynamic": len(self._dynamic),
+        }
+
+
+# Global singleton
+reputation = IPReputation()
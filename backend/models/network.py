@@ -1,5 +1,5 @@
 # idps-backend/models/network.py
-from sqlalchemy import Column, String, Integer, Text, DateTime, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Boolean
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
@@ -13,23 +13,32 @@ class BlockedIP(Base):
     blocked_by = Column(String, default="system")
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    
+
+
+# network_logs, network_alerts and captured_packets are range-partitioned
+# by created_at on PostgreSQL (alembic c3d92a7e4f10), which requires the
+# real primary key to be (id, created_at).  The models keep `id` alone on
+# purpose: id still comes from one sequence and is unique, so lookups by id
+# (session.get, filter(id == ...)) return the same row, and SQLite in
+# development keeps its INTEGER PRIMARY KEY autoincrement.  Alembic
+# autogenerate does not compare primary keys, so this shows no drift — do
+# not "fix" it with a migration.
 class NetworkLog(Base):
     __tablename__ = "network_logs"
 
-    id         = Column(Integer,    primary_key=True, autoincrement=True)
+    id         = Column(Integer,    primary_key=True, autoincrement=True)   # DB PK is (id, created_at), see above
     status     = Column(String(20), nullable=False)   # BLOCKED / ALLOWED / FLAGGED
     src_ip     = Column(String(45), nullable=False)
     event      = Column(String(30), nullable=False)   # BLOCKED / ALLOWED / ALERT
     result     = Column(String(20), nullable=False)   # SUCCESS / INFO / WARNING
     message    = Column(Text,       nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
 
 class NetworkAlert(Base):
     __tablename__ = "network_alerts"
 
-    id         = Column(Integer,    primary_key=True, autoincrement=True)
+    id         = Column(Integer,    primary_key=True, autoincrement=True)   # DB PK is (id, created_at), see above
     severity   = Column(String(20), nullable=False)   # Low / Medium / High / Critical
     src_ip     = Column(String(45), nullable=False)
     dst_ip     = Column(String(45), nullable=False)
@@ -37,12 +46,13 @@ class NetworkAlert(Base):
     protocol   = Column(String(20), nullable=True)
     port       = Column(Integer,    nullable=True)
     resolved   = Column(Boolean,    default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    pcap_path  = Column(String(255), nullable=True)   # evidence file name (pcap_ring.py)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
 class CapturedPacket(Base):
     __tablename__ = "captured_packets"
 
-    id         = Column(Integer,    primary_key=True, autoincrement=True)
+    id         = Column(Integer,    primary_key=True, autoincrement=True)   # DB PK is (id, created_at), see above
     src_ip     = Column(String(45), nullable=False, index=True)
     dst_ip     = Column(String(45), nullable=False, index=True)
     protocol   = Column(String(20), nullable=False, index=True)
@@ -50,4 +60,25 @@ class CapturedPacket(Base):
     length     = Column(Integer,    nullable=False, default=0)  # bytes
     status     = Column(String(20), nullable=False, default="Established")
     flagged    = Column(Boolean,    default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class NetworkFlow(Base):
+    __tablename__ = "network_flows"
+
+    id         = Column(Integer,    primary_key=True, autoincrement=True)
+    src_ip     = Column(String(45), nullable=False, index=True)
+    dst_ip     = Column(String(45), nullable=False, index=True)
+    src_port   = Column(Integer,    nullable=False, default=0)
+    dst_port   = Column(Integer,    nullable=False, default=0)
+    transport  = Column(String(10), nullable=False)              # TCP / UDP / ICMP / OTHER
+    protocol   = Column(String(20), nullable=False)              # display protocol
+    packets    = Column(Integer,    nullable=False, default=0)
+    bytes      = Column(BigInteger, nullable=False, default=0)
+    tcp_flags  = Column(Integer,    nullable=False, default=0)   # OR of every flag seen
+    tcp_state  = Column(String(12), nullable=True)
+    status     = Column(String(20), nullable=False, default="Established")
+    flagged    = Column(Boolean,    default=False)
+    end_reason = Column(String(10), nullable=False)              # idle / closed / active / evicted
+    first_seen = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_seen  = Column(DateTime(timezone=True), nullable=False)
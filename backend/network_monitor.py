@@ -6,6 +6,10 @@ CyGuardian-X — Network Monitoring Engine
 TWO MODES (controlled by USE_REAL_CAPTURE below):
   False → Simulated realistic traffic  (no sudo needed, works now)
   True  → Real Scapy packet capture    (needs: sudo venv/bin/python -m uvicorn ...)
+          CAPTURE_BACKEND picks scapy sniff or an AF_PACKET ring (capture_backend.py)
+          CAPTURE_WORKERS > 0 shards packets across N processes (capture_workers.py)
+          connections / active_connections come from the flow table (flow_table.py)
+  REPLAY_PCAP set → replay a capture file through the real pipeline (pcap_replay.py)
 
 Your interface: wlp0s20f3  (192.168.1.107)
 """
@@ -22,6 +26,11 @@ from typing import List, Dict, Any
 USE_REAL_CAPTURE = True          # False = simulated | True = real Scapy
 INTERFACE        = "wlp0s20f3"   # your WiFi interface
 MY_IP            = "172.20.10.2"
+CAPTURE_BACKEND  = "scapy"       # scapy | tpacket_v3 (mmap ring) | rawsocket
+CAPTURE_FILTER   = ""            # optional BPF filter, e.g. "ip and not port 22"
+CAPTURE_WORKERS  = 0             # 0 = single capture thread | N = N worker processes
+REPLAY_PCAP      = ""            # path to a pcap/pcapng → replay it instead of live capture
+REPLAY_SPEED     = 1.0           # 1.0 = original timing | N = N× faster | 0 = unthrottled
 # ────────────────────────────────────────────────────────────────
 
 if USE_REAL_CAPTURE:
@@ -47,40 +56,46 @@ except ImportError:
 import queue
 
 # ── Packet DB write queue (non-blocking) ──────────────────────
-_packet_queue = queue.Queue(maxsize=5000)
-
-def _db_writer():
-    """Background thread — drains packet queue into PostgreSQL."""
+_packet_queue = queue.Queue(maxsize=20_000)   # ~0.2 s at 100k rows/s
+_packet_writer = None   # copy_writer.CopyWriter, created by _db_writer
+
+def _db_writer(spill_name: str = "packets"):
+    """
+    Background thread — streams the packet queue into PostgreSQL via COPY.
+    Every process spills to its own queue: "packets" here, "packets-w<N>"
+    in capture worker N.
+    """
+    global _packet_writer
     import sys, os
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from database import SessionLocal
     from models.network import CapturedPacket
+    from persistence_policy import persistence
+    from copy_writer import CopyWriter
+    from spill_queue import SpillQueue, queue_names
 
-    BATCH_SIZE = 50   # write in batches for efficiency
-    batch = []
-
-    while True:
-        try:
-            pkt_data = _packet_queue.get(timeout=2)
-            batch.append(pkt_data)
-            if len(batch) >= BATCH_SIZE:
-                _flush_batch(batch, SessionLocal, CapturedPacket)
-                batch = []
-        except queue.Empty:
-            if batch:
-                _flush_batch(batch, SessionLocal, CapturedPacket)
-                batch = []
-
-def _flush_batch(batch, SessionLocal, CapturedPacket):
-    db = SessionLocal()
+    # Batches the database refuses are spilled to disk and replayed in order
     try:
-        db.bulk_insert_mappings(CapturedPacket, batch)
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"[DB] Packet write error: {e}")
-    finally:
-        db.close()
+        spill = SpillQueue(spill_name)
+    except OSError as e:
+        spill = None
+        print(f"[MONITOR] Packet spill disabled ({e}) — failed batches will be dropped")
+
+    # The parent replays what workers that will not start again left behind
+    if spill is not None and spill_name == "packets":
+        live = CAPTURE_WORKERS if (REPLAY_PCAP or (USE_REAL_CAPTURE and SCAPY_AVAILABLE)) else 0
+        for name in queue_names("packets-w"):
+            index = name[len("packets-w"):]
+            if index.isdigit() and int(index) >= live:
+                moved = spill.adopt(name)
+                if moved:
+                    print(f"[MONITOR] Adopted {moved:,} spilled rows from {name}")
+
+    # Back-pressure: the fill level left after each flush steers sampling
+    _packet_writer = CopyWriter(
+        CapturedPacket, name="packets", spill=spill,
+        on_flush=lambda: persistence.adapt(_packet_queue.qsize() / _packet_queue.maxsize),
+    )
+    _packet_writer.drain(_packet_queue)
 
 # ══════════════════════════════════════════════════════════════
 # CONSTANTS
@@ -101,6 +116,24 @@ KNOWN_BAD_IPS = [
     "77.83.246.90","91.108.4.200","5.188.206.14",
 ]
 
+SENSITIVE_PORTS  = frozenset({22, 23, 3389, 5900, 1433, 3306, 5432})
+SCAN_ALERT_PORTS = frozenset({22, 23, 3389, 5900, 1433, 3306})
+
+# One-pass field extraction shared by every packet-path stage
+from packet_meta import PacketMeta
+
+# O(1) exact + CIDR lookups for the packet path (KNOWN_BAD_IPS is the seed)
+from ip_reputation import reputation
+from health_sampler import health
+from flow_table import flows
+from sketches import syn_tracker
+from anomaly_engine import anomaly_engine
+from persistence_policy import persistence
+from partition_maintenance import partitions
+from pcap_ring import pcap_ring
+from alert_sink import alert_sink
+reputation.seed(KNOWN_BAD_IPS)
+
 def _rip():
     return f"{random.randint(10,220)}.{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(1,254)}"
 
@@ -111,11 +144,77 @@ def _fullts():
     return datetime.now().isoformat(timespec="seconds")
 
 # ══════════════════════════════════════════════════════════════
-# SHARED STATE  (thread-safe via lock)
+# SHARED STATE
+#   hot path  — per-thread counter shards + bounded deques, no lock
+#   1 s tick  — aggregate() folds the shards into the totals under
+#               `lock`, publish() swaps in a fresh snapshot dict
+#   readers   — snapshot() returns the last published dict
 # ══════════════════════════════════════════════════════════════
+class _TimedLock:
+    """
+    threading.Lock that records how long it is held / waited for.
+    Stats are updated while the lock is still held, so they need no lock.
+    """
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._since   = time.monotonic()
+        self._t0      = 0.0
+        self.holds    = 0
+        self.held_s   = 0.0
+        self.held_max = 0.0
+        self.wait_max = 0.0
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self._t0 = time.perf_counter()
+        wait = self._t0 - start
+        if wait > self.wait_max:
+            self.wait_max = wait
+        return self
+
+    def __exit__(self, *exc):
+        held = time.perf_counter() - self._t0
+        self.holds  += 1
+        self.held_s += held
+        if held > self.held_max:
+            self.held_max = held
+        self._lock.release()
+        return False
+
+    def stats(self):
+        uptime = time.monotonic() - self._since
+        return {
+            "holds":       self.holds,
+            "held_ms":     round(self.held_s * 1000, 1),
+            "held_pct":    round(self.held_s / uptime * 100, 3) if uptime else 0.0,
+            "held_max_ms": round(self.held_max * 1000, 2),
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+class _CounterShard:
+    """Counters written only by the owning thread; read by aggregate()."""
+    __slots__ = ("packets", "bytes", "blocked", "detected", "proto", "seen")
+
+    def __init__(self):
+        self.packets  = 0
+        self.bytes    = 0
+        self.blocked  = 0
+        self.detected = 0
+        self.proto: Dict[str, int] = {}
+        self.seen = (0, 0, 0, 0, {})   # values at the previous aggregate()
+
+
 class MonitorState:
     def __init__(self):
-        self.lock = threading.Lock()
+        self.lock = _TimedLock()       # tick-time writes + published fields only
+
+        # Per-thread counter shards
+        self._local  = threading.local()
+        self._shards: List[_CounterShard] = []
+        self._shards_lock = threading.Lock()
 
         # Rolling counters
         self.total_packets   = 1_482_301
@@ -138,14 +237,11 @@ class MonitorState:
             "Internal":42,"External":33,"Suspicious":15,"Blocked":10
         }
 
-        # Rolling log (last 200 entries)
-        self.logs: collections.deque = collections.deque(maxlen=200)
-
-        # Active connections list
-        self.connections: List[Dict] = []
-
-        # Active alerts (last 20)
-        self.alerts: List[Dict] = []
+        # Rolling log (last 200), alerts (last 20), connections (last 60) —
+        # deque appends are atomic, so producers never lock
+        self.logs:        collections.deque = collections.deque(maxlen=200)
+        self.alerts:      collections.deque = collections.deque(maxlen=20)
+        self.connections: collections.deque = collections.deque(maxlen=60)
 
         # System health
         self.cpu     = 42
@@ -153,20 +249,80 @@ class MonitorState:
         self.pkt_loss = 2
         self.latency  = 18
 
-        # Packet counter for current second
-        self._tick_packets = 0
-        self._tick_bytes   = 0
-
-        # Counters for protocol buckets
+        # Counters for protocol buckets (aggregated)
         self.proto_counts = collections.defaultdict(int)
 
-        # Threat counter
+        # Threat counter (aggregated)
         self.threats_blocked = 0
         self.threats_detected = 0
 
         # WebSocket subscriber set
         self.subscribers = set()
 
+        self._published: Dict[str, Any] = {}
+        self.publish()
+
+    # ── hot-path counters ────────────────────────────────────
+    def _shard(self) -> _CounterShard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _CounterShard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def count_packet(self, proto: str, length: int):
+        shard = self._shard()
+        shard.packets += 1
+        shard.bytes   += length
+        shard.proto[proto] = shard.proto.get(proto, 0) + 1
+
+    def count_blocked(self, n: int = 1):
+        self._shard().blocked += n
+
+    def count_detected(self, n: int = 1):
+        self._shard().detected += n
+
+    def absorb(self, delta: Dict[str, Any]):
+        """Add another process's aggregate() delta to this thread's shard."""
+        shard = self._shard()
+        shard.packets  += delta["packets"]
+        shard.bytes    += delta["bytes"]
+        shard.blocked  += delta["blocked"]
+        shard.detected += delta["detected"]
+        for k, v in delta["proto"].items():
+            shard.proto[k] = shard.proto.get(k, 0) + v
+
+    def aggregate(self) -> Dict[str, Any]:
+        """
+        Fold every shard's growth since the previous call into the totals.
+        Returns that delta (packets, bytes, blocked, detected, proto).
+        """
+        delta = {"packets": 0, "bytes": 0, "blocked": 0, "detected": 0, "proto": {}}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            proto = dict(shard.proto)
+            now = (shard.packets, shard.bytes, shard.blocked, shard.detected, proto)
+            seen, shard.seen = shard.seen, now
+            delta["packets"]  += now[0] - seen[0]
+            delta["bytes"]    += now[1] - seen[1]
+            delta["blocked"]  += now[2] - seen[2]
+            delta["detected"] += now[3] - seen[3]
+            for k, v in proto.items():
+                grown = v - seen[4].get(k, 0)
+                if grown:
+                    delta["proto"][k] = delta["proto"].get(k, 0) + grown
+        with self.lock:
+            self.total_packets    += delta["packets"]
+            self.total_bytes      += delta["bytes"]
+            self.threats_blocked  += delta["blocked"]
+            self.threats_detected += delta["detected"]
+            for k, v in delta["proto"].items():
+                self.proto_counts[k] += v
+        return delta
+
     # ── helpers ──────────────────────────────────────────────
     def add_log(self, event, ip, action, status, detail=""):
         entry = {
@@ -178,11 +334,14 @@ class MonitorState:
             "status": status,
             "detail": detail,
         }
-        with self.lock:
-            self.logs.appendleft(entry)
+        self.logs.appendleft(entry)
         return entry
 
-    def add_alert(self, severity, src_ip, alert_type, desc):
+    def add_alert(self, severity, src_ip, alert_type, desc, meta=None, persist=True):
+        """
+        persist=False when the caller writes its own network_alerts row
+        (signature_engine → alert_sink.submit with the pcap link).
+        """
         alert = {
             "id":       int(time.time()*1000) + random.randint(0,999),
             "time":     _ts(),
@@ -192,24 +351,23 @@ class MonitorState:
             "desc":     desc,
             "glowing":  severity == "Critical",
         }
-        with self.lock:
-            self.alerts.insert(0, alert)
-            if len(self.alerts) > 20:
-                self.alerts.pop()
-            if severity in ("High","Critical"):
-                self.threats_detected += 1
+        if meta is not None:
+            # sets alert["pcap"] for High / Critical; a new file gets its own alert row
+            if pcap_ring.trigger(meta, alert) and persist:
+                alert_sink.submit_detection(severity, alert_type, desc, meta.src, meta.dst,
+                                            meta.proto, meta.dport, pcap=alert["pcap"])
+        self.alerts.appendleft(alert)
+        if severity in ("High","Critical"):
+            self.count_detected()
         return alert
 
     def add_connection(self, conn):
-        with self.lock:
-            self.connections.insert(0, conn)
-            if len(self.connections) > 60:
-                self.connections.pop()
+        self.connections.appendleft(conn)
 
-    def snapshot(self) -> Dict[str, Any]:
-        """Return a complete JSON-serialisable snapshot of current state."""
+    def publish(self):
+        """Build the dashboard snapshot once per tick and swap it in."""
         with self.lock:
-            return {
+            self._published = {
                 "timestamp":    _fullts(),
                 "stats": {
                     "total_packets":      self.total_packets,
@@ -236,6 +394,10 @@ class MonitorState:
                 "logs":        list(self.logs)[:50],
             }
 
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the last published JSON-serialisable snapshot (never blocks)."""
+        return self._published
+
 
 # Global singleton
 state = MonitorState()
@@ -364,8 +526,10 @@ def _simulated_tick():
     if random.random() < 0.30:
         _sim_alert()
         if random.random() < 0.5:
-            with state.lock:
-                state.threats_blocked += 1
+            state.count_blocked()
+
+    state.aggregate()
+    state.publish()
 
 
 def _simulated_engine():
@@ -389,155 +553,102 @@ def _simulated_engine():
 # ══════════════════════════════════════════════════════════════
 def _process_real_packet(pkt):
     """Callback for every captured packet."""
-    if not pkt.haslayer("IP"):
+    meta = PacketMeta.from_packet(pkt)   # the only place packet layers are read
+    if meta is None:
         return
+    src, dst, port = meta.src, meta.dst, meta.dport
+    display_proto  = meta.proto
 
-    ip_layer = pkt["IP"]
-    src      = ip_layer.src
-    dst      = ip_layer.dst
-    length   = len(pkt)
-
-    if pkt.haslayer("TCP"):
-        proto = "TCP"
-        port  = pkt["TCP"].dport
-    elif pkt.haslayer("UDP"):
-        proto = "UDP"
-        port  = pkt["UDP"].dport
-    elif pkt.haslayer("ICMP"):
-        proto = "ICMP"
-        port  = 0
-    else:
-        proto = "OTHER"
-        port  = 0
+    state.count_packet(display_proto, meta.length)
+    pcap_ring.record(meta)
 
-    port_proto_map = {
-        80:"HTTP", 443:"HTTPS", 53:"DNS", 22:"SSH",
-        21:"FTP", 25:"SMTP", 3306:"MySQL", 5432:"PostgreSQL",
-        3389:"RDP", 8080:"HTTP-ALT", 8443:"HTTPS-ALT",
-    }
-    display_proto = port_proto_map.get(port, proto)
-
-    with state.lock:
-        state.total_packets += 1
-        state._tick_packets += 1
-        state._tick_bytes   += length
-        state.proto_counts[display_proto] += 1
-
-    is_bad_ip         = src in KNOWN_BAD_IPS
-    is_sensitive_port = port in [22, 23, 3389, 5900, 1433, 3306, 5432]
+    is_bad_ip         = reputation.is_bad(src)
+    is_sensitive_port = port in SENSITIVE_PORTS
     status = "Blocked" if is_bad_ip else "Suspicious" if is_sensitive_port else "Established"
 
-    if random.random() < 0.15:
-        conn = {
-            "id":        int(time.time() * 1000) + random.randint(0, 999),
-            "srcIp":     src,
-            "dstIp":     dst,
-            "protocol":  display_proto,
-            "port":      port,
-            "status":    status,
-            "data":      f"{length} B",
-            "duration":  "0m 0s",
-            "flagged":   is_bad_ip or is_sensitive_port,
-            "timestamp": _fullts(),
-        }
-        state.add_connection(conn)
+    flow = flows.update(meta, status)
+    meta.events = syn_tracker.observe(meta)
+    anomaly_engine.observe(meta, flow.is_new)
 
-    _detect_threats(pkt, src, dst, proto, port)
+    _detect_threats(meta, is_bad_ip)
 
     # ── Signature Rules Engine matching ───────────────────────
+    matched = None
     if SIG_ENGINE_AVAILABLE:
         try:
-            payload = ""
-            if pkt.haslayer("Raw"):
-                try:
-                    payload = pkt["Raw"].load.decode("utf-8", errors="ignore")
-                except Exception:
-                    payload = ""
-            match_packet(src, dst, display_proto, port, payload, pkt)
+            matched = match_packet(meta)
         except Exception as e:
             pass  # never crash the capture thread
 
-    # Store every 10th packet in DB (non-blocking)
-    if random.random() < 0.1:
+    # Persist per policy: hits / flagged always, the rest per-flow sampled
+    flagged = is_bad_ip or is_sensitive_port
+    tier = persistence.admit(meta, flagged, bool(matched or meta.events))
+    if tier is not None:
         try:
             _packet_queue.put_nowait({
                 "src_ip":   src,
                 "dst_ip":   dst,
                 "protocol": display_proto,
                 "port":     port,
-                "length":   length,
+                "length":   meta.length,
                 "status":   status,
-                "flagged":  is_bad_ip or is_sensitive_port,
+                "flagged":  flagged,
             })
-        except Exception:
-            pass  # queue full — drop packet
+            persistence.kept(tier)
+        except queue.Full:
+            persistence.dropped(tier)
 
-def _detect_threats(pkt, src, dst, proto, port=0):
+def _detect_threats(meta: PacketMeta, is_bad_ip: bool):
     """Basic real-time threat detection on captured packets."""
-    # Known bad IPs
-    if src in KNOWN_BAD_IPS:
+    src = meta.src
+    # Known bad IPs (looked up once in _process_real_packet)
+    if is_bad_ip:
         state.add_alert("Critical", src, "Malware Signature",
-                        f"Packet from known malicious IP {src}")
+                        f"Packet from known malicious IP {src}", meta=meta)
         state.add_log("BLOCKED", src, "BLOCKED", "CRITICAL",
                      "Known bad IP auto-blocked")
-        with state.lock:
-            state.threats_blocked += 1
+        state.count_blocked()
+        return
+
+    if meta.transport != "TCP":
         return
 
-    # SYN flood detection (TCP with SYN flag, no ACK)
-    if pkt.haslayer("TCP"):
-        tcp = pkt["TCP"]
-        if tcp.flags == 0x02:   # SYN only
-            state.add_log("PORT_SCAN", src, "FLAGGED", "WARNING",
-                         f"SYN to port {tcp.dport}")
+    # SYN flood / port scan — once per attacker, from the sliding-window sketches
+    for kind in meta.events:
+        event = "DDOS" if kind == "syn_flood" else "PORT_SCAN"
+        state.add_log(event, src, "FLAGGED", "WARNING", syn_tracker.describe(kind, meta))
 
     # Port scan — connections to many ports from same IP
-    if proto == "TCP" and pkt.haslayer("TCP"):
-        port = pkt["TCP"].dport
-        if port in [22, 23, 3389, 5900, 1433, 3306]:
-            sev = "High" if port in [22, 3389] else "Medium"
-            state.add_alert(sev, src, "Port Scanning",
-                           f"Connection attempt to sensitive port {port} from {src}")
-            state.add_log("PORT_SCAN", src, "FLAGGED", "WARNING",
-                         f"Sensitive port {port} accessed")
+    port = meta.dport
+    if port in SCAN_ALERT_PORTS:
+        sev = "High" if port in (22, 3389) else "Medium"
+        state.add_alert(sev, src, "Port Scanning",
+                       f"Connection attempt to sensitive port {port} from {src}", meta=meta)
+        state.add_log("PORT_SCAN", src, "FLAGGED", "WARNING",
+                     f"Sensitive port {port} accessed")
 
 
 def _real_stats_updater():
     """Updates per-second stats from real capture counters."""
     while True:
         time.sleep(1)
+        tick = state.aggregate()
         with state.lock:
-            pps = state._tick_packets
-            bw  = int((state._tick_bytes * 8) / 1_000_000)   # bits → Mbps
+            pps = tick["packets"]
+            bw  = int((tick["bytes"] * 8) / 1_000_000)   # bits → Mbps
             state.pps        = pps
             state.bandwidth  = bw
             state.upload     = bw // 3
             state.download   = bw - (bw // 3)
-            state._tick_packets = 0
-            state._tick_bytes   = 0
             state.pps_history.append(pps)
             state.bw_history.append(bw)
 
-            # Real system stats
-            state.cpu      = int(psutil.cpu_percent(interval=None))
-            state.mem      = int(psutil.virtual_memory().percent)
-            # Real latency via ping
-            try:
-                import subprocess
-                result = subprocess.run(
-                    ["ping", "-c", "1", "-W", "1", "8.8.8.8"],
-                    capture_output=True, text=True, timeout=2
-                )
-                for line in result.stdout.split("\n"):
-                    if "time=" in line:
-                        state.latency = int(float(line.split("time=")[1].split(" ")[0]))
-                        break
-            except:
-                state.latency = random.randint(4, 30)
-
-            # Real active connections via psutil
-            conns = psutil.net_connections(kind="inet")
-            state.active_connections = len(conns)
+            # System health — sampled on its own thread, never under this lock
+            sample = health.latest
+            if sample["sampled_at"]:
+                state.cpu     = sample["cpu"]
+                state.mem     = sample["mem"]
+                state.latency = sample["latency"]
 
             # Real protocol distribution from counts
             total = sum(state.proto_counts.values()) or 1
@@ -545,17 +656,53 @@ def _real_stats_updater():
                 k: int((v/total)*100)
                 for k,v in state.proto_counts.items()
             }
+        if _worker_pool is None:   # workers report their own flows
+            publish_flows()
+        state.publish()
+
+
+def publish_flows():
+    """Expire flows and swap the most recent ones in as state.connections."""
+    flows.sweep()
+    state.connections = collections.deque(flows.recent(60), maxlen=60)
+    state.active_connections = len(flows)
+
+
+_worker_pool     = None
+_capture_backend = None
+
+def broadcast_control(op: str, *args):
+    """Forward an API-side change to the capture workers, if any (capture_workers._apply_control)."""
+    if _worker_pool is not None:
+        _worker_pool.broadcast(op, *args)
 
 
 def _real_engine():
-    """Start Scapy sniffer + stats updater thread."""
-    print(f"[REAL] Starting Scapy capture on {INTERFACE}")
-    # Stats updater in background
+    """Start the capture backend + stats updater thread."""
+    global _worker_pool, _capture_backend
+    from capture_backend import open_backend
+    # Health sampler, flow exporter + stats updater in background
+    health.start()
+    flows.start()
     t = threading.Thread(target=_real_stats_updater, daemon=True)
     t.start()
-    # Scapy blocking sniff
-    from scapy.all import sniff
-    sniff(iface=INTERFACE, prn=_process_real_packet, store=False)
+    if REPLAY_PCAP:
+        from pcap_replay import PcapReplay
+        print(f"[REPLAY] Replaying {REPLAY_PCAP} at {REPLAY_SPEED or 'max'}x")
+        _capture_backend = PcapReplay(REPLAY_PCAP, REPLAY_SPEED)
+    else:
+        print(f"[REAL] Starting {CAPTURE_BACKEND} capture on {INTERFACE}")
+        _capture_backend = open_backend(CAPTURE_BACKEND, INTERFACE, CAPTURE_FILTER)
+    # Multi-process mode — this thread only reads frames and shards them
+    if CAPTURE_WORKERS > 0:
+        from capture_workers import WorkerPool
+        _worker_pool = WorkerPool(CAPTURE_WORKERS, state)
+        _worker_pool.start()
+        reputation.on_change = lambda *args: _worker_pool.broadcast("reputation", *args)
+        _worker_pool.feed(_capture_backend.raw_frames())
+        return
+    # Blocking capture loop — Scapy packets or decoded Frames
+    _capture_backend.run(_process_real_packet)
 
 
 # ══════════════════════════════════════════════════════════════
@@ -568,14 +715,23 @@ def start_monitor():
     db_thread.start()
     print("[MONITOR] DB writer thread started")
 
+    # Load block / allow lists into the reputation set
+    reputation.start()
+    anomaly_engine.start()
+    persistence.start()
+    partitions.start()
+    pcap_ring.start()
+    alert_sink.start()
+
     # Start signature rules engine
     if SIG_ENGINE_AVAILABLE:
         start_signature_engine()
 
-    if USE_REAL_CAPTURE and SCAPY_AVAILABLE:
+    if REPLAY_PCAP or (USE_REAL_CAPTURE and SCAPY_AVAILABLE):
         t = threading.Thread(target=_real_engine, daemon=True)
     else:
         t = threading.Thread(target=_simulated_engine, daemon=True)
     t.start()
-    mode = "REAL CAPTURE" if (USE_REAL_CAPTURE and SCAPY_AVAILABLE) else "SIMULATED"
+    mode = "PCAP REPLAY" if REPLAY_PCAP else \
+           "REAL CAPTURE" if (USE_REAL_CAPTURE and SCAPY_AVAILABLE) else "SIMULATED"
     print(f"[MONITOR] Engine started — MODE: {mode}")
\ No newline at end of file
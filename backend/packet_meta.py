@@ -0,0 +1,101 @@
+"""
+packet_meta.py
+==============
+CyGuardian-X — One-pass packet field extraction
+
+PacketMeta is built once per packet in _process_real_packet and handed to
+every later stage (_detect_threats, match_packet, the built-in detectors),
+so nothing downstream calls haslayer() / pkt["LAYER"] again.
+
+  transport — L4 protocol: TCP / UDP / ICMP / OTHER
+  proto     — display protocol: PORT_PROTO_MAP[dport] or the transport
+  payload   — L4 payload as bytes (Scapy) or the Frame's zero-copy
+              memoryview; matched as-is, never decoded on the packet path
+  raw       — the original packet (Scapy Packet or capture_backend.Frame),
+              kept only for detectors that really need it
+  events    — stateful detections that fired on this packet, set by
+              syn_tracker.observe() ("syn_flood", "port_scan")
+"""
+
+from typing import Optional
+
+from capture_backend import Frame
+
+PORT_PROTO_MAP = {
+    80:"HTTP", 443:"HTTPS", 53:"DNS", 22:"SSH",
+    21:"FTP", 25:"SMTP", 3306:"MySQL", 5432:"PostgreSQL",
+    3389:"RDP", 8080:"HTTP-ALT", 8443:"HTTPS-ALT",
+}
+
+_TRANSPORTS = ("TCP", "UDP", "ICMP")
+
+
+class PacketMeta:
+    __slots__ = ("src", "dst", "transport", "proto", "sport", "dport",
+                 "flags", "length", "payload", "raw", "events", "_text")
+
+    def __init__(self, src: str, dst: str, transport: str, sport: int, dport: int,
+                 flags: int, length: int, payload=b"", raw=None):
+        self.src       = src
+        self.dst       = dst
+        self.transport = transport
+        self.proto     = PORT_PROTO_MAP.get(dport, transport)
+        self.sport     = sport
+        self.dport     = dport
+        self.flags     = flags
+        self.length    = length
+        self.payload   = payload
+        self.raw       = raw
+        self.events    = ()           # stateful detections fired on this packet (sketches.py)
+        self._text     = None
+
+    @property
+    def port(self) -> int:
+        return self.dport
+
+    @property
+    def text(self) -> str:
+        """Payload decoded once as UTF-8 (undecodable bytes dropped) — display only."""
+        if self._text is None:
+            self._text = str(self.payload, "utf-8", "ignore") if self.payload else ""
+        return self._text
+
+    @classmethod
+    def from_packet(cls, pkt) -> Optional["PacketMeta"]:
+        """Extract fields from a Scapy packet or a decoded Frame. None if not IPv4."""
+        if type(pkt) is Frame:
+            if not pkt.haslayer("IP"):
+                return None
+            sport, dport = (pkt.sport, pkt.dport) if pkt.proto in ("TCP", "UDP") else (0, 0)
+            return cls(pkt.src, pkt.dst, pkt.proto, sport, dport, pkt.flags,
+                       pkt.length, pkt.payload, pkt)
+        return cls._from_scapy(pkt)
+
+    @classmethod
+    def _from_scapy(cls, pkt) -> Optional["PacketMeta"]:
+        """Single walk down the Scapy layer chain."""
+        ip = l4 = load = None
+        layer = pkt
+        while layer is not None and layer.__class__.__name__ != "NoPayload":
+            name = layer.__class__.__name__
+            if name == "IP":
+                if ip is None:
+                    ip = layer
+            elif name in _TRANSPORTS:
+                if l4 is None:
+                    l4 = layer
+            elif name == "Raw":
+                load = layer.load
+                break
+            layer = layer.payload
+        if ip is None:
+            return None
+
+        transport = l4.__class__.__name__ if l4 is not None else "OTHER"
+        sport = dport = flags = 0
+        if transport == "TCP":
+            sport, dport, flags = l4.sport, l4.dport, int(l4.flags)
+        elif transport == "UDP":
+            sport, dport = l4.sport, l4.dport
+        return cls(ip.src, ip.dst, transport, sport, dport, flags,
+                   len(pkt), load or b"", pkt)
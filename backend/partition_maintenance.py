@@ -0,0 +1,234 @@
+"""
+partition_maintenance.py
+========================
+CyGuardian-X — Daily partitions and retention for high-volume tables
+
+captured_packets, network_logs and network_alerts are range-partitioned by
+created_at, one partition per UTC day (alembic c3d92a7e4f10).  Every
+RUN_INTERVAL this job:
+  • drops whole partitions that ended before today − log_retention_days
+    (SystemSettings) — a catalog operation, no DELETE and no vacuum debt
+  • deletes expired rows from the DEFAULT partition (normally empty; it
+    only catches rows outside the daily range)
+  • creates the partitions for today … today + PREMAKE_DAYS.  If the
+    DEFAULT partition already holds rows for that day (the job was not
+    running), they are moved into the new partition in the same
+    transaction; a day that still cannot be created is skipped with a
+    warning and retried on the next pass
+Retention runs first and on its own, so a failed create never stops it.
+A table that is not partitioned (SQLite in development, or a database
+created with create_all instead of alembic) gets a plain DELETE of expired
+rows instead, so retention is enforced either way.
+
+Partitions are named <table>_pYYYYMMDD and looked up in the connection's
+current schema.
+"""
+
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+TABLES            = ("captured_packets", "network_logs", "network_alerts")
+PREMAKE_DAYS      = 3
+RUN_INTERVAL      = 3600      # seconds
+DEFAULT_RETENTION = 90        # days, when SystemSettings has no row
+DELETE_BATCH      = 10_000    # rows per DELETE on unpartitioned tables
+
+_PART_RE = re.compile(r"_p(\d{8})$")
+
+
+def _day_bounds(day: date):
+    lo = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return lo, lo + timedelta(days=1)
+
+
+def _partition_ddl(table: str, day: date) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {table}_p{day:%Y%m%d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') "
+            f"TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')")
+
+
+class PartitionMaintainer:
+    def __init__(self, tables=TABLES, premake_days: int = PREMAKE_DAYS,
+                 interval: float = RUN_INTERVAL):
+        self.tables       = tables
+        self.premake_days = premake_days
+        self.interval     = interval
+        self.retention    = DEFAULT_RETENTION
+
+        self.runs    = 0
+        self.created = 0
+        self.dropped = 0
+        self.deleted = 0          # rows removed by DELETE (default / unpartitioned)
+        self.errors  = 0
+        self.last_run: Optional[float] = None
+        self.last_ms = 0.0
+        self.partitions: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # ── helpers ──────────────────────────────────────────────
+    def _load_retention(self, db):
+        from models.configuration import SystemSettings
+        cfg = db.query(SystemSettings).first()
+        if cfg is not None and cfg.log_retention_days:
+            self.retention = max(int(cfg.log_retention_days), 1)
+
+    @staticmethod
+    def _is_partitioned(db, table: str) -> bool:
+        from sqlalchemy import text
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        kind = db.execute(text("SELECT relkind FROM pg_class WHERE relname = :t "
+                               "AND relnamespace = current_schema()::regnamespace"), {"t": table}).scalar()
+        return kind == "p"
+
+    @staticmethod
+    def _daily_partitions(db, table: str) -> Dict[date, str]:
+        from sqlalchemy import text
+        rows = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :t AND p.relnamespace = current_schema()::regnamespace"),
+            {"t": table}).scalars()
+        days = {}
+        for name in rows:
+            m = _PART_RE.search(name)
+            if m:
+                days[datetime.strptime(m.group(1), "%Y%m%d").date()] = name
+        return days
+
+    # ── one maintenance pass ─────────────────────────────────
+    def _create_partition(self, db, table: str, day: date) -> int:
+        """Create one daily partition; returns rows moved out of DEFAULT."""
+        from sqlalchemy import text
+        lo, hi = _day_bounds(day)
+        bounds = {"lo": lo, "hi": hi}
+        stranded = db.execute(text(f"SELECT 1 FROM {table}_default "
+                                   f"WHERE created_at >= :lo AND created_at < :hi LIMIT 1"),
+                              bounds).first()
+        moved = 0
+        if stranded is not None:
+            # The new partition's range must be empty in DEFAULT — park the
+            # rows, create, and put them back through the parent, atomically
+            db.execute(text(f"CREATE TEMP TABLE _stranded (LIKE {table}) ON COMMIT DROP"))
+            moved = db.execute(text(
+                f"WITH m AS (DELETE FROM {table}_default "
+                f"WHERE created_at >= :lo AND created_at < :hi RETURNING *) "
+                f"INSERT INTO _stranded SELECT * FROM m"), bounds).rowcount or 0
+        db.execute(text(_partition_ddl(table, day)))
+        if moved:
+            db.execute(text(f"INSERT INTO {table} SELECT * FROM _stranded"))
+        db.commit()
+        return moved
+
+    def _maintain_partitioned(self, db, table: str, today: date, cutoff: datetime):
+        from sqlalchemy import text
+        existing = self._daily_partitions(db, table)
+        try:
+            for day, name in sorted(existing.items()):
+                if day + timedelta(days=1) <= cutoff.date():
+                    db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    db.commit()
+                    del existing[day]
+                    self.dropped += 1
+                    print(f"[PARTITIONS] Dropped {name} (retention {self.retention} d)")
+            res = db.execute(text(f"DELETE FROM {table}_default WHERE created_at < :cut"), {"cut": cutoff})
+            db.commit()
+            self.deleted += res.rowcount or 0
+        except Exception as e:
+            db.rollback()
+            self.errors += 1
+            print(f"[PARTITIONS] {table}: retention failed: {e}")
+
+        for offset in range(self.premake_days + 1):
+            day = today + timedelta(days=offset)
+            if day in existing:
+                continue
+            try:
+                moved = self._create_partition(db, table, day)
+            except Exception as e:
+                db.rollback()
+                self.errors += 1
+                print(f"[PARTITIONS] {table}: skipped {day} partition, retrying next pass: {e}")
+                continue
+            existing[day] = f"{table}_p{day:%Y%m%d}"
+            self.created += 1
+            if moved:
+                print(f"[PARTITIONS] Created {existing[day]} — moved {moved:,} rows out of {table}_default")
+        self.partitions[table] = len(existing)
+
+    def _maintain_plain(self, db, table: str, cutoff: datetime):
+        """Unpartitioned table — bounded DELETE batches of expired rows."""
+        from sqlalchemy import text
+        while True:
+            res = db.execute(text(
+                f"DELETE FROM {table} WHERE id IN "
+                f"(SELECT id FROM {table} WHERE created_at < :cut LIMIT {DELETE_BATCH})"),
+                {"cut": cutoff})
+            db.commit()
+            self.deleted += res.rowcount or 0
+            if (res.rowcount or 0) < DELETE_BATCH:
+                break
+        self.partitions[table] = 0
+
+    def run_once(self, now: datetime = None):
+        from database import SessionLocal
+        start = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            self._load_retention(db)
+            cutoff = now - timedelta(days=self.retention)
+            for table in self.tables:
+                try:
+                    if self._is_partitioned(db, table):
+                        self._maintain_partitioned(db, table, now.date(), cutoff)
+                    else:
+                        self._maintain_plain(db, table, cutoff)
+                except Exception as e:
+                    db.rollback()
+                    self.errors += 1
+                    print(f"[PARTITIONS] {table}: maintenance failed: {e}")
+        finally:
+            db.close()
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_ms = (time.perf_counter() - start) * 1000
+
+    # ── background ───────────────────────────────────────────
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"[PARTITIONS] Maintenance pass failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"[PARTITIONS] Maintenance started (every {self.interval / 60:.0f} min, "
+              f"{self.premake_days} days ahead)")
+
+    def stats(self):
+        return {
+            "retention_days": self.retention,
+            "partitions":     dict(self.partitions),
+            "runs":           self.runs,
+            "created":        self.created,
+            "dropped":        self.dropped,
+            "deleted_rows":   self.deleted,
+            "errors":         self.errors,
+            "last_ms":        round(self.last_ms, 1),
+            "age_s":          round(time.time() - self.last_run, 1) if self.last_run else None,
+        }
+
+
+# Global singleton
+partitions = PartitionMaintainer()
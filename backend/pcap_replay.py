@@ -0,0 +1,215 @@
+"""
+pcap_replay.py
+==============
+CyGuardian-X — Offline pcap / pcapng replay
+
+Feeds a capture file through the same path as live traffic
+(_process_real_packet → _detect_threats → match_packet → _packet_queue).
+
+  REPLAY_PCAP  = "/path/to/file.pcap"   (network_monitor.py)
+  REPLAY_SPEED = 1.0   → original timing ("wire speed")
+                 10.0  → 10x faster
+                 0     → as fast as the pipeline can go
+
+Readers are pure Python (no libpcap): classic pcap (µs / ns, either byte
+order) and pcapng (SHB / IDB / EPB / SPB).  Ethernet, Linux SLL and raw-IP
+link types are normalised to Ethernet frames for capture_backend.decode_frame.
+
+  python pcap_replay.py file.pcap [speed]     # replay + print stats
+"""
+
+import struct
+import sys
+import time
+from typing import Callable, Iterable, Iterator, Tuple
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW      = 101
+LINKTYPE_LINUX_SLL = 113
+
+_FAKE_MACS = b"\x02\x00\x00\x00\x00\x02\x02\x00\x00\x00\x00\x01"
+
+Record = Tuple[float, bytes, int]   # (timestamp, frame bytes, wire length)
+
+
+def _to_ethernet(linktype: int, data: bytes):
+    if linktype == LINKTYPE_ETHERNET:
+        return data
+    if linktype == LINKTYPE_RAW and data:
+        ethertype = b"\x86\xdd" if data[0] >> 4 == 6 else b"\x08\x00"
+        return _FAKE_MACS + ethertype + data
+    if linktype == LINKTYPE_LINUX_SLL and len(data) >= 16:
+        return _FAKE_MACS + data[14:16] + data[16:]
+    return None
+
+
+# ── Readers ────────────────────────────────────────────────────
+def _read_classic(f, magic: bytes) -> Iterator[Record]:
+    if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+        endian = "<"
+    elif magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+        endian = ">"
+    else:
+        raise ValueError("not a pcap / pcapng file")
+    scale = 1e-9 if magic in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d") else 1e-6
+    header = f.read(20)
+    linktype = struct.unpack(endian + "HHiIII", header)[5] & 0x0FFFFFFF
+    rec = struct.Struct(endian + "IIII")
+    while True:
+        head = f.read(16)
+        if len(head) < 16:
+            return
+        sec, frac, incl, orig = rec.unpack(head)
+        data = f.read(incl)
+        if len(data) < incl:
+            return
+        frame = _to_ethernet(linktype, data)
+        if frame is not None:
+            yield sec + frac * scale, frame, orig
+
+
+def _read_pcapng(f, first: bytes) -> Iterator[Record]:
+    endian = "<"
+    ifaces = []   # [(linktype, ts scale)]
+    block_type = first
+    while True:
+        if len(block_type) < 4:
+            return
+        raw_len = f.read(4)
+        if len(raw_len) < 4:
+            return
+        if block_type == b"\x0a\x0d\x0d\x0a":            # SHB — sets byte order
+            bom = f.read(4)
+            endian = "<" if bom == b"\x4d\x3c\x2b\x1a" else ">"
+            total = struct.unpack(endian + "I", raw_len)[0]
+            f.read(total - 12)
+            ifaces = []
+        else:
+            total = struct.unpack(endian + "I", raw_len)[0]
+            body = f.read(total - 8)
+            btype = struct.unpack(endian + "I", block_type)[0]
+            if btype == 1:                                # IDB
+                linktype = struct.unpack_from(endian + "H", body, 0)[0]
+                ifaces.append((linktype, _idb_tsresol(body, endian)))
+            elif btype == 6:                              # EPB
+                iface, hi, lo, cap, orig = struct.unpack_from(endian + "5I", body, 0)
+                linktype, scale = ifaces[iface] if iface < len(ifaces) else (LINKTYPE_ETHERNET, 1e-6)
+                frame = _to_ethernet(linktype, body[20:20 + cap])
+                if frame is not None:
+                    yield ((hi << 32) | lo) * scale, frame, orig
+            elif btype == 3:                              # SPB — no timestamp
+                orig = struct.unpack_from(endian + "I", body, 0)[0]
+                linktype = ifaces[0][0] if ifaces else LINKTYPE_ETHERNET
+                frame = _to_ethernet(linktype, body[4:4 + min(orig, total - 16)])
+                if frame is not None:
+                    yield 0.0, frame, orig
+        block_type = f.read(4)
+
+
+def _idb_tsresol(body: bytes, endian: str) -> float:
+    off = 8
+    while off + 4 <= len(body):
+        code, length = struct.unpack_from(endian + "HH", body, off)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            v = body[off + 4]
+            return 2.0 ** -(v & 0x7F) if v & 0x80 else 10.0 ** -v
+        off += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+def read_pcap(path: str) -> Iterator[Record]:
+    """Yield (timestamp, ethernet frame, wire length) from a pcap or pcapng file."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        if magic == b"\x0a\x0d\x0d\x0a":
+            yield from _read_pcapng(f, magic)
+        else:
+            yield from _read_classic(f, magic)
+
+
+def write_pcap(path: str, records: Iterable[Record]) -> int:
+    """Write (timestamp, frame, wire length) records as classic µs pcap (Ethernet)."""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        for ts, frame, length in records:
+            sec = int(ts)
+            f.write(struct.pack("<IIII", sec, int((ts - sec) * 1e6), len(frame), length))
+            f.write(frame)
+            count += 1
+    return count
+
+
+# ── Replay engine ──────────────────────────────────────────────
+class PcapReplay:
+    """
+    Stands in for a capture backend (run / raw_frames / stats), pacing frames
+    by their capture timestamps divided by `speed`.
+    """
+
+    name = "replay"
+
+    def __init__(self, source, speed: float = 1.0, loop: bool = False):
+        self.source = source          # path, or an iterable of Records
+        self.speed  = speed
+        self.loop   = loop
+
+        self.packets = 0
+        self.bytes   = 0
+        self.late    = 0              # frames released behind schedule
+        self.elapsed = 0.0
+
+    def _records(self) -> Iterator[Record]:
+        while True:
+            yield from (read_pcap(self.source) if isinstance(self.source, str) else self.source)
+            if not self.loop or not isinstance(self.source, str):
+                return
+
+    def paced(self) -> Iterator[Record]:
+        start = time.perf_counter()
+        first = None
+        for ts, frame, length in self._records():
+            if self.speed > 0:
+                if first is None:
+                    first = ts
+                due = start + (ts - first) / self.speed
+                ahead = due - time.perf_counter()
+                if ahead > 0.0005:
+                    time.sleep(ahead)
+                elif ahead < -0.001:
+                    self.late += 1
+            self.packets += 1
+            self.bytes   += length
+            yield ts, frame, length
+        self.elapsed = time.perf_counter() - start
+
+    def raw_frames(self) -> Iterator[bytes]:
+        for _, frame, _ in self.paced():
+            yield frame
+
+    def run(self, callback: Callable):
+        from capture_backend import decode_frame
+        for _, frame, length in self.paced():
+            pkt = decode_frame(memoryview(frame), length)
+            if pkt is not None:
+                callback(pkt)
+        print(f"[REPLAY] Finished — {self.packets} packets in {self.elapsed:.1f}s")
+
+    def stats(self):
+        return {"backend": self.name, "packets": self.packets, "bytes": self.bytes,
+                "late": self.late, "speed": self.speed}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python pcap_replay.py file.pcap [speed]")
+        sys.exit(1)
+    import network_monitor as nm
+    replay = PcapReplay(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    replay.run(nm._process_real_packet)
+    pps = replay.packets / replay.elapsed if replay.elapsed else 0
+    nm.state.aggregate()
+    print(f"{replay.packets:,} packets  {pps:,.0f} pkts/sec  late={replay.late}  "
+          f"alerts={nm.state.threats_detected}  queued={nm._packet_queue.qsize()}")
@@ -0,0 +1,228 @@
+"""
+pcap_ring.py
+============
+CyGuardian-X — Rolling in-memory ring of raw frames, cut into pcap evidence
+
+Every captured IPv4 frame is copied into a ring bounded by RING_SECONDS
+and RING_MB, indexed by flow (5-tuple, direction-independent).  Each flow
+keeps its own FIFO of the same entries, so eviction is O(1) per packet
+and a flow's packets are found without scanning the ring.
+
+When a High / Critical alert fires for a packet (state.add_alert with
+meta), trigger() names the evidence file, stores it on the alert as
+"pcap" and queues a job — O(1) on the capture thread.  The file name
+reaches network_alerts.pcap_path through alert_sink: rule matches on
+every row, other detections on one row per new file.  A writer thread
+waits POST_SECONDS so the packets after the alert are included, then
+writes the flow's packets still in the ring to EVIDENCE_DIR/<name> via
+pcap_replay.write_pcap.  One file per flow per EXTRACT_COOLDOWN; later
+alerts on the same flow link the same file.  EVIDENCE_DIR is capped at
+EVIDENCE_MAX_MB, oldest files deleted first.
+
+Worker processes (capture_workers.py) each keep their own ring — flow
+sharding puts every packet of a flow in the same one.  RING_MB is the
+total: set_shares(n) gives each of n workers RING_MB / n.  Recording costs
+about 3 µs per packet (one frame copy); PCAP_RING_SECONDS=0 turns it off.
+"""
+
+import collections
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from capture_backend import Frame
+
+RING_SECONDS     = float(os.getenv("PCAP_RING_SECONDS", "60"))
+RING_MB          = int(os.getenv("PCAP_RING_MB", "256"))   # total across capture workers
+EVIDENCE_DIR     = os.getenv("EVIDENCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "evidence"))
+EVIDENCE_MAX_MB  = int(os.getenv("EVIDENCE_MAX_MB", "1024"))
+POST_SECONDS     = 5.0       # keep capturing this long after the alert
+EXTRACT_COOLDOWN = 60.0      # one file per flow per this many seconds
+MAX_JOBS         = 1_000
+TRIGGER_SEVERITIES = ("High", "Critical")
+
+EVIDENCE_NAME = re.compile(r"^[\w.\-]+\.pcap$")
+
+
+def _flow_key(meta) -> tuple:
+    a, b = (meta.src, meta.sport), (meta.dst, meta.dport)
+    return (a, b, meta.transport) if a <= b else (b, a, meta.transport)
+
+
+def _raw_frame(pkt):
+    """(frame bytes, wire length, timestamp or None) of a Frame or Scapy packet."""
+    if type(pkt) is Frame:
+        return bytes(pkt.raw), pkt.length, None
+    data = getattr(pkt, "original", None) or bytes(pkt)
+    ts = getattr(pkt, "time", None)
+    return data, len(data), float(ts) if ts is not None else None
+
+
+class PcapRing:
+    def __init__(self, seconds: float = RING_SECONDS, max_mb: int = RING_MB,
+                 directory: str = EVIDENCE_DIR, evidence_mb: int = EVIDENCE_MAX_MB):
+        self.seconds   = seconds
+        self.max_mb    = max_mb
+        self.max_bytes = max(max_mb, 1) * 1024 * 1024
+        self.directory = directory
+        self.evidence_bytes = max(evidence_mb, 1) * 1024 * 1024
+        self.enabled   = seconds > 0 and max_mb > 0
+
+        # entry = (ts, frame, wire length, flow key)
+        self._ring: "collections.deque[tuple]" = collections.deque()
+        self._flows: Dict[tuple, collections.deque] = {}
+        self._bytes = 0
+        self._recent: "collections.OrderedDict[tuple, tuple]" = collections.OrderedDict()
+        self._jobs: queue.Queue = queue.Queue(maxsize=MAX_JOBS)
+        self._thread: Optional[threading.Thread] = None
+
+        self.packets   = 0
+        self.evicted   = 0
+        self.triggers  = 0
+        self.reused    = 0        # alerts linked to an existing file
+        self.files     = 0
+        self.written   = 0        # packets written to evidence files
+        self.dropped   = 0        # jobs lost to a full queue
+        self.errors    = 0
+        self.last_ms   = 0.0
+
+    def set_shares(self, n: int):
+        """This process records 1/n of the traffic (capture workers) — split the budget."""
+        self.max_bytes = max(self.max_mb * 1024 * 1024 // max(int(n), 1), 1024 * 1024)
+
+    # ── capture thread ───────────────────────────────────────
+    def record(self, meta, now: float = None):
+        """Copy the packet's frame into the ring and evict what fell out."""
+        if not self.enabled or meta.raw is None:
+            return
+        data, length, ts = _raw_frame(meta.raw)
+        now = now or time.time()
+        key = _flow_key(meta)
+        entry = (ts or now, data, length, key)
+        self._ring.append(entry)
+        fq = self._flows.get(key)
+        if fq is None:
+            fq = self._flows[key] = collections.deque()
+        fq.append(entry)
+        self._bytes += len(data)
+        self.packets += 1
+
+        horizon = now - self.seconds
+        ring, flows = self._ring, self._flows
+        while ring and (self._bytes > self.max_bytes or ring[0][0] < horizon):
+            old = ring.popleft()
+            self._bytes -= len(old[1])
+            oq = flows[old[3]]
+            oq.popleft()
+            if not oq:
+                del flows[old[3]]
+            self.evicted += 1
+
+    def trigger(self, meta, alert: Dict, now: float = None) -> Optional[str]:
+        """
+        Queue evidence for the packet's flow and set alert["pcap"].  Returns
+        the file name if a new file was queued — None when the alert was
+        linked to an existing file or no evidence is taken.
+        """
+        if not self.enabled or alert.get("severity") not in TRIGGER_SEVERITIES:
+            return None
+        now = now or time.time()
+        key = _flow_key(meta)
+        recent = self._recent.get(key)
+        if recent is not None and recent[0] > now:
+            self.reused += 1
+            alert["pcap"] = recent[1]
+            return None
+
+        name = (f"{datetime.fromtimestamp(now):%Y%m%d-%H%M%S}_{meta.src}-{meta.dst}_"
+                f"{meta.transport.lower()}_{zlib.crc32(repr(key).encode()):08x}.pcap")
+        try:
+            self._jobs.put_nowait((now + POST_SECONDS, key, name))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        self._recent[key] = (now + EXTRACT_COOLDOWN, name)
+        self._recent.move_to_end(key)
+        while len(self._recent) > MAX_JOBS:
+            self._recent.popitem(last=False)
+        self.triggers += 1
+        alert["pcap"] = name
+        return name
+
+    # ── writer thread ────────────────────────────────────────
+    def _extract(self, key: tuple, name: str):
+        from pcap_replay import write_pcap
+        start = time.perf_counter()
+        fq = self._flows.get(key)
+        entries = fq.copy() if fq is not None else ()     # atomic snapshot
+        path = os.path.join(self.directory, name)
+        n = write_pcap(path + ".tmp", ((ts, data, length) for ts, data, length, _ in entries))
+        os.replace(path + ".tmp", path)
+        self.files += 1
+        self.written += n
+        self.last_ms = (time.perf_counter() - start) * 1000
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        files = [e for e in os.scandir(self.directory) if e.name.endswith(".pcap")]
+        total = sum(e.stat().st_size for e in files)
+        for e in sorted(files, key=lambda e: e.stat().st_mtime):
+            if total <= self.evidence_bytes:
+                break
+            total -= e.stat().st_size
+            os.remove(e.path)
+
+    def _writer(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            due, key, name = self._jobs.get()
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self._extract(key, name)
+            except Exception as e:
+                self.errors += 1
+                print(f"[PCAP] Evidence write failed for {name}: {e}")
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        print(f"[PCAP] Ring started — last {self.seconds:.0f} s / {self.max_bytes >> 20} MB, "
+              f"evidence in {self.directory}")
+
+    def path_of(self, name: str) -> Optional[str]:
+        """Evidence file path for a name from an alert, or None if invalid / gone."""
+        if not EVIDENCE_NAME.match(name or ""):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self):
+        return {
+            "enabled":   self.enabled,
+            "packets":   self.packets,
+            "ring_pkts": len(self._ring),
+            "ring_mb":   round(self._bytes / 1048576, 1),
+            "flows":     len(self._flows),
+            "evicted":   self.evicted,
+            "triggers":  self.triggers,
+            "reused":    self.reused,
+            "files":     self.files,
+            "written":   self.written,
+            "pending":   self._jobs.qsize(),
+            "dropped":   self.dropped,
+            "errors":    self.errors,
+            "last_ms":   round(self.last_ms, 1),
+        }
+
+
+# Global singleton
+pcap_ring = PcapRing()
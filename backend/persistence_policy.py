@@ -0,0 +1,206 @@
+"""
+persistence_policy.py
+=====================
+CyGuardian-X — Which captured packets are written to captured_packets
+
+Every packet is assigned a tier, and the tier decides whether it is kept:
+  • hit      — matched a rule or fired a stateful detection  → always kept
+  • flagged  — known-bad source or sensitive port            → always kept
+  • sampled  — everything else, kept per flow: the flow's 5-tuple hashes
+               (CRC32, direction-independent) below rate × 2³², so a flow
+               is stored whole or not at all, identically in every process
+               and across restarts
+
+The sample rate comes from SystemSettings.performance_mode
+(Minimal 1 % · Balanced 10 % · Max 100 %) and is capped at
+max_packet_capture sampled rows per second.  The cap is checked when a
+flow's first sampled packet arrives: once admitted a flow is kept to the
+end (its packets still count against the second's budget), and a flow
+turned away stays out.  The decision is remembered for the last
+MAX_DECIDED flows.  With capture workers the cap is the total across
+processes — each one gets budget / workers (set_shares).  The DB writer reports the
+queue fill level after each flush (adapt()): above HIGH_FILL the rate is
+halved, below LOW_FILL it recovers; above SHED_FILL the sampled tier is
+shed entirely so the always-kept tiers keep their headroom.
+
+Counters per tier: offered / kept / sampled_out (hash said no) /
+shed (budget or back-pressure) / dropped (queue full).
+"""
+
+import collections
+import threading
+import time
+import zlib
+from typing import Optional
+
+TIERS = ("hit", "flagged", "sampled")
+
+_MODE_RATES = {"Minimal": 0.01, "Balanced": 0.10, "Max": 1.0}
+
+LOW_FILL        = 0.10    # queue fill below which the rate recovers
+HIGH_FILL       = 0.50    # ...above which it is halved
+SHED_FILL       = 0.80    # ...above which nothing sampled is queued
+MIN_SCALE       = 1 / 64  # floor for the back-pressure factor
+ADAPT_INTERVAL  = 0.5     # seconds between rate adjustments
+RELOAD_INTERVAL = 30
+MAX_DECIDED     = 100_000 # sampled flows whose admission is remembered
+
+
+def flow_hash(meta) -> int:
+    """32-bit hash of the flow, the same for both directions."""
+    a, b = (meta.src, meta.sport), (meta.dst, meta.dport)
+    if b < a:
+        a, b = b, a
+    return zlib.crc32(f"{a[0]}:{a[1]}|{b[0]}:{b[1]}|{meta.transport}".encode())
+
+
+class PersistencePolicy:
+    def __init__(self):
+        self.tiers = {tier: collections.Counter() for tier in TIERS}
+        self.scale = 1.0               # back-pressure factor on the sample rate
+        self.fill  = 0.0               # last reported queue fill (0..1)
+        self._shedding = False
+        self._second = 0
+        self._budget_used = 0
+        self._decided: "collections.OrderedDict[int, bool]" = collections.OrderedDict()
+        self.shares = 1                # processes sharing the budget
+        self._next_adapt = 0.0
+        self._config_stamp = None
+        self._reloader: Optional[threading.Thread] = None
+        self.configure()
+
+    # ── configuration ────────────────────────────────────────
+    def configure(self, performance_mode: str = "Balanced", max_packet_capture: int = 10_000):
+        self.mode      = performance_mode if performance_mode in _MODE_RATES else "Balanced"
+        self.base_rate = _MODE_RATES[self.mode]
+        self.budget    = max(int(max_packet_capture), 0)   # sampled rows / second, 0 = none
+        self._share_budget()
+        self._threshold()
+
+    def set_shares(self, n: int):
+        """This process sees 1/n of the traffic (capture workers) — split the budget."""
+        self.shares = max(int(n), 1)
+        self._share_budget()
+
+    def _share_budget(self):
+        self.process_budget = -(-self.budget // self.shares)
+
+    def _threshold(self):
+        self.rate = self.base_rate * self.scale
+        self._cut = int(self.rate * 0x1_0000_0000)
+
+    def apply(self, cfg):
+        """Take a SystemSettings row (or anything with its attributes)."""
+        self.configure(cfg.performance_mode or "Balanced",
+                       cfg.max_packet_capture if cfg.max_packet_capture is not None else 10_000)
+        self._config_stamp = getattr(cfg, "updated_at", None)
+
+    def load_config(self) -> bool:
+        """Re-read SystemSettings if it changed. Returns True if applied."""
+        from database import SessionLocal
+        from models.configuration import SystemSettings
+        db = SessionLocal()
+        try:
+            cfg = db.query(SystemSettings).first()
+            if cfg is None or (cfg.updated_at == self._config_stamp and self._config_stamp):
+                return False
+            self.apply(cfg)
+        finally:
+            db.close()
+        print(f"[PERSIST] Policy loaded — {self.mode}, sample {self.base_rate:.0%}, "
+              f"max {self.budget:,} sampled rows/s")
+        return True
+
+    # ── packet path ──────────────────────────────────────────
+    def admit(self, meta, flagged: bool, hit: bool, now: float = None) -> Optional[str]:
+        """Tier to persist the packet under, or None to skip it."""
+        if hit or flagged:
+            tier = "hit" if hit else "flagged"
+            self.tiers[tier]["offered"] += 1
+            return tier
+
+        counts = self.tiers["sampled"]
+        counts["offered"] += 1
+        h = flow_hash(meta)
+        if h >= self._cut:
+            counts["sampled_out"] += 1
+            return None
+        if self._shedding:
+            counts["shed"] += 1
+            return None
+        sec = int(now or time.time())
+        if sec != self._second:
+            self._second, self._budget_used = sec, 0
+
+        decided = self._decided.get(h)
+        if decided is None:
+            decided = self._decided[h] = self._budget_used < self.process_budget
+            if len(self._decided) > MAX_DECIDED:
+                self._decided.popitem(last=False)
+        else:
+            self._decided.move_to_end(h)
+        if not decided:
+            counts["shed"] += 1
+            return None
+        self._budget_used += 1
+        return "sampled"
+
+    def kept(self, tier: str):
+        self.tiers[tier]["kept"] += 1
+
+    def dropped(self, tier: str):
+        """The write queue was full."""
+        self.tiers[tier]["dropped"] += 1
+
+    # ── back-pressure (DB writer thread) ─────────────────────
+    def adapt(self, fill: float, now: float = None):
+        """AIMD on the sample rate from the write queue fill level (0..1)."""
+        now = now or time.monotonic()
+        self.fill = fill
+        self._shedding = fill >= SHED_FILL
+        if now < self._next_adapt:
+            return
+        self._next_adapt = now + ADAPT_INTERVAL
+        if fill >= HIGH_FILL:
+            self.scale = max(self.scale / 2, MIN_SCALE)
+        elif fill <= LOW_FILL and self.scale < 1.0:
+            self.scale = min(self.scale * 1.25, 1.0)
+        else:
+            return
+        self._threshold()
+
+    # ── background ───────────────────────────────────────────
+    def _reload_loop(self):
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                self.load_config()
+            except Exception as e:
+                print(f"[PERSIST] Config reload failed: {e}")
+
+    def start(self):
+        try:
+            self.load_config()
+        except Exception as e:
+            print(f"[PERSIST] Could not load SystemSettings ({e}) — using defaults")
+        if self._reloader is None:
+            self._reloader = threading.Thread(target=self._reload_loop, daemon=True)
+            self._reloader.start()
+
+    def stats(self):
+        return {
+            "mode":        self.mode,
+            "base_rate":   self.base_rate,
+            "rate":        round(self.rate, 5),
+            "scale":       round(self.scale, 4),
+            "budget":      self.budget,
+            "process_budget": self.process_budget,
+            "flows":       len(self._decided),
+            "queue_fill":  round(self.fill, 3),
+            "shedding":    self._shedding,
+            "tiers":       {tier: dict(c) for tier, c in self.tiers.items()},
+        }
+
+
+# Global singleton
+persistence = PersistencePolicy()
@@ -10,6 +10,7 @@ from models.configuration import (
 )
 
 from models.network import BlockedIP
+from ip_reputation import reputation
 
 from schemas.configuration import (
     SignatureRuleCreate, SignatureRuleUpdate, SignatureRuleOut,
@@ -35,6 +36,25 @@ def _get_or_create_singleton(db: Session, Model, default_id: int = 1):
     return obj
 
 
+def _invalidate_engine_rule(rule_id: str, table: str = "signature"):
+    """Push a single-rule update into the live signature engine."""
+    try:
+        from signature_engine import invalidate_rule
+        invalidate_rule(rule_id, table)
+    except Exception:
+        pass
+    _broadcast("rule", rule_id, table)
+
+
+def _broadcast(op: str, *args):
+    """Forward a change to the capture worker processes, if running."""
+    try:
+        from network_monitor import broadcast_control
+        broadcast_control(op, *args)
+    except Exception:
+        pass
+
+
 # ══════════════════════════════════════════════════════════════
 # 1. SIGNATURE RULES
 # ══════════════════════════════════════════════════════════════
@@ -65,6 +85,7 @@ def create_signature(body: SignatureRuleCreate, db: Session = Depends(get_db)):
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    _invalidate_engine_rule(rule.id)
     return rule
 
 
@@ -77,6 +98,7 @@ def update_signature(rule_id: str, body: SignatureRuleUpdate, db: Session = Depe
         setattr(rule, field, val)
     db.commit()
     db.refresh(rule)
+    _invalidate_engine_rule(rule_id)
     return rule
 
 
@@ -87,6 +109,7 @@ def delete_signature(rule_id: str, db: Session = Depends(get_db)):
         raise HTTPException(404, f"Rule {rule_id} not found")
     db.delete(rule)
     db.commit()
+    _invalidate_engine_rule(rule_id)
     return {"success": True, "deleted": rule_id}
 
 
@@ -98,12 +121,7 @@ def toggle_signature(rule_id: str, db: Session = Depends(get_db)):
     rule.enabled = not rule.enabled
     db.commit()
     db.refresh(rule)
-    # Hot-reload engine
-    try:
-        from signature_engine import reload_rules
-        reload_rules()
-    except Exception:
-        pass
+    _invalidate_engine_rule(rule_id)
     return rule
 
 
@@ -130,6 +148,7 @@ def create_ransomware(body: RansomwareRuleCreate, db: Session = Depends(get_db))
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    _invalidate_engine_rule(rule.id, "ransomware")
     return rule
 
 
@@ -142,6 +161,7 @@ def update_ransomware(rule_id: str, body: RansomwareRuleUpdate, db: Session = De
         setattr(rule, field, val)
     db.commit()
     db.refresh(rule)
+    _invalidate_engine_rule(rule_id, "ransomware")
     return rule
 
 
@@ -153,6 +173,7 @@ def toggle_ransomware(rule_id: str, db: Session = Depends(get_db)):
     rule.enabled = not rule.enabled
     db.commit()
     db.refresh(rule)
+    _invalidate_engine_rule(rule_id, "ransomware")
     return rule
 
 
@@ -171,6 +192,19 @@ def update_anomaly(body: AnomalyConfigUpdate, db: Session = Depends(get_db)):
         setattr(cfg, field, val)
     db.commit()
     db.refresh(cfg)
+    try:
+        from signature_engine import set_alert_cooldown
+        set_alert_cooldown(cfg.alert_cooldown)
+    except Exception:
+        pass
+    try:
+        from anomaly_engine import anomaly_engine
+        from sketches import syn_tracker
+        anomaly_engine.apply(cfg)
+        syn_tracker.apply(cfg)
+    except Exception:
+        pass
+    _broadcast("anomaly")
     return cfg
 
 
@@ -213,6 +247,7 @@ def block_ip(body: dict, db: Session = Depends(get_db)):
     entry = BlockedIP(ip=ip, reason=body.get("reason"), blocked_by=body.get("blocked_by", "admin"))
     db.add(entry)
     db.commit()
+    reputation.block(ip, "blocked_ips")
     return {"success": True, "message": f"{ip} blocked"}
 
 
@@ -223,6 +258,7 @@ def unblock_ip(ip: str, db: Session = Depends(get_db)):
         raise HTTPException(404, f"{ip} not in blocklist")
     db.delete(entry)
     db.commit()
+    reputation.unblock(ip)
     return {"success": True, "message": f"{ip} unblocked"}
 
 
@@ -259,6 +295,13 @@ def update_system_settings(body: SystemSettingsUpdate, db: Session = Depends(get
         setattr(cfg, field, val)
     db.commit()
     db.refresh(cfg)
+    # Push performance_mode / max_packet_capture into the persistence policy
+    try:
+        from persistence_policy import persistence
+        persistence.apply(cfg)
+    except Exception:
+        pass
+    _broadcast("system")
     return cfg
 
 
@@ -384,11 +427,11 @@ def get_attackers_full(db: Session = Depends(get_db)):
 # SIGNATURE ENGINE — hot reload + stats
 # ══════════════════════════════════════════════════════════════
 @router.post("/signatures/reload")
-def reload_signatures(db: Session = Depends(get_db)):
-    """Hot-reload signature rules into the live engine."""
+def reload_signatures(full: bool = False, db: Session = Depends(get_db)):
+    """Hot-reload signature rules into the live engine (delta sync unless ?full=true)."""
     try:
-        from signature_engine import reload_rules, get_rule_stats
-        count = reload_rules()
+        from signature_engine import sync_rules, load_rules_from_db
+        count = load_rules_from_db() if full else sync_rules()
         return {"success": True, "loaded": count, "message": f"Reloaded {count} rules into engine"}
     except Exception as e:
         raise HTTPException(500, f"Reload failed: {e}")
@@ -419,14 +462,19 @@ def get_signature_stats(db: Session = Depends(get_db)):
 
 @router.post("/blocked-ips/enforce")
 def enforce_blocked_ips(db: Session = Depends(get_db)):
-    """Apply all blocked IPs from DB to iptables."""
+    """Apply all blocked IPs from DB to the firewall in one batch."""
     try:
-        from signature_engine import block_ip_now
-        blocked = db.query(BlockedIP).all()
-        count = 0
-        for b in blocked:
-            block_ip_now(b.ip)
-            count += 1
-        return {"success": True, "enforced": count, "message": f"Applied {count} IPs to iptables"}
+        from firewall import firewall
+        blocked = db.query(BlockedIP.ip).all()
+        firewall.reconcile()
+        count = firewall.block_many(ip for (ip,) in blocked)
+        changed = firewall.flush()
+        return {
+            "success":  True,
+            "enforced": count,
+            "changed":  changed,
+            "backend":  firewall.backend.name,
+            "message":  f"Applied {count} IPs to firewall ({changed} new)",
+        }
     except Exception as e:
         raise HTTPException(500, str(e))
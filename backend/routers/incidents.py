@@ -12,6 +12,7 @@ from schemas.incident import (
     IncidentOut, IncidentAssign, IncidentResolveAll,
     DetectionOut, TimelineEventOut, IPActionRequest,
 )
+from ip_reputation import reputation
 
 router = APIRouter(prefix="/api/incidents", tags=["Incidents"])
 
@@ -188,6 +189,16 @@ def list_detections(
     return {"total": len(result), "detections": result}
 
 
+def _record_ip_action(db: Session, ip: str, action: str, actor: str):
+    """Upsert the analyst's block / whitelist decision for an IP."""
+    row = db.query(DetectionIPAction).filter(DetectionIPAction.ip == ip).first()
+    if row:
+        row.action, row.actioned_by, row.actioned_at = action, actor, datetime.now()
+    else:
+        db.add(DetectionIPAction(ip=ip, action=action, actioned_by=actor))
+    db.commit()
+
+
 @router.post("/detections/block")
 def block_ip_from_detection(
     payload: dict,
@@ -198,7 +209,8 @@ def block_ip_from_detection(
     if not ip:
         raise HTTPException(status_code=400, detail="ip is required")
 
-    # TODO: your existing block logic here
+    _record_ip_action(db, ip, "Blocked", current_user.username)
+    reputation.block(ip, "detection_action")
     return {"success": True, "message": f"IP {ip} blocked", "by": current_user.username}
 
 @router.post("/detections/whitelist")
@@ -211,7 +223,8 @@ def whitelist_ip_from_detection(
     if not ip:
         raise HTTPException(status_code=400, detail="ip is required")
 
-    # TODO: your existing whitelist logic here
+    _record_ip_action(db, ip, "Whitelisted", current_user.username)
+    reputation.whitelist(ip)
     return {"success": True, "message": f"IP {ip} whitelisted", "by": current_user.username}
 
 
@@ -2,7 +2,8 @@
 routers/network.py — DB-backed persistent logs + alerts, live WebSocket unchanged
 """
 import asyncio
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends ,Request
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends ,Request, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
@@ -12,7 +13,16 @@ from database import get_db
 from auth import get_current_user
 from models.network import NetworkLog, NetworkAlert
 from models.network import BlockedIP
+from models.incident import DetectionIPAction
 from network_monitor import state, MY_IP
+from ip_reputation import reputation
+from health_sampler import health
+from flow_table import flows
+from sketches import syn_tracker
+from anomaly_engine import anomaly_engine
+from persistence_policy import persistence
+from partition_maintenance import partitions
+from pcap_ring import pcap_ring
 from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -44,6 +54,35 @@ def get_stats():
         }
 
 
+@router.get("/pipeline")
+def get_pipeline():
+    """Queue depths and drop counters of the background writers."""
+    from alert_sink import alert_sink
+    from firewall import firewall
+    from signature_engine import get_dedup_stats
+    import network_monitor
+    pool    = network_monitor._worker_pool
+    capture = network_monitor._capture_backend
+    return {
+        "alert_sink":  alert_sink.stats(),
+        "alert_dedup": get_dedup_stats(),
+        "firewall":    firewall.stats(),
+        "reputation":  reputation.stats(),
+        "capture":     capture.stats() if capture else None,
+        "workers":     pool.stats() if pool else None,
+        "flows":       flows.stats(),
+        "syn_tracker": syn_tracker.stats(),
+        "anomaly":     anomaly_engine.stats(),
+        "persistence": persistence.stats(),
+        "partitions":  partitions.stats(),
+        "pcap_ring":   pcap_ring.stats(),
+        "packet_writer": network_monitor._packet_writer.stats()
+                         if network_monitor._packet_writer else None,
+        "health":      health.stats(),
+        "state_lock":  state.lock.stats(),
+    }
+
+
 @router.get("/connections")
 def get_connections(
     status:   Optional[str] = Query(None),
@@ -56,7 +95,7 @@ def get_connections(
     if status:   conns = [c for c in conns if c["status"].lower()   == status.lower()]
     if protocol: conns = [c for c in conns if c["protocol"].lower() == protocol.lower()]
     if search:   conns = [c for c in conns if search in c["srcIp"]  or search in c["dstIp"]]
-    return {"total": len(conns), "connections": conns[:limit]}
+    return {"total": len(conns), "active": state.active_connections, "connections": conns[:limit]}
 
 
 @router.get("/health")
@@ -134,6 +173,7 @@ def get_alerts(
                     "protocol": a.protocol,
                     "port":     a.port,
                     "resolved": a.resolved,
+                    "pcap":     a.pcap_path,
                     "time":     a.created_at.strftime("%H:%M:%S"),
                 }
                 for a in db_alerts
@@ -148,6 +188,15 @@ def get_alerts(
     return {"total": len(alerts), "alerts": alerts[:limit]}
 
 
+@router.get("/evidence/{name}")
+def get_evidence(name: str, current_user: User = Depends(get_current_user)):
+    """Download the pcap linked from an alert's "pcap" field."""
+    path = pcap_ring.path_of(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Evidence file not found")
+    return FileResponse(path, media_type="application/vnd.tcpdump.pcap", filename=name)
+
+
 @router.post("/alerts/resolve/{alert_id}")
 def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
     alert = db.query(NetworkAlert).filter(NetworkAlert.id == alert_id).first()
@@ -232,7 +281,10 @@ def block_ip(
 ):
     ip = payload.get("ip", "unknown")
 
-    # Persist to DB
+    # Persist to DB — a block overrides an earlier dashboard whitelist
+    db.query(DetectionIPAction)\
+      .filter(DetectionIPAction.ip == ip, DetectionIPAction.action == "Whitelisted")\
+      .delete(synchronize_session=False)
     existing = db.query(BlockedIP).filter(BlockedIP.ip == ip).first()
     if not existing:
         db.add(
@@ -256,8 +308,9 @@ def block_ip(
     db.commit()
 
     # Update in-memory state
+    reputation.block(ip, "blocked_ips")
+    state.count_blocked()
     with state.lock:
-        state.threats_blocked += 1
         for c in state.connections:
             if c["srcIp"] == ip:
                 c["status"] = "Blocked"
@@ -284,6 +337,15 @@ def whitelist_ip(
         db.delete(existing)
         db.commit()
 
+    # Persist the whitelist so the periodic reputation reload keeps it
+    action = db.query(DetectionIPAction).filter(DetectionIPAction.ip == ip).first()
+    if action:
+        action.action, action.actioned_by, action.actioned_at = \
+            "Whitelisted", current_user.username, datetime.now()
+    else:
+        db.add(DetectionIPAction(ip=ip, action="Whitelisted", actioned_by=current_user.username))
+    db.commit()
+
     # Log the action
     log = NetworkLog(
         status="ALLOWED",
@@ -294,6 +356,7 @@ def whitelist_ip(
     )
     db.add(log)
     db.commit()
+    reputation.whitelist(ip)
 
     return {
         "success": True,
@@ -377,38 +440,49 @@ def get_packets(
 
 
 @router.get("/packets/stats")
-def get_packet_stats(db: Session = Depends(get_db)):
+def get_packet_stats(
+    hours: Optional[int] = Query(None, ge=1, description="Look-back window; omit for everything retained"),
+    db: Session = Depends(get_db),
+):
     from models.network import CapturedPacket
     from sqlalchemy import func as sqlfunc
+    from datetime import timedelta, timezone
+
+    # Bounding created_at lets PostgreSQL prune to the matching daily partitions
+    since = datetime.now(timezone.utc) - timedelta(hours=hours) if hours else None
+
+    def scoped(q):
+        return q.filter(CapturedPacket.created_at >= since) if since else q
 
-    total     = db.query(CapturedPacket).count()
-    flagged   = db.query(CapturedPacket).filter(CapturedPacket.flagged == True).count()
+    total     = scoped(db.query(CapturedPacket)).count()
+    flagged   = scoped(db.query(CapturedPacket)).filter(CapturedPacket.flagged == True).count()
 
     # Top 5 source IPs
-    top_src = db.query(
+    top_src = scoped(db.query(
         CapturedPacket.src_ip,
         sqlfunc.count(CapturedPacket.id).label("count")
-    ).group_by(CapturedPacket.src_ip)\
+    )).group_by(CapturedPacket.src_ip)\
      .order_by(sqlfunc.count(CapturedPacket.id).desc())\
      .limit(5).all()
 
     # Protocol breakdown
-    proto_rows = db.query(
+    proto_rows = scoped(db.query(
         CapturedPacket.protocol,
         sqlfunc.count(CapturedPacket.id).label("count")
-    ).group_by(CapturedPacket.protocol)\
+    )).group_by(CapturedPacket.protocol)\
      .order_by(sqlfunc.count(CapturedPacket.id).desc())\
      .all()
 
     # Top ports
-    top_ports = db.query(
+    top_ports = scoped(db.query(
         CapturedPacket.port,
         sqlfunc.count(CapturedPacket.id).label("count")
-    ).group_by(CapturedPacket.port)\
+    )).group_by(CapturedPacket.port)\
      .order_by(sqlfunc.count(CapturedPacket.id).desc())\
      .limit(5).all()
 
     return {
+        "window_hours":   hours,
         "total_stored":   total,
         "flagged":        flagged,
         "top_sources":    [{"ip": r[0], "count": r[1]} for r in top_src],
@@ -70,5 +70,13 @@ for inc_id, events in TIMELINES:
             db.add(IncidentTimeline(incident_id=inc_id, time=time, event=event))
 
 db.commit()
+
+# Detections above were inserted with explicit ids — move the PostgreSQL
+# sequence past them so the engines' autoincremented inserts don't collide
+if engine.dialect.name == "postgresql":
+    from sqlalchemy import text
+    db.execute(text("SELECT setval(pg_get_serial_sequence('detections', 'id'), "
+                    "COALESCE((SELECT MAX(id) FROM detections), 0) + 1, false)"))
+    db.commit()
 db.close()
 print("✅ Incidents seed complete.")
\ No newline at end of file
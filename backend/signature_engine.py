@@ -4,152 +4,335 @@ signature_engine.py
 CyGuardian-X — Real-time Signature Rules Engine
 
 Loads rules from PostgreSQL and matches them against every live packet.
-Supports: Alert, Block (iptables), Drop, Log actions.
-Hot-reloads rules every 30 seconds or on demand.
+Supports: Alert, Block (firewall.py worker), Drop, Log actions.
+Ransomware rules (ransom_rules) are compiled into the same RuleSet as
+signature rules, so both are matched in one prefilter pass per packet.
+Hot-reloads rules every 30 seconds or on demand — only rows whose
+updated_at moved (plus deletions) are re-read and recompiled.
+
+Payload matching goes through a literal prefilter (see pattern_matcher.py):
+one automaton pass per packet picks the candidate rules, and only those run
+their full regex.  Rules are compiled as bytes regexes and run directly on
+the payload buffer, capped at INSPECT_DEPTH bytes — no per-packet decode.
 """
 
+import os
 import re
 import threading
 import time
-import subprocess
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from pattern_matcher import LiteralPrefilter, compile_pattern, extract_literals
+from alert_sink import alert_sink
+from alert_dedup import AlertSuppressor
+from firewall import firewall
+from ip_reputation import reputation
+from packet_meta import PacketMeta
 
 # ── Rule cache ─────────────────────────────────────────────────
-_rules: List[Dict] = []
+# The live RuleSet is published by plain reference assignment; the capture
+# thread reads `_ruleset` without locking or copying.  _rules_lock only
+# serialises concurrent reloads (auto-reloader vs API).
+_ruleset = None  # RuleSet, set at the bottom of the module
 _rules_lock = threading.Lock()
-_blocked_ips_cache = set()  # IPs already blocked via iptables
+
+# Incremental reload state (guarded by _rules_lock)
+_active_rules: Dict[Tuple[str, str], Dict] = {}  # (table, rule id) -> rule dict currently published
+_compiled_cache: Dict[Tuple, Tuple] = {}  # (table, id, pattern, protocol, action) -> compiled parts
+_last_sync: Dict[str, Any] = {}         # table -> max updated_at seen
+
+# Payload bytes inspected per packet (0 = whole payload); jumbo frames are
+# matched on their first INSPECT_DEPTH bytes only
+INSPECT_DEPTH = int(os.getenv("INSPECT_DEPTH", "2048"))
 
 # ── Stats ──────────────────────────────────────────────────────
 rule_match_counts: Dict[str, int] = {}  # rule_id -> hit count
 
 
-def load_rules_from_db():
-    """Load all enabled signature rules from PostgreSQL."""
-    try:
-        from database import SessionLocal
-        from models.configuration import SignatureRule
-        db = SessionLocal()
-        rules = db.query(SignatureRule).filter(SignatureRule.enabled == True).all()
-        loaded = []
-        for r in rules:
-            try:
-                compiled = re.compile(r.pattern, re.IGNORECASE)
-            except re.error:
-                compiled = None
-            loaded.append({
-                "id":       r.id,
-                "name":     r.name,
-                "category": r.category,
-                "severity": r.severity,
-                "protocol": r.protocol.upper(),
-                "action":   r.action,
-                "pattern":  r.pattern,
-                "regex":    compiled,
-            })
-        db.close()
-        with _rules_lock:
-            _rules.clear()
-            _rules.extend(loaded)
-        print(f"[SIG ENGINE] Loaded {len(loaded)} active rules from DB")
-        return len(loaded)
-    except Exception as e:
-        print(f"[SIG ENGINE] Rule load error: {e}")
-        return 0
+# ── Alert dedup (per rule id + source IP) ──────────────────────
+def _emit_window_summary(win, span: float):
+    """
+    Called when a suppression window with repeat hits closes.  The first
+    hit was already alerted and persisted, so only the win.hits - 1
+    suppressed repeats are reported here.
+    """
+    rule = win.rule
+    repeats = win.hits - 1
+    from network_monitor import state
+    state.add_alert(
+        rule["severity"], win.src,
+        f"[{rule['id']}] {rule['name']}",
+        f"{repeats} more hits in {span:.0f} s on {win.proto}:{win.port} from {win.src} → {win.dst}"
+    )
+    alert_sink.submit(rule, win.src, win.dst, win.proto, win.port, rule["action"],
+                      count=repeats, window_s=span)
 
 
-def reload_rules():
-    """Called externally when rules are updated via API."""
-    return load_rules_from_db()
+_suppressor = AlertSuppressor(on_summary=_emit_window_summary)
 
 
-def _rules_auto_reloader():
-    """Background thread — reloads rules every 30 seconds."""
+def _load_alert_cooldown(db):
+    """Pick up AnomalyConfig.alert_cooldown for the suppression window."""
+    from models.configuration import AnomalyConfig
+    cfg = db.query(AnomalyConfig).filter(AnomalyConfig.id == 1).first()
+    if cfg is not None and cfg.alert_cooldown is not None:
+        set_alert_cooldown(cfg.alert_cooldown)
+
+
+def set_alert_cooldown(seconds: int):
+    """Change the dedup window length — called on load and by the config API."""
+    _suppressor.cooldown = max(int(seconds), 0)
+
+
+def set_inspect_depth(depth: int):
+    """Change how many payload bytes are matched per packet (0 = all)."""
+    global INSPECT_DEPTH
+    INSPECT_DEPTH = max(int(depth), 0)
+
+
+def _alert_window_sweeper():
+    """Background thread — closes expired suppression windows every second."""
     while True:
-        time.sleep(30)
-        load_rules_from_db()
+        time.sleep(1)
+        _suppressor.sweep()
 
 
-# ── iptables integration ───────────────────────────────────────
-def _block_ip_iptables(ip: str, rule_id: str, rule_name: str):
-    """Add iptables DROP rule for IP — requires sudo."""
-    if ip in _blocked_ips_cache:
-        return  # already blocked
-    try:
-        # Check if rule already exists
-        check = subprocess.run(
-            ["sudo", "iptables", "-C", "INPUT", "-s", ip, "-j", "DROP"],
-            capture_output=True
+def _rule_models():
+    from models.configuration import SignatureRule, RansomwareRule
+    return {"signature": SignatureRule, "ransomware": RansomwareRule}
+
+
+def _ransom_scope(pattern: str) -> str:
+    """Protocol bucket for a ransomware rule (the table has no protocol column)."""
+    return "SMB" if "smb" in pattern or "ms17" in pattern else "ANY"
+
+
+def _compile_rule(r, table: str = "signature") -> Dict:
+    """
+    Turn a SignatureRule / RansomwareRule row into the dict used on the
+    packet path.  Ransomware rows become Alert rules scoped by _ransom_scope.
+    The regex / literal / detector part is reused from _compiled_cache when
+    the (table, id, pattern, protocol, action) key is unchanged.
+    """
+    if table == "ransomware":
+        category, severity, action = "Ransomware", r.risk_level, "Alert"
+        protocol = _ransom_scope(r.pattern.lower())
+    else:
+        category, severity, action = r.category, r.severity, r.action
+        protocol = r.protocol.upper()
+    key = (table, r.id, r.pattern, protocol, action)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        try:
+            regex = compile_pattern(r.pattern)
+        except re.error:
+            regex = None
+        compiled = (
+            regex,
+            extract_literals(r.pattern) if regex else None,
+            _builtin_kind(r.pattern.lower()) if table == "signature" else None,
         )
-        if check.returncode != 0:
-            # Rule doesn't exist — add it
-            result = subprocess.run(
-                ["sudo", "iptables", "-A", "INPUT", "-s", ip, "-j", "DROP"],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                _blocked_ips_cache.add(ip)
-                print(f"[FIREWALL] Blocked {ip} via iptables — rule {rule_id} ({rule_name})")
-            else:
-                print(f"[FIREWALL] iptables failed for {ip}: {result.stderr}")
-        else:
-            _blocked_ips_cache.add(ip)
-    except Exception as e:
-        print(f"[FIREWALL] iptables error for {ip}: {e}")
+        _compiled_cache[key] = compiled
+    regex, literals, builtin = compiled
+    return {
+        "id":       r.id,
+        "name":     r.name,
+        "category": category,
+        "severity": severity,
+        "protocol": protocol,
+        "action":   action,
+        "pattern":  r.pattern,
+        "regex":    regex,
+        "literals": literals,
+        "builtin":  builtin,
+        "detector": _DETECTORS.get(builtin),
+        "table":    table,
+        "key":      key,
+    }
+
+
+class RuleSet:
+    """
+    Immutable, fully compiled rule set: the rules plus their literal
+    prefilter and protocol/port index.  Never mutated after construction
+    (the index's bucket memo only ever adds identical entries), so any
+    number of threads can match against it while a reload builds the next.
+    Rules with neither a usable regex nor a detector can never match and
+    are left out (counted in `inert`).
+    """
+
+    __slots__ = ("rules", "prefilter", "index", "stateful", "inert")
+
+    def __init__(self, rules: List[Dict]):
+        live = [r for r in rules if r["regex"] is not None or r["detector"] is not None]
+        self.inert = len(rules) - len(live)
+        rules = live
+        literals: Dict[int, Set[bytes]] = {}
+        always: List[int] = []
+        detectors: List[int] = []
+        stateful: Dict[str, List[int]] = {}
+        for idx, rule in enumerate(rules):
+            if rule["regex"] is not None:
+                if rule["literals"]:
+                    literals[idx] = rule["literals"]
+                else:
+                    always.append(idx)
+            if rule["builtin"] in _STATEFUL_EVENTS:
+                stateful.setdefault(_STATEFUL_EVENTS[rule["builtin"]], []).append(idx)
+            elif rule["detector"] is not None:
+                detectors.append(idx)
+        self.rules     = tuple(rules)
+        self.prefilter = LiteralPrefilter(literals)
+        self.index     = _RuleIndex(rules, always, detectors)
+        self.stateful  = {event: frozenset(idxs) for event, idxs in stateful.items()}
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def _install_rules(loaded: List[Dict]) -> "RuleSet":
+    """Compile a rule list and publish it atomically."""
+    global _ruleset
+    ruleset = RuleSet(loaded)
+    _ruleset = ruleset  # single reference store — readers see old or new, never half
+    return ruleset
+
+
+def _apply_row(r, table: str = "signature") -> bool:
+    """Merge one rule row into _active_rules. Returns True if it changed."""
+    slot = (table, r.id)
+    if not r.enabled:
+        return _active_rules.pop(slot, None) is not None
+    rule = _compile_rule(r, table)
+    if _active_rules.get(slot) == rule:
+        return False
+    _active_rules[slot] = rule
+    return True
+
 
+def _publish_active():
+    """Rebuild the RuleSet from _active_rules and drop stale compiled entries."""
+    loaded = [_active_rules[slot] for slot in sorted(_active_rules)]
+    live_keys = {rule["key"] for rule in loaded}
+    for key in [k for k in _compiled_cache if k not in live_keys]:
+        del _compiled_cache[key]
+    return _install_rules(loaded)
 
-def _unblock_ip_iptables(ip: str):
-    """Remove iptables DROP rule for IP."""
+
+def load_rules_from_db():
+    """Full load of all enabled signature and ransomware rules from PostgreSQL."""
     try:
-        subprocess.run(
-            ["sudo", "iptables", "-D", "INPUT", "-s", ip, "-j", "DROP"],
-            capture_output=True, timeout=5
-        )
-        _blocked_ips_cache.discard(ip)
-        print(f"[FIREWALL] Unblocked {ip} via iptables")
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            rows = {table: db.query(model).all() for table, model in _rule_models().items()}
+            _load_alert_cooldown(db)
+        finally:
+            db.close()
+        with _rules_lock:
+            _active_rules.clear()
+            _last_sync.clear()
+            for table, table_rows in rows.items():
+                for r in table_rows:
+                    _apply_row(r, table)
+                stamps = [r.updated_at for r in table_rows if r.updated_at is not None]
+                if stamps:
+                    _last_sync[table] = max(stamps)
+            ruleset = _publish_active()
+        ransom = sum(1 for rule in ruleset.rules if rule["table"] == "ransomware")
+        print(f"[SIG ENGINE] Loaded {len(ruleset)} active rules from DB "
+              f"({ransom} ransomware, {ruleset.prefilter.size} prefiltered, "
+              f"{len(ruleset.index.any)} protocol-agnostic, {ruleset.inert} inert)")
+        return len(ruleset)
     except Exception as e:
-        print(f"[FIREWALL] Unblock error for {ip}: {e}")
+        print(f"[SIG ENGINE] Rule load error: {e}")
+        return 0
 
 
-def _log_rule_match(rule: Dict, src: str, dst: str, proto: str,
-                    port: int, payload: str, action_taken: str):
-    """Persist rule match to DB."""
+def sync_rules():
+    """
+    Delta reload — fetch only rows with updated_at >= the last watermark
+    (one per table), detect deletions from the id lists, and republish only
+    if something actually changed.  `>=` re-reads rows sharing the watermark
+    timestamp; unchanged rows are no-ops thanks to the compiled-state hash.
+    """
+    if not _last_sync:
+        return load_rules_from_db()
     try:
         from database import SessionLocal
-        from models.network import NetworkAlert, NetworkLog
         db = SessionLocal()
+        try:
+            with _rules_lock:
+                since = dict(_last_sync)
+            changed, existing = {}, set()
+            for table, model in _rule_models().items():
+                q = db.query(model)
+                if table in since:
+                    q = q.filter(model.updated_at >= since[table])
+                changed[table] = q.all()
+                existing.update((table, rid) for (rid,) in db.query(model.id).all())
+            _load_alert_cooldown(db)
+        finally:
+            db.close()
 
-        # Add alert
-        alert = NetworkAlert(
-            severity=rule["severity"],
-            src_ip=src,
-            dst_ip=dst,
-            message=f"[{rule['id']}] {rule['name']} — {action_taken}",
-            protocol=proto,
-            port=port,
-        )
-        db.add(alert)
-
-        # Add log
-        log = NetworkLog(
-            status=action_taken.upper(),
-            src_ip=src,
-            event="SIGNATURE_MATCH",
-            result="SUCCESS" if action_taken in ("Block","Drop") else "INFO",
-            message=f"Rule {rule['id']} matched: {rule['name']} | {src}→{dst}:{port}",
-        )
-        db.add(log)
+        with _rules_lock:
+            dirty = False
+            for table, rows in changed.items():
+                for r in rows:
+                    dirty |= _apply_row(r, table)
+                stamps = [r.updated_at for r in rows if r.updated_at is not None]
+                if stamps:
+                    prev = _last_sync.get(table)
+                    _last_sync[table] = max(stamps) if prev is None else max(prev, max(stamps))
+            removed = [slot for slot in _active_rules if slot not in existing]
+            for slot in removed:
+                del _active_rules[slot]
+            if dirty or removed:
+                ruleset = _publish_active()
+                print(f"[SIG ENGINE] Delta sync — {sum(map(len, changed.values()))} rows re-read, "
+                      f"{len(removed)} removed, {len(ruleset)} active")
+            return len(_active_rules)
+    except Exception as e:
+        print(f"[SIG ENGINE] Rule sync error: {e}")
+        return len(_active_rules)
 
-        # Update hit count in DB
-        from models.configuration import SignatureRule
-        sig = db.query(SignatureRule).filter(SignatureRule.id == rule["id"]).first()
-        if sig:
-            sig.updated_at = datetime.utcnow()
 
-        db.commit()
-        db.close()
+def invalidate_rule(rule_id: str, table: str = "signature"):
+    """
+    Targeted reload of a single rule — called by the config API after a
+    toggle/edit/delete instead of a full reload.
+    """
+    try:
+        from database import SessionLocal
+        model = _rule_models()[table]
+        db = SessionLocal()
+        try:
+            r = db.query(model).filter(model.id == rule_id).first()
+        finally:
+            db.close()
+        with _rules_lock:
+            if r is None:
+                dirty = _active_rules.pop((table, rule_id), None) is not None
+            else:
+                dirty = _apply_row(r, table)
+            if dirty:
+                _publish_active()
+            return len(_active_rules)
     except Exception as e:
-        print(f"[SIG ENGINE] Log error: {e}")
+        print(f"[SIG ENGINE] Rule invalidate error for {rule_id}: {e}")
+        return len(_active_rules)
+
+
+def reload_rules():
+    """Called externally when rules are updated via API."""
+    return sync_rules()
+
+
+def _rules_auto_reloader():
+    """Background thread — delta-syncs rules every 30 seconds."""
+    while True:
+        time.sleep(30)
+        sync_rules()
 
 
 # ── Protocol port mapping ──────────────────────────────────────
@@ -179,151 +362,253 @@ def _proto_matches(rule_proto: str, pkt_proto: str, port: int) -> bool:
     return False
 
 
-# ── Main matching function ─────────────────────────────────────
-def match_packet(src: str, dst: str, proto: str, port: int,
-                 payload: str = "", raw_pkt=None):
+class _RuleIndex:
     """
-    Match a packet against all loaded signature rules.
-    Called from network_monitor._process_real_packet() for every packet.
-    Returns list of matched rules.
+    Rules pre-partitioned at load time by protocol and destination port.
+    A rule lands in the bucket of its own protocol, in the bucket of every
+    port PROTO_PORT_MAP gives that protocol, or in the ANY bucket — the same
+    cases _proto_matches accepts.  bucket() merges the three for a packet and
+    memoises the result, so SSH/RDP/SMB rules never show up for HTTPS traffic.
     """
-    matched = []
 
-    with _rules_lock:
-        rules_snapshot = list(_rules)
+    __slots__ = ("any", "by_proto", "by_port", "_always", "_detectors", "_cache")
+
+    def __init__(self, rules: List[Dict], always: List[int], detectors: List[int]):
+        any_rules: List[int] = []
+        by_proto: Dict[str, List[int]] = {}
+        by_port:  Dict[int, List[int]] = {}
+        for idx, rule in enumerate(rules):
+            proto = rule["protocol"]
+            if proto == "ANY":
+                any_rules.append(idx)
+                continue
+            by_proto.setdefault(proto, []).append(idx)
+            for p in PROTO_PORT_MAP.get(proto, []):
+                by_port.setdefault(p, []).append(idx)
+        self.any        = tuple(any_rules)
+        self.by_proto   = by_proto
+        self.by_port    = by_port
+        self._always    = frozenset(always)
+        self._detectors = frozenset(detectors)
+        # (proto, indexed port or None) -> bucket; key space is tiny
+        self._cache: Dict[Tuple[str, Optional[int]], Tuple] = {}
+
+    def bucket(self, proto: str, port: int):
+        """
+        Return (members, always_regex, detectors) for a packet:
+        every applicable rule index, those needing an unconditional regex
+        scan, and those with a built-in detector (both sorted).
+        """
+        key = (proto, port if port in self.by_port else None)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        members = set(self.any)
+        members.update(self.by_proto.get(proto, ()))
+        members.update(self.by_port.get(port, ()))
+        cached = (
+            frozenset(members),
+            tuple(sorted(members & self._always)),
+            tuple(sorted(members & self._detectors)),
+        )
+        self._cache[key] = cached
+        return cached
 
-    for rule in rules_snapshot:
-        # 1. Protocol filter
-        if not _proto_matches(rule["protocol"], proto, port):
-            continue
 
-        # 2. Pattern matching — against payload or packet summary
+# ── Main matching function ─────────────────────────────────────
+def find_matches(ruleset: RuleSet, meta: PacketMeta) -> List[Dict]:
+    """
+    Pure matching step — no side effects.
+    Only rules in the packet's protocol/port bucket are looked at, and of
+    those only prefilter hits, rules without a usable literal, and built-in
+    detector rules.
+    """
+    members, always_regex, detector_rules = ruleset.index.bucket(meta.proto, meta.dport)
+    if meta.events:
+        # Stateful detections judge the sender, not this packet's protocol
+        # bucket — a SYN flood on :80 still reaches the TCP SYN-flood rule
+        detector_rules = set(detector_rules)
+        for event in meta.events:
+            detector_rules.update(ruleset.stateful.get(event, ()))
+    if not members and not detector_rules:
+        return []
+
+    payload = meta.payload
+    if payload:
+        payload = memoryview(payload)          # zero-copy slice, even for bytes
+        if INSPECT_DEPTH:
+            payload = payload[:INSPECT_DEPTH]
+        regex_candidates = ruleset.prefilter.candidates(payload) & members
+        regex_candidates.update(always_regex)
+    else:
+        regex_candidates = set()
+    candidates = regex_candidates.union(detector_rules)
+    if not candidates:
+        return []
+
+    rules = ruleset.rules
+    matched = []
+    for idx in sorted(candidates):
+        rule = rules[idx]
+
+        # 1. Pattern matching — confirm prefilter hits with the full regex
         matched_pattern = False
+        if idx in regex_candidates and rule["regex"].search(payload):
+            matched_pattern = True
 
-        if rule["regex"] and payload:
-            if rule["regex"].search(payload):
-                matched_pattern = True
+        # 2. Built-in detector (for rules without payload), chosen at load time
+        if not matched_pattern and rule["detector"] is not None:
+            matched_pattern = rule["detector"](meta)
 
-        # 3. Special built-in detectors (for rules without payload)
-        if not matched_pattern:
-            matched_pattern = _builtin_detector(rule, src, dst, proto, port, raw_pkt)
+        if matched_pattern:
+            matched.append(rule)
+    return matched
 
-        if not matched_pattern:
-            continue
 
+def match_packet(meta: PacketMeta):
+    """
+    Match a packet against all loaded signature rules.
+    Called from network_monitor._process_real_packet() for every packet.
+    Returns list of matched rules.
+    """
+    matched = find_matches(_ruleset, meta)
+    if not matched:
+        return matched
+
+    src, dst, proto, port = meta.src, meta.dst, meta.proto, meta.dport
+    from network_monitor import state
+    for rule in matched:
         # ── Rule matched! ──────────────────────────────────────
-        matched.append(rule)
         rule_match_counts[rule["id"]] = rule_match_counts.get(rule["id"], 0) + 1
 
+        # Repeat hit from the same source inside the cooldown window —
+        # only counted, summarised when the window closes
+        if not _suppressor.hit(rule, src, dst, proto, port):
+            continue
+
         action = rule["action"]
 
         # Execute action
         if action == "Block":
-            # Add to in-memory blocked set + iptables
-            from network_monitor import state, KNOWN_BAD_IPS
-            if src not in KNOWN_BAD_IPS:
-                KNOWN_BAD_IPS.append(src)
-            with state.lock:
-                state.threats_blocked += 1
-            _block_ip_iptables(src, rule["id"], rule["name"])
-
-        elif action == "Drop":
-            # Mark as threat
-            from network_monitor import state
-            with state.lock:
-                state.threats_detected += 1
+            # Add to the reputation set + queue a firewall block
+            reputation.flag(src)
+            state.count_blocked()
+            firewall.block(src, f"rule {rule['id']} ({rule['name']})")
 
-        elif action == "Alert":
-            from network_monitor import state
-            with state.lock:
-                state.threats_detected += 1
+        elif action in ("Drop", "Alert"):
+            # Mark as threat
+            state.count_detected()
 
         # Add alert to live dashboard
-        from network_monitor import state
-        state.add_alert(
+        kind = "Ransomware pattern" if rule["table"] == "ransomware" else "Signature"
+        alert = state.add_alert(
             rule["severity"], src,
             f"[{rule['id']}] {rule['name']}",
-            f"Signature matched on {proto}:{port} from {src} → {dst}"
+            f"{kind} matched on {proto}:{port} from {src} → {dst}",
+            meta=meta, persist=False,
         )
 
-        # Log to DB in background
-        threading.Thread(
-            target=_log_rule_match,
-            args=(rule, src, dst, proto, port, payload, action),
-            daemon=True
-        ).start()
+        # Persist via the batched alert sink (never blocks the capture thread)
+        alert_sink.submit(rule, src, dst, proto, port, action, pcap=alert.get("pcap"))
 
     return matched
 
 
-def _builtin_detector(rule: Dict, src: str, dst: str,
-                      proto: str, port: int, raw_pkt) -> bool:
+# Built-in detectors driven by sketches.SynTracker events (kind -> event)
+_STATEFUL_EVENTS = {"syn_flood": "syn_flood", "nmap": "port_scan"}
+
+
+def _builtin_kind(pattern: str) -> Optional[str]:
     """
-    Built-in detectors for rules that can't rely on payload inspection.
-    These match based on packet metadata (protocol, port, flags).
+    Decide once, at load time, which built-in detector a (lower-cased)
+    rule pattern maps to.  None = no built-in detector.
     """
-    pattern = rule["pattern"].lower()
-    rule_id = rule["id"]
-
-    # SYN Flood — SIG-003
-    if "syn" in pattern and "flood" in pattern:
-        if raw_pkt and raw_pkt.haslayer("TCP"):
-            tcp = raw_pkt["TCP"]
-            if tcp.flags == 0x02 and port in [80, 443]:
-                return False  # normal HTTPS — don't flag
-            if tcp.flags == 0x02:
-                from network_monitor import state
-                # Count SYN packets per second
-                with state.lock:
-                    if state.pps > 1000:
-                        return True
-        return False
-
-    # SSH Brute Force — SIG-004
+    if "syn" in pattern and ("flood" in pattern or "/s" in pattern):
+        return "syn_flood"
     if "ssh" in pattern and ("brute" in pattern or "failed" in pattern):
-        return proto == "TCP" and port == 22
-
-    # FTP Brute Force — SIG-005
+        return "ssh_brute"
     if "ftp" in pattern and ("brute" in pattern or "failed" in pattern):
-        return proto == "TCP" and port == 21
-
-    # Nmap SYN Scan — SIG-006
+        return "ftp_brute"
     if "nmap" in pattern or "syn scan" in pattern:
-        if raw_pkt and raw_pkt.haslayer("TCP"):
-            tcp = raw_pkt["TCP"]
-            return tcp.flags == 0x02 and port not in [80, 443, 53]
-        return False
-
-    # HTTP Slowloris — SIG-008
+        return "nmap"
     if "slowloris" in pattern:
-        return proto == "TCP" and port in [80, 8080] and src != ""
-
-    # Blind SQL Injection — SIG-009
+        return "slowloris"
     if "sleep" in pattern or "waitfor" in pattern:
-        return "sleep" in (raw_pkt.summary() if raw_pkt else "").lower()
-
-    # RDP Brute Force — SIG-010
+        return "blind_sqli"
     if "rdp" in pattern:
-        return proto == "TCP" and port == 3389
+        return "rdp"
+    return None
 
-    # WannaCry SMB — RAN-007
-    if "smb" in pattern or "ms17" in pattern:
-        return proto == "TCP" and port in [445, 139]
 
-    # Cobalt Strike — RAN-006
-    if "cobaltstrike" in pattern or "cobalt" in pattern:
-        return proto == "TCP" and port in [443, 8443, 4444]
+# ── Built-in detectors ─────────────────────────────────────────
+# For rules that can't rely on payload inspection; they match on packet
+# metadata (protocol, port, flags) or on stateful events.  The callable is
+# picked once per rule at compile time (_DETECTORS[_builtin_kind(...)]).
 
-    return False
+def _detect_syn_flood(meta: PacketMeta) -> bool:
+    """SYN Flood — SIG-003 (per source / per victim, sketches.py)."""
+    return "syn_flood" in meta.events
+
+
+def _detect_ssh_brute(meta: PacketMeta) -> bool:
+    """SSH Brute Force — SIG-004."""
+    return meta.proto == "TCP" and meta.dport == 22
+
+
+def _detect_ftp_brute(meta: PacketMeta) -> bool:
+    """FTP Brute Force — SIG-005."""
+    return meta.proto == "TCP" and meta.dport == 21
+
+
+def _detect_nmap(meta: PacketMeta) -> bool:
+    """Nmap SYN Scan — SIG-006 (distinct ports per source, sketches.py)."""
+    return "port_scan" in meta.events
+
+
+def _detect_slowloris(meta: PacketMeta) -> bool:
+    """HTTP Slowloris — SIG-008."""
+    return meta.proto == "TCP" and meta.dport in (80, 8080) and meta.src != ""
+
+
+def _detect_blind_sqli(meta: PacketMeta) -> bool:
+    """Blind SQL Injection — SIG-009."""
+    return "sleep" in (meta.raw.summary() if meta.raw is not None else "").lower()
+
+
+def _detect_rdp(meta: PacketMeta) -> bool:
+    """RDP Brute Force — SIG-010."""
+    return meta.proto == "TCP" and meta.dport == 3389
+
+
+_DETECTORS = {
+    "syn_flood":  _detect_syn_flood,
+    "ssh_brute":  _detect_ssh_brute,
+    "ftp_brute":  _detect_ftp_brute,
+    "nmap":       _detect_nmap,
+    "slowloris":  _detect_slowloris,
+    "blind_sqli": _detect_blind_sqli,
+    "rdp":        _detect_rdp,
+}
+
+
+_ruleset = RuleSet([])
 
 
 # ── Startup ────────────────────────────────────────────────────
-def start_signature_engine():
-    """Initialize the engine — load rules and start auto-reloader."""
+def start_signature_engine(enforce: bool = True):
+    """
+    Initialize the engine — load rules, start the alert sink and auto-reloader.
+    enforce=False (capture worker processes) leaves firewall requests queued
+    for the parent to drain instead of starting a firewall worker here.
+    """
     count = load_rules_from_db()
+    alert_sink.start()
+    if enforce:
+        firewall.start()
     t = threading.Thread(target=_rules_auto_reloader, daemon=True)
     t.start()
-    print(f"[SIG ENGINE] Started with {count} rules — auto-reload every 30s")
+    threading.Thread(target=_alert_window_sweeper, daemon=True).start()
+    print(f"[SIG ENGINE] Started with {count} rules — delta sync every 30s")
 
 
 # ── API helpers ────────────────────────────────────────────────
@@ -332,11 +617,16 @@ def get_rule_stats() -> Dict:
     return dict(rule_match_counts)
 
 
+def get_dedup_stats() -> Dict:
+    """Return suppression window counters."""
+    return _suppressor.stats()
+
+
 def block_ip_now(ip: str):
-    """Block an IP immediately via iptables — called from API."""
-    _block_ip_iptables(ip, "MANUAL", "Manual block")
+    """Queue a firewall block for an IP — called from API."""
+    firewall.block(ip, "Manual block")
 
 
 def unblock_ip_now(ip: str):
-    """Unblock an IP via iptables — called from API."""
-    _unblock_ip_iptables(ip)
+    """Queue a firewall unblock for an IP — called from API."""
+    firewall.unblock(ip)
@@ -0,0 +1,364 @@
+"""
+sketches.py
+===========
+CyGuardian-X — Sliding-window sketches for per-source SYN flood / scan detection
+
+Fixed-memory structures, so a flood from randomised sources can't grow
+them:
+  • CountMinSketch     — approximate per-key counts (never under-counts)
+  • WindowedCountMin   — two CMS started half a window apart, the older
+                         one answers; counts are corrected by the expected
+                         collision noise (n / width), so a randomised flood
+                         doesn't lift every source over the threshold
+  • HyperLogLog        — approximate distinct count, O(1) estimate kept
+                         incrementally
+  • WindowedHLL        — two HLLs started half a window apart; the older
+                         one answers, so the estimate always covers
+                         between window/2 and window seconds
+
+SynTracker (singleton `syn_tracker`) watches bare SYNs:
+  • SYN flood — SYNs per source or per destination in DETECT_WINDOW
+  • port scan — distinct destination ports per source (HLL per source,
+                only for sources that already sent SCAN_ADMIT SYNs, at
+                most MAX_SCAN_SOURCES of them)
+Thresholds are conn_rate_mult × the baseline per-source / per-destination
+average over baseline_window (AnomalyConfig), never below the *_MIN
+floors.  Each attacker (or victim) fires once per alert_cooldown; the hits
+are handed downstream in PacketMeta.events.  anomaly_engine loads the
+config and pushes it here via apply().
+
+With capture workers every process keeps its own tracker, and flow
+sharding spreads one source's SYNs (and a scanner's ports) over all N of
+them.  set_shares(N) divides the *_MIN floors and SCAN_ADMIT by N so the
+configured totals still hold on average; the baseline-derived limits are
+already per-worker.  The price: an unevenly spread burst can fire a
+little early or late, and each worker fires once per cooldown on its own,
+so one attacker may raise up to N alerts.
+"""
+
+import collections
+import math
+import time
+from typing import Dict, Tuple
+
+DETECT_WINDOW    = 10        # seconds — rate / distinct-port window
+SYN_SRC_MIN      = 200       # SYNs per source per window (20/s)
+SYN_DST_MIN      = 2000      # SYNs per destination per window (200/s)
+SCAN_MIN_PORTS   = 20        # distinct ports per source per window
+SCAN_ADMIT       = 4         # SYNs before a source gets its own HLL
+MAX_SCAN_SOURCES = 4096      # per-source HLLs kept (LRU)
+MAX_FIRED        = 10_000    # cooldown entries kept (LRU)
+
+_M64 = (1 << 64) - 1
+
+
+def _hash64(x) -> int:
+    """splitmix64 finaliser over Python's hash (ints hash to themselves)."""
+    z = (hash(x) + 0x9E3779B97F4A7C15) & _M64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+    return z ^ (z >> 31)
+
+
+# ── Count-Min ──────────────────────────────────────────────────
+class CountMinSketch:
+    __slots__ = ("width", "depth", "rows", "n")
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows  = [[0] * width for _ in range(depth)]
+        self.n     = 0                 # total added — sets the noise floor
+
+    def cells(self, key):
+        """Column per row (Kirsch–Mitzenmacher double hashing)."""
+        h = _hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        w = self.width
+        return [(h1 + i * h2) % w for i in range(self.depth)]
+
+    def add(self, key, n: int = 1, cells=None) -> int:
+        cells = cells or self.cells(key)
+        self.n += n
+        est = None
+        for row, c in zip(self.rows, cells):
+            v = row[c] = row[c] + n
+            if est is None or v < est:
+                est = v
+        return est
+
+    def estimate(self, key, cells=None) -> int:
+        cells = cells or self.cells(key)
+        return min(row[c] for row, c in zip(self.rows, cells))
+
+    @property
+    def noise(self) -> float:
+        """Expected over-count of any key from collisions (n / width)."""
+        return self.n / self.width
+
+
+class WindowedCountMin:
+    """
+    Count-Min over roughly the last `window` seconds: two sketches started
+    half a window apart, the older one answers (covers window/2..window).
+    """
+
+    def __init__(self, window: float = DETECT_WINDOW, width: int = 4096, depth: int = 4):
+        self.half  = window / 2
+        self.width = width
+        self.depth = depth
+        self.old   = CountMinSketch(width, depth)
+        self.new   = CountMinSketch(width, depth)
+        self._rotate_at = 0.0
+
+    def _rotate(self, now: float):
+        self.old, self.new = self.new, CountMinSketch(self.width, self.depth)
+        self._rotate_at = now + self.half
+
+    def add(self, key, now: float, n: int = 1) -> int:
+        """Add and return the collision-corrected count (may be fractional)."""
+        if now >= self._rotate_at:
+            self._rotate(now)
+        old, new = self.old, self.new
+        old.n += n
+        new.n += n
+        h = _hash64(key)
+        h1, h2, w = h & 0xFFFFFFFF, (h >> 32) | 1, self.width
+        est = None
+        for orow, nrow in zip(old.rows, new.rows):   # both generations, one pass
+            nrow[h1 % w] += n
+            v = orow[h1 % w] = orow[h1 % w] + n
+            if est is None or v < est:
+                est = v
+            h1 += h2
+        return est - old.n / w
+
+    def estimate(self, key, now: float) -> float:
+        if now >= self._rotate_at:
+            self._rotate(now)
+        return self.old.estimate(key) - self.old.noise
+
+
+# ── HyperLogLog ────────────────────────────────────────────────
+class HyperLogLog:
+    __slots__ = ("p", "m", "regs", "_inv", "_zeros", "_alpha")
+
+    def __init__(self, p: int = 10):
+        self.p      = p
+        self.m      = 1 << p
+        self.regs   = bytearray(self.m)
+        self._inv   = float(self.m)        # Σ 2^-reg, kept incrementally
+        self._zeros = self.m
+        self._alpha = 0.7213 / (1 + 1.079 / self.m) if self.m >= 128 else \
+                      {16: 0.673, 32: 0.697, 64: 0.709}.get(self.m, 0.7)
+
+    def add(self, x, h: int = None) -> bool:
+        h = _hash64(x) if h is None else h
+        rest_bits = 64 - self.p
+        idx  = h >> rest_bits
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        old  = self.regs[idx]
+        if rank <= old:
+            return False
+        self.regs[idx] = rank
+        self._inv += 2.0 ** -rank - 2.0 ** -old
+        if old == 0:
+            self._zeros -= 1
+        return True
+
+    def count(self) -> float:
+        m = self.m
+        est = self._alpha * m * m / self._inv
+        if est <= 2.5 * m and self._zeros:
+            return m * math.log(m / self._zeros)   # linear counting
+        return est
+
+
+class WindowedHLL:
+    """Distinct count over roughly the last `window` seconds."""
+
+    __slots__ = ("half", "p", "old", "new", "_rotate_at")
+
+    def __init__(self, window: float, p: int = 10, now: float = 0.0):
+        self.half = window / 2
+        self.p    = p
+        self.old  = HyperLogLog(p)
+        self.new  = HyperLogLog(p)
+        self._rotate_at = now + self.half
+
+    def add(self, x, now: float):
+        if now >= self._rotate_at:
+            self.old, self.new = self.new, HyperLogLog(self.p)
+            self._rotate_at = now + self.half
+        h = _hash64(x)
+        self.old.add(x, h)
+        self.new.add(x, h)
+
+    def count(self) -> float:
+        return self.old.count()
+
+
+# ── SYN flood / port scan tracking ─────────────────────────────
+class SynTracker:
+    def __init__(self, conn_rate_mult: float = 5.0, baseline_window: int = 300,
+                 cooldown: int = 60):
+        self.src_syn = WindowedCountMin(DETECT_WINDOW)
+        self.dst_syn = WindowedCountMin(DETECT_WINDOW)
+        self.scan_ports: "collections.OrderedDict[str, WindowedHLL]" = collections.OrderedDict()
+        self._fired: "collections.OrderedDict[Tuple[str, str], float]" = collections.OrderedDict()
+        self.shares = 1
+        self._floors()
+        self.configure(conn_rate_mult, baseline_window, cooldown)
+
+        self.syns   = 0
+        self.events = collections.Counter()
+
+    def configure(self, conn_rate_mult: float, baseline_window: int, cooldown: int = 60):
+        """(Re)build the baseline from AnomalyConfig values."""
+        self.conn_rate_mult  = float(conn_rate_mult)
+        self._configured_window = int(baseline_window)
+        self.baseline_window = max(int(baseline_window), 2 * DETECT_WINDOW)
+        self.cooldown        = cooldown
+        now = time.monotonic()
+        self._base_per_sec   = collections.deque(maxlen=self.baseline_window)   # SYNs / second
+        self._base_sum       = 0
+        self._base_cur       = 0
+        self._base_sec       = int(now)
+        self._base_srcs      = WindowedHLL(self.baseline_window, 10, now)
+        self._base_dsts      = WindowedHLL(self.baseline_window, 10, now)
+        self._base_pairs     = WindowedHLL(self.baseline_window, 12, now)
+        self.syn_src_limit   = self.src_min
+        self.syn_dst_limit   = self.dst_min
+        self.scan_limit      = self.scan_min
+
+    def set_shares(self, n: int):
+        """This process sees 1/n of every source's SYNs (capture workers) — scale the floors."""
+        self.shares = max(int(n), 1)
+        self._floors()
+        self._tick(self._base_sec)       # refresh the limits now
+
+    def _floors(self):
+        self.src_min    = SYN_SRC_MIN / self.shares
+        self.dst_min    = SYN_DST_MIN / self.shares
+        self.scan_min   = SCAN_MIN_PORTS / self.shares
+        self.scan_admit = max(math.ceil(SCAN_ADMIT / self.shares), 1)
+
+    def apply(self, cfg):
+        """Take conn_rate_mult / baseline_window / alert_cooldown from an AnomalyConfig row."""
+        values = (float(cfg.conn_rate_mult or 5.0), int(cfg.baseline_window or 300),
+                  cfg.alert_cooldown if cfg.alert_cooldown is not None else 60)
+        if values != (self.conn_rate_mult, self._configured_window, self.cooldown):
+            self.configure(*values)   # only a real change resets the baseline
+
+    # ── baseline ─────────────────────────────────────────────
+    def _tick(self, sec: int):
+        """Close per-second baseline buckets and refresh the thresholds."""
+        for _ in range(min(sec - self._base_sec, self.baseline_window)):
+            if len(self._base_per_sec) == self._base_per_sec.maxlen:
+                self._base_sum -= self._base_per_sec[0]
+            self._base_per_sec.append(self._base_cur)
+            self._base_sum += self._base_cur
+            self._base_cur = 0
+        self._base_sec = sec
+
+        # Full window as the denominator: a young baseline reads low, so the
+        # *_MIN floors govern until it has filled
+        syns  = self._base_sum * DETECT_WINDOW / self.baseline_window   # SYNs per window
+        srcs  = max(self._base_srcs.count(), 1.0)
+        dsts  = max(self._base_dsts.count(), 1.0)
+        mult  = self.conn_rate_mult
+        self.syn_src_limit = max(self.src_min, mult * syns / srcs)
+        self.syn_dst_limit = max(self.dst_min, mult * syns / dsts)
+        self.scan_limit    = max(self.scan_min, mult * self._base_pairs.count() / srcs)
+
+    # ── packet path ──────────────────────────────────────────
+    def observe(self, meta, now: float = None) -> Tuple[str, ...]:
+        """
+        Feed one packet.  Returns the detections that fired on it —
+        ("syn_flood", "port_scan") — at most once per attacker per cooldown.
+        """
+        if meta.transport != "TCP" or meta.flags & 0x12 != 0x02:   # bare SYN only
+            return ()
+        now = now or time.monotonic()
+        sec = int(now)
+        if sec != self._base_sec:
+            self._tick(sec)
+        self.syns += 1
+        src, dst = meta.src, meta.dst
+
+        src_syns = self.src_syn.add(src, now)
+        dst_syns = self.dst_syn.add(dst, now)
+
+        ports = 0.0
+        if src_syns >= self.scan_admit:
+            hll = self.scan_ports.get(src)
+            if hll is None:
+                if len(self.scan_ports) >= MAX_SCAN_SOURCES:
+                    self.scan_ports.popitem(last=False)
+                hll = self.scan_ports[src] = WindowedHLL(DETECT_WINDOW, 7, now)
+            else:
+                self.scan_ports.move_to_end(src)
+            hll.add(meta.dport, now)
+            ports = hll.count()
+
+        # Traffic already half-way to a threshold stays out of the baseline,
+        # so an attack can't raise its own bar
+        if src_syns * 2 < self.syn_src_limit and dst_syns * 2 < self.syn_dst_limit \
+                and ports * 2 < self.scan_limit:
+            self._base_cur += 1
+            self._base_srcs.add(src, now)
+            self._base_dsts.add(dst, now)
+            self._base_pairs.add((src, meta.dport), now)
+
+        fired = ()
+        flood = src_syns >= self.syn_src_limit and self._fire("syn_src", src, now)
+        if dst_syns >= self.syn_dst_limit and self._fire("syn_dst", dst, now):
+            flood = True
+        if flood:
+            fired += ("syn_flood",)
+        if ports >= self.scan_limit and self._fire("scan", src, now):
+            fired += ("port_scan",)
+        return fired
+
+    def _fire(self, kind: str, ip: str, now: float) -> bool:
+        key = (kind, ip)
+        until = self._fired.get(key)
+        if until is not None and until > now:
+            return False
+        self._fired[key] = now + self.cooldown
+        self._fired.move_to_end(key)
+        if len(self._fired) > MAX_FIRED:
+            self._fired.popitem(last=False)
+        self.events[kind] += 1
+        return True
+
+    def describe(self, kind: str, meta) -> str:
+        """Human-readable evidence for a fired detection."""
+        now = time.monotonic()
+        if kind == "port_scan":
+            hll = self.scan_ports.get(meta.src)
+            ports = int(hll.count()) if hll else 0
+            return f"~{ports} distinct ports in {DETECT_WINDOW}s from {meta.src} (limit {self.scan_limit:.0f})"
+        src = self.src_syn.estimate(meta.src, now)
+        if src >= self.syn_src_limit:
+            return f"~{src:.0f} SYNs in {DETECT_WINDOW}s from {meta.src} (limit {self.syn_src_limit:.0f})"
+        dst = self.dst_syn.estimate(meta.dst, now)
+        return f"~{dst:.0f} SYNs in {DETECT_WINDOW}s to {meta.dst} (limit {self.syn_dst_limit:.0f})"
+
+    def stats(self) -> Dict:
+        return {
+            "syns":          self.syns,
+            "events":        dict(self.events),
+            "scan_sources":  len(self.scan_ports),
+            "syn_src_limit": round(self.syn_src_limit),
+            "syn_dst_limit": round(self.syn_dst_limit),
+            "scan_limit":    round(self.scan_limit),
+            "shares":        self.shares,
+            "conn_rate_mult":  self.conn_rate_mult,
+            "baseline_window": self.baseline_window,
+        }
+
+
+# Global singleton
+syn_tracker = SynTracker()
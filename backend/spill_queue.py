@@ -0,0 +1,312 @@
+"""
+spill_queue.py
+==============
+CyGuardian-X — Disk-backed FIFO for batches the database could not take
+
+While PostgreSQL is down or too slow, the packet writer appends each
+batch here instead of dropping it, and replays the backlog in order once
+writes succeed again.
+
+Layout — SPILL_DIR/<name>/:
+  • seg-00000001.spill …  append-only segments of SEGMENT_BYTES, written
+                           through mmap; a new segment starts when the
+                           current one is full
+  • cursor                 "<segment> <offset>" of the first record not
+                           yet replayed (replaced atomically after each ack)
+  • lock                   held (flock) by the one process using the queue
+
+A queue belongs to a single process: concurrent appends would overwrite
+each other's records.  Opening a directory another live process holds
+raises OSError, so every process needs its own name (capture workers use
+"packets-w<N>").  adopt() moves a queue left behind by a process that no
+longer runs (e.g. after CAPTURE_WORKERS was lowered) into this one.
+
+Record = 20-byte header (payload length, CRC32, rows, unix time; little
+endian) + payload.  A zero length marks the end of a segment's data.  On
+startup the segments are rescanned from the cursor; a torn or corrupt
+record ends its segment, so a crash mid-append loses that record only.
+
+The total size of all segments is capped at max_bytes (SPILL_MAX_MB):
+once the budget is used up new batches are rejected and counted, so the
+oldest evidence is kept and the replay order stays intact.  Segments are
+deleted as soon as replay has moved past them.
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:                  # Windows — no cross-process lock
+    fcntl = None
+
+SPILL_DIR     = os.getenv("SPILL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spill"))
+SPILL_MAX_MB  = int(os.getenv("SPILL_MAX_MB", "1024"))
+SEGMENT_BYTES = 16 * 1024 * 1024
+
+_HEADER = struct.Struct("<IIId")      # length, crc32, rows, unix time
+
+
+class _Segment:
+    """One mmap-ed segment file."""
+    __slots__ = ("seq", "path", "size", "end", "rows", "records", "_file", "_map")
+
+    def __init__(self, path: str, seq: int, size: int = 0):
+        self.seq  = seq
+        self.path = path
+        self._file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        existing = os.fstat(self._file.fileno()).st_size
+        self.size = max(existing, size)
+        if existing < self.size:
+            self._file.truncate(self.size)
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+        self.end     = 0          # first free byte
+        self.rows    = 0
+        self.records = 0
+
+    def scan(self, start: int = 0) -> int:
+        """Find the end of valid data from `start`; returns corrupt records hit (0/1)."""
+        pos = start
+        while pos + _HEADER.size <= self.size:
+            length, crc, rows, _ = _HEADER.unpack_from(self._map, pos)
+            body = pos + _HEADER.size
+            if length == 0:
+                break
+            if body + length > self.size or zlib.crc32(self._map[body:body + length]) != crc:
+                self._map[pos:pos + _HEADER.size] = bytes(_HEADER.size)   # cut the torn tail
+                self.end = pos
+                return 1
+            pos = body + length
+            self.rows += rows
+            self.records += 1
+        self.end = pos
+        return 0
+
+    def fits(self, n: int) -> bool:
+        return self.end + _HEADER.size + n <= self.size
+
+    def append(self, payload: bytes, rows: int, ts: float):
+        pos = self.end
+        body = pos + _HEADER.size
+        self._map[body:body + len(payload)] = payload
+        _HEADER.pack_into(self._map, pos, len(payload), zlib.crc32(payload), rows, ts)
+        # the next header slot must read as "end of data" even if the file is reused
+        nxt = body + len(payload)
+        if nxt + _HEADER.size <= self.size:
+            self._map[nxt:nxt + 4] = b"\0\0\0\0"
+        self._map.flush()
+        self.end = nxt
+        self.rows += rows
+        self.records += 1
+
+    def read(self, pos: int) -> Optional[Tuple[int, int, float, bytes]]:
+        """(next offset, rows, time, payload) of the record at pos, or None past the end."""
+        if pos >= self.end:
+            return None
+        length, _, rows, ts = _HEADER.unpack_from(self._map, pos)
+        body = pos + _HEADER.size
+        return body + length, rows, ts, bytes(self._map[body:body + length])
+
+    def close(self, delete: bool = False):
+        self._map.close()
+        self._file.close()
+        if delete:
+            os.remove(self.path)
+
+
+class SpillQueue:
+    def __init__(self, name: str, directory: str = SPILL_DIR, max_mb: int = SPILL_MAX_MB,
+                 segment_bytes: int = SEGMENT_BYTES):
+        self.name          = name
+        self.directory     = os.path.join(directory, name)
+        self.max_bytes     = max(max_mb, 1) * 1024 * 1024
+        self.segment_bytes = segment_bytes
+
+        self._segments: List[_Segment] = []
+        self._read_pos = 0                # offset in _segments[0]
+        self._lock_file = None
+
+        self.pending_rows  = 0
+        self.appended_rows = 0
+        self.replayed_rows = 0
+        self.rejected_rows = 0
+        self.corrupt       = 0
+        self.replay_rate   = 0.0          # rows/s, EWMA over acks
+        self._last_ack     = None
+        self._open()
+
+    # ── files ────────────────────────────────────────────────
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"seg-{seq:08d}.spill")
+
+    def _open(self):
+        """Reopen the backlog left by a previous run."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock()
+        seqs = sorted(int(f[4:12]) for f in os.listdir(self.directory)
+                      if f.startswith("seg-") and f.endswith(".spill"))
+        cur_seq, cur_pos = self._load_cursor()
+        for seq in seqs:
+            if seq < cur_seq or os.path.getsize(self._path(seq)) < _HEADER.size:
+                os.remove(self._path(seq))
+                continue
+            seg = _Segment(self._path(seq), seq)
+            start = cur_pos if seq == cur_seq else 0
+            self.corrupt += seg.scan(start)
+            if seq == cur_seq:
+                self._read_pos = start
+            self._segments.append(seg)
+        self.pending_rows = sum(s.rows for s in self._segments)
+        if self.pending_rows:
+            print(f"[SPILL] {self.name}: {self.pending_rows:,} rows waiting for replay "
+                  f"({len(self._segments)} segments)")
+
+    def _lock(self):
+        self._lock_file = open(os.path.join(self.directory, "lock"), "a")
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise OSError(f"{self.directory} is in use by another process")
+
+    def close(self):
+        for seg in self._segments:
+            seg.close()
+        self._segments = []
+        if self._lock_file is not None:
+            self._lock_file.close()       # releases the flock
+            self._lock_file = None
+
+    def _load_cursor(self) -> Tuple[int, int]:
+        try:
+            with open(os.path.join(self.directory, "cursor")) as f:
+                seq, pos = f.read().split()
+            return int(seq), int(pos)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def _save_cursor(self):
+        seq = self._segments[0].seq if self._segments else 0
+        path = os.path.join(self.directory, "cursor")
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{seq} {self._read_pos}")
+        os.replace(path + ".tmp", path)
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(s.size for s in self._segments)
+
+    # ── producer ─────────────────────────────────────────────
+    def append(self, payload: bytes, rows: int, ts: float = None) -> bool:
+        """Queue one batch. False if the disk budget is used up."""
+        tail = self._segments[-1] if self._segments else None
+        if tail is None or not tail.fits(len(payload)):
+            size = max(self.segment_bytes, _HEADER.size * 2 + len(payload))
+            if self.disk_bytes + size > self.max_bytes:
+                self.rejected_rows += rows
+                return False
+            seq = tail.seq + 1 if tail else max(self._load_cursor()[0], 1)
+            tail = _Segment(self._path(seq), seq, size)
+            self._segments.append(tail)
+        tail.append(payload, rows, ts or time.time())
+        self.pending_rows  += rows
+        self.appended_rows += rows
+        return True
+
+    # ── consumer ─────────────────────────────────────────────
+    def peek(self) -> Optional[Tuple[int, float, bytes]]:
+        """(rows, time, payload) of the oldest batch, or None when empty."""
+        while self._segments:
+            rec = self._segments[0].read(self._read_pos)
+            if rec is not None:
+                return rec[1:]
+            if len(self._segments) == 1:
+                return None
+            self._segments.pop(0).close(delete=True)   # fully replayed
+            self._read_pos = 0
+        return None
+
+    def ack(self):
+        """The batch returned by peek() is stored — move past it."""
+        rows = self._advance()
+        self.replayed_rows += rows
+        now = time.monotonic()
+        if self._last_ack is not None and now > self._last_ack:
+            rate = rows / (now - self._last_ack)
+            self.replay_rate = rate if not self.replay_rate else 0.8 * self.replay_rate + 0.2 * rate
+        self._last_ack = now
+
+    def skip(self):
+        """Drop the batch returned by peek() — it could not be decoded."""
+        self.corrupt += 1
+        self._advance()
+
+    def _advance(self) -> int:
+        nxt, rows, _, _ = self._segments[0].read(self._read_pos)
+        self._read_pos = nxt
+        self.pending_rows -= rows
+        if self.pending_rows == 0:
+            # Backlog drained — the next outage starts from a fresh segment
+            for seg in self._segments:
+                seg.close(delete=True)
+            self._segments, self._read_pos = [], 0
+        self._save_cursor()
+        return rows
+
+    # ── leftovers of other processes ─────────────────────────
+    def adopt(self, name: str) -> int:
+        """
+        Move the unreplayed batches of queue `name` (same SPILL_DIR) to
+        the end of this one and delete it.  Returns the rows moved; 0 and
+        untouched if that queue is still held by a live process.
+        """
+        try:
+            other = SpillQueue(name, os.path.dirname(self.directory), segment_bytes=self.segment_bytes)
+        except OSError:
+            return 0
+        moved = 0
+        try:
+            while True:
+                rec = other.peek()
+                if rec is None:
+                    break
+                rows, ts, payload = rec
+                if not self.append(payload, rows, ts):
+                    return moved          # out of budget — keep the rest there
+                other.ack()               # a crash in between replays the batch twice, never zero times
+                moved += rows
+        finally:
+            other.close()
+        shutil.rmtree(other.directory, ignore_errors=True)
+        return moved
+
+    def stats(self):
+        return {
+            "directory":     self.directory,
+            "segments":      len(self._segments),
+            "disk_bytes":    self.disk_bytes,
+            "used_bytes":    sum(s.end for s in self._segments) - self._read_pos,
+            "max_bytes":     self.max_bytes,
+            "pending_rows":  self.pending_rows,
+            "appended_rows": self.appended_rows,
+            "replayed_rows": self.replayed_rows,
+            "replay_rate":   round(self.replay_rate, 1) if self.pending_rows else 0.0,
+            "rejected_rows": self.rejected_rows,
+            "corrupt":       self.corrupt,
+        }
+
+
+def queue_names(prefix: str, directory: str = SPILL_DIR) -> List[str]:
+    """Names of the spill queues under `directory` that start with `prefix`."""
+    try:
+        return sorted(d for d in os.listdir(directory)
+                      if d.startswith(prefix) and os.path.isdir(os.path.join(directory, d)))
+    except OSError:
+        return []
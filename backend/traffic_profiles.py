@@ -0,0 +1,146 @@
+"""
+traffic_profiles.py
+===================
+CyGuardian-X — Synthetic traffic profiles for replay and benchmarks
+
+Deterministic (seeded) Ethernet/IPv4 frames built with struct, returned as
+pcap-style records (timestamp, frame, wire length):
+
+  web        — many clients browsing HTTP/HTTPS/DNS, ~1% SQLi/XSS payloads
+  syn_flood  — spoofed sources hammering one host with bare SYNs
+  port_scan  — one scanner sweeping ports 1..N on one target
+  smb_worm   — infected hosts probing a /16 on 445/139 with SMB negotiates
+
+  python traffic_profiles.py web out.pcap [count]   # write a profile to pcap
+"""
+
+import random
+import socket
+import struct
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from pcap_replay import Record, write_pcap
+
+TARGET = "192.168.1.10"
+
+_ETH = b"\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02\x08\x00"
+_TCP_FLAGS = {"S": 0x02, "SA": 0x12, "A": 0x10, "PA": 0x18, "R": 0x04}
+
+
+def _checksum(header: bytes) -> int:
+    total = sum(struct.unpack(f"!{len(header) // 2}H", header))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_frame(src: str, dst: str, proto: str, sport: int, dport: int,
+                flags: str = "", payload: bytes = b"", rng: random.Random = None) -> bytes:
+    """One frame; TCP sequence and IP id come from `rng` so profiles replay identically."""
+    rng = rng or random.Random(0)
+    if proto == "TCP":
+        l4 = struct.pack("!HHIIBBHHH", sport, dport, rng.getrandbits(32), 0,
+                         5 << 4, _TCP_FLAGS.get(flags, 0), 64240, 0, 0)
+        num = 6
+    else:
+        l4 = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0)
+        num = 17
+    ip = bytearray(struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4) + len(payload),
+                               rng.getrandbits(16), 0x4000, 64, num, 0,
+                               socket.inet_aton(src), socket.inet_aton(dst)))
+    struct.pack_into("!H", ip, 10, _checksum(bytes(ip)))
+    return _ETH + bytes(ip) + l4 + payload
+
+
+def _client(rng) -> str:
+    return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def _spoofed(rng) -> str:
+    return f"{rng.randint(11, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def _records(frames: List[bytes], rate: int) -> List[Record]:
+    return [(i / rate, f, len(f)) for i, f in enumerate(frames)]
+
+
+# ── Profiles ───────────────────────────────────────────────────
+_PATHS = ["/", "/index.html", "/login", "/api/v1/items?page=2", "/static/app.js",
+          "/search?q=laptop", "/account/settings", "/images/logo.png"]
+_ATTACKS = ["/item?id=1 UNION SELECT username, password FROM users",
+            "/q?x=<script>alert(document.cookie)</script>",
+            "/p?id=1;waitfor delay '0:0:5'--"]
+
+
+def web(count: int = 20_000, seed: int = 1) -> List[Record]:
+    rng = random.Random(seed)
+    clients = [_client(rng) for _ in range(400)]
+    frames = []
+    for _ in range(count):
+        src = rng.choice(clients)
+        kind = rng.random()
+        if kind < 0.10:
+            frames.append(build_frame(src, "8.8.8.8", "UDP", rng.randint(1024, 65535), 53,
+                                      payload=b"\x12\x34\x01\x00\x00\x01" + b"\x00" * 6 + b"\x07example\x03com\x00",
+                                      rng=rng))
+        elif kind < 0.55:
+            frames.append(build_frame(src, TARGET, "TCP", rng.randint(1024, 65535), 443, "PA",
+                                      payload=rng.randbytes(rng.randint(100, 1200)), rng=rng))
+        else:
+            path = rng.choice(_ATTACKS) if rng.random() < 0.01 else rng.choice(_PATHS)
+            body = f"GET {path} HTTP/1.1\r\nHost: shop.local\r\nUser-Agent: Mozilla/5.0\r\n\r\n"
+            frames.append(build_frame(src, TARGET, "TCP", rng.randint(1024, 65535), 80, "PA",
+                                      payload=body.encode(), rng=rng))
+    return _records(frames, 20_000)
+
+
+def syn_flood(count: int = 20_000, seed: int = 2) -> List[Record]:
+    rng = random.Random(seed)
+    frames = [build_frame(_spoofed(rng), TARGET, "TCP", rng.randint(1024, 65535),
+                          rng.choice([80, 443, 8080]), "S", rng=rng) for _ in range(count)]
+    return _records(frames, 200_000)
+
+
+def port_scan(count: int = 20_000, seed: int = 3) -> List[Record]:
+    rng = random.Random(seed)
+    scanner = "45.33.32.156"
+    frames = [build_frame(scanner, TARGET, "TCP", rng.randint(40000, 60000),
+                          1 + i % 65535, "S", rng=rng) for i in range(count)]
+    return _records(frames, 5_000)
+
+
+def smb_worm(count: int = 20_000, seed: int = 4) -> List[Record]:
+    rng = random.Random(seed)
+    infected = [_client(rng) for _ in range(20)]
+    negotiate = b"\x00\x00\x00\x85\xffSMBr\x00\x00\x00\x00\x18\x53\xc8" + b"\x00" * 16 + \
+                b"\x02PC NETWORK PROGRAM 1.0\x00\x02NT LM 0.12\x00"
+    frames = []
+    for _ in range(count):
+        dst = f"192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        if rng.random() < 0.7:
+            frames.append(build_frame(rng.choice(infected), dst, "TCP",
+                                      rng.randint(1024, 65535), rng.choice([445, 139]), "S",
+                                      rng=rng))
+        else:
+            frames.append(build_frame(rng.choice(infected), dst, "TCP",
+                                      rng.randint(1024, 65535), 445, "PA", payload=negotiate,
+                                      rng=rng))
+    return _records(frames, 10_000)
+
+
+PROFILES: Dict[str, Callable[..., List[Record]]] = {
+    "web":       web,
+    "syn_flood": syn_flood,
+    "port_scan": port_scan,
+    "smb_worm":  smb_worm,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in PROFILES:
+        print(f"usage: python traffic_profiles.py <{'|'.join(PROFILES)}> out.pcap [count]")
+        sys.exit(1)
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+    n = write_pcap(sys.argv[2], PROFILES[sys.argv[1]](count))
+    print(f"Wrote {n} packets to {sys.argv[2]}")